@@ -0,0 +1,85 @@
+"""
+Process-wide registry of component behaviors.
+
+Behavior modules are loaded (and compiled) only once per process. Behavior
+instances are cheap and they are created for each use, because behaviors can
+keep per-call state (e.g. the article set up by an exercises grader) and
+components are used by several threads at once.
+"""
+
+from __future__ import unicode_literals
+from common.paths import project_path, to_camel_case
+
+import imp
+import re
+import threading
+
+
+# behaviors classes: (behaviors path, behavior name) -> class
+_behavior_classes = {}
+
+_lock = threading.RLock()
+
+
+def _module_name(behaviors_path, behavior_name):
+    """
+    Returns unique module name for a behavior file (so that behaviors with the
+    same name but for different components don't overwrite each other in
+    sys.modules).
+    """
+    identifier = '{path}{name}'.format(path=behaviors_path, name=behavior_name)
+    return str('component_module_' + re.sub(r'\W', '_', identifier))
+
+
+def get_behavior_class(behaviors_path, behavior_name):
+    """
+    Returns behavior class, the behavior file is loaded only on the first call.
+
+    Args:
+        behaviors_path: project relative path to the behaviors directory
+        behavior_name: name of the behavior (same as the name of the file)
+    Returns:
+        behavior class
+    """
+    key = (behaviors_path, behavior_name)
+    try:
+        return _behavior_classes[key]
+    except KeyError:
+        pass
+
+    with _lock:
+        # the class could have been loaded while we were waiting for the lock
+        if key not in _behavior_classes:
+            behavior_path = project_path('{directory}{name}.py'.format(
+                directory=behaviors_path,
+                name=behavior_name))
+            behavior_module = imp.load_source(
+                _module_name(behaviors_path, behavior_name),
+                behavior_path)
+            _behavior_classes[key] = getattr(behavior_module,
+                to_camel_case(behavior_name))
+        return _behavior_classes[key]
+
+
+def get_behavior(component):
+    """
+    Returns new behavior instance for given component (the behavior class is
+    loaded only once).
+
+    Args:
+        component (abstract_component.models.Component)
+    Returns:
+        component behavior
+    """
+    behavior_class = get_behavior_class(component.get_behaviors_path(),
+        component.behavior_name)
+    return behavior_class(component.parameters)
+
+
+def reload_behaviors():
+    """
+    Forgets all loaded behaviors, so they will be loaded again from files on
+    next use (useful during development of a behavior).
+    """
+    with _lock:
+        _behavior_classes.clear()
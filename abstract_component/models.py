@@ -1,8 +1,7 @@
 from __future__ import unicode_literals
 from django.db import models
+from abstract_component.behavior_registry import get_behavior
 from common.fields import DictField
-from common.paths import project_path, to_camel_case
-import imp
 
 
 class Component(models.Model):
@@ -32,17 +31,8 @@ class Component(models.Model):
     def get_behavior(self):
         """
         Returns instantiated component behavior initalized with parameters.
+
+        NOTE: The behavior module is loaded only once per process, see
+        abstract_component.behavior_registry.
         """
-        # create full path of the behavior file
-        behavior_path = project_path('{directory}{name}.py'.format(
-            directory=self.get_behaviors_path(),
-            name=self.behavior_name))
-
-        # load the file with behavior
-        behavior_module = imp.load_source('component_module', behavior_path)
-        behavior_class_name = to_camel_case(self.behavior_name)
-
-        # instantiate the component behavior object
-        behavior_class = getattr(behavior_module, behavior_class_name)
-        behavior_object = behavior_class(self.parameters)
-        return behavior_object
+        return get_behavior(self)
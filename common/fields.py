@@ -7,6 +7,38 @@ Custom model fields.
 """
 
 
+def decode_dict(value):
+    """
+    Returns dictionary represented by JSON (other values are returned as they
+    are, empty string means None).
+    """
+    if value == "":
+        return None
+
+    if isinstance(value, dict):
+        return value
+
+    try:
+        if isinstance(value, basestring):
+            dictionary = json.loads(value)
+            return dictionary
+    except ValueError:
+        pass
+
+    return value
+
+
+def encode_dict(value):
+    """
+    Returns JSON representation of the dictionary (to store in DB).
+    """
+    if value == "":
+        return None
+    if isinstance(value, dict):
+        value = json.dumps(value, cls=DjangoJSONEncoder)
+    return value
+
+
 class DictField(models.TextField):
     """
     Field for dictionary, using JSON for storing in DB (in a text field).
@@ -18,30 +50,86 @@ class DictField(models.TextField):
         #print 'to python'
         #print type(value)
         #print value[:200]
+        return decode_dict(value)
 
-        if value == "":
-            return None
+    def get_db_prep_save(self, value, *args, **kwargs):
+        value = encode_dict(value)
+        return super(DictField, self).get_db_prep_save(value, *args, **kwargs)
 
-        if isinstance(value, dict):
-            return value
+    # serialization (e.g. for creating DB dumps in XML)
+    def value_to_string(self, obj):
+        value = self._get_val_from_obj(obj)
+        return json.dumps(value)
 
-        try:
-            if isinstance(value, basestring):
-                dictionary = json.loads(value)
-                return dictionary
-        except ValueError:
-            pass
 
+class LazyDictDescriptor(object):
+    """
+    Lazy access to a dictionary stored in LazyDictField. JSON loaded from DB
+    is decoded only on the first access to the attribute (so queries which
+    don't need the dictionary don't pay for the decoding).
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.field.name]
+        if isinstance(value, basestring):
+            value = self.field.to_python(value)
+            instance.__dict__[self.field.name] = value
         return value
 
+    def __set__(self, instance, value):
+        if value == '':
+            value = None
+        instance.__dict__[self.field.name] = value
+
+    def get_encoded(self, instance):
+        """
+        Returns JSON of the dictionary if it hasn't been decoded yet,
+        otherwise returns None.
+        """
+        value = instance.__dict__.get(self.field.name)
+        if isinstance(value, basestring):
+            return value
+        return None
+
+    def is_null(self, instance):
+        """
+        Returns True if there is no dictionary (without decoding it).
+        """
+        return instance.__dict__.get(self.field.name) is None
+
+
+class LazyDictField(models.TextField):
+    """
+    Field for (big) dictionary, using JSON for storing in DB (the same as
+    DictField), but decoded lazily (see LazyDictDescriptor).
+    """
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super(LazyDictField, self).contribute_to_class(cls, name, **kwargs)
+        setattr(cls, self.name, LazyDictDescriptor(self))
+
+    def to_python(self, value):
+        return decode_dict(value)
+
+    def pre_save(self, model_instance, add):
+        # dictionary which hasn't been accessed is saved without decoding
+        encoded = LazyDictDescriptor(self).get_encoded(model_instance)
+        if encoded is not None:
+            return encoded
+        return super(LazyDictField, self).pre_save(model_instance, add)
+
     def get_db_prep_save(self, value, *args, **kwargs):
-        if value == "":
-            return None
-        if isinstance(value, dict):
-            value = json.dumps(value, cls=DjangoJSONEncoder)
-        return super(DictField, self).get_db_prep_save(value, *args, **kwargs)
+        value = encode_dict(value)
+        return super(LazyDictField, self).get_db_prep_save(value, *args,
+            **kwargs)
 
     # serialization (e.g. for creating DB dumps in XML)
     def value_to_string(self, obj):
         value = self._get_val_from_obj(obj)
         return json.dumps(value)
+
@@ -0,0 +1,23 @@
+from __future__ import unicode_literals
+from django.db import models
+
+
+class Lock(models.Model):
+    """
+    Model for a named lock shared by all processes using the DB (see
+    common.utils.locks).
+    """
+    key = models.CharField(max_length=255, unique=True)
+
+    # process which holds the lock
+    owner = models.CharField(max_length=100)
+
+    # the lock is considered abandoned (and can be taken) after this time
+    expires = models.DateTimeField()
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __unicode__(self):
+        return '<Lock key={key}; owner={owner}>'.format(
+            key=self.key, owner=self.owner)
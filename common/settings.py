@@ -8,5 +8,61 @@ ONLINE_ENABLED = True
 SKIP_ONLINE_TESTS = True
 SKIP_LOGGING_TESTS = True
 
+# public SPARQL endpoint used for retrieving global knowledge
+DBPEDIA_SPARQL_ENDPOINT = 'http://dbpedia.org/sparql'
+# maximum number of terms retrieved from DBpedia by a single query
+DBPEDIA_BATCH_SIZE = 50
+# maximum number of concurrent queries (1 = sequential retrieval)
+DBPEDIA_WORKERS = 4
+# maximum number of queries per second (per endpoint)
+DBPEDIA_REQUESTS_PER_SECOND = 5
+# number of retries of a failed query and delay before the first one [s]
+DBPEDIA_RETRIES = 3
+DBPEDIA_RETRY_BACKOFF = 1.0
+# time limit for retrieval of global knowledge for one knowledge build [s]
+DBPEDIA_DEADLINE = 60
+# how long to remember terms which DBpedia can't resolve [s]
+# (retrieval failed / retrieved graph was empty)
+UNRESOLVED_TERM_ERROR_TTL = 60 * 60
+UNRESOLVED_TERM_EMPTY_TTL = 30 * 24 * 60 * 60
+# how long a process trusts its in-memory copy of an unresolved term without
+# checking the DB (so that purging and expiration work across processes) [s]
+UNRESOLVED_TERM_MIRROR_TTL = 60
+
+# load NLTK models when the application starts (instead of the first request)
+NLP_PRELOAD_MODELS = True
+
+# number of processes for shallow parsing of long articles (1 = parsing in
+# the calling process) and minimal number of sentences to use the processes
+NLP_PROCESSES = 1
+NLP_PARALLEL_MIN_SENTENCES = 200
+
+# memory limit for cached analyses (parsed sentences) of articles [B]
+ARTICLE_ANALYSIS_CACHE_SIZE = 256 * 1024 * 1024
+
+# run knowledge building and exercises creation by background workers (see
+# manage.py run_jobs); if disabled, jobs are run within the request
+JOBS_ASYNC = False
+# how often idle workers look for new jobs [s]
+JOBS_POLL_INTERVAL = 1.0
+# running job whose worker hasn't finished it in this time is run again [s]
+JOBS_TIMEOUT = 10 * 60
+
+# how long to wait for knowledge building (or exercises creation) by another
+# process [s] and how long a lock of a running building is valid [s]
+SINGLE_FLIGHT_TIMEOUT = 5 * 60
+SINGLE_FLIGHT_LOCK_TTL = 15 * 60
+# how often to check whether the other process has finished [s]
+SINGLE_FLIGHT_POLL_INTERVAL = 0.5
+
+# how to select components for a new session: 'proportional' (probability
+# proportional to the mean performance of the combination) or 'thompson'
+# (Thompson sampling from Beta posteriors of the performance)
+COMPONENTS_SELECTION = 'proportional'
+
+# how long to keep enabled components cached in a process [s] (changes made
+# by saving components in the same process are applied immediately)
+COMPONENTS_CATALOGUE_TTL = 60
+
 # maximum session length (in number of exercises)
 SESSION_MAX_LENGTH = 10
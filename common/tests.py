@@ -1,9 +1,14 @@
 from __future__ import unicode_literals
 from django.test import TestCase
+from common.models import Lock
+from common.utils.locks import SingleFlight, LockTimeout
+from common.utils.locks import acquire_lock, release_lock, is_locked
 from common.utils.metrics import cosine_similarity
 from common.utils.nlp import join_words, is_contextfree, sentence_to_tree
 from common.utils.wiki import uri_to_name
 
+import datetime
+
 
 class WikiUtilsTestCase(TestCase):
 
@@ -47,3 +52,53 @@ class MetricsUtilsTestCase(TestCase):
         doc1 = {'a': 2, 'b': 1, 'c': 3}
         doc2 = {'b': 1, 'c': 3, 'd': 5}
         self.assertAlmostEqual(cosine_similarity(doc1, doc2), 0.45175395145262565)
+
+
+class LocksTestCase(TestCase):
+
+    def lock_by_other_process(self, key, expires_in=60):
+        Lock.objects.create(key=key, owner='other',
+            expires=datetime.datetime.now() + datetime.timedelta(seconds=expires_in))
+
+    def test_acquire_and_release(self):
+        owner = acquire_lock('work')
+        self.assertIsNotNone(owner)
+        self.assertIsNone(acquire_lock('work'))
+        self.assertTrue(is_locked('work'))
+        release_lock('work', owner)
+        self.assertFalse(is_locked('work'))
+        self.assertIsNotNone(acquire_lock('work'))
+
+    def test_expired_lock_is_taken(self):
+        self.lock_by_other_process('work', expires_in=-1)
+        self.assertIsNotNone(acquire_lock('work'))
+        self.assertEqual(Lock.objects.count(), 1)
+
+    def test_long_keys(self):
+        key = 'x' * 300
+        owner = acquire_lock(key)
+        self.assertTrue(is_locked(key))
+        release_lock(key, owner)
+        self.assertFalse(is_locked(key))
+
+    def test_single_flight(self):
+        done = []
+        with SingleFlight('work', is_done=lambda: bool(done)) as leader:
+            self.assertTrue(leader)
+            self.assertTrue(is_locked('work'))
+            done.append(True)
+        self.assertFalse(is_locked('work'))
+        with SingleFlight('work', is_done=lambda: bool(done)) as leader:
+            self.assertFalse(leader)
+
+    def test_single_flight_waits_for_other_process(self):
+        # partial result of a running work is not used
+        self.lock_by_other_process('work')
+        with self.assertRaises(LockTimeout):
+            with SingleFlight('work', is_done=lambda: True, timeout=0.1,
+                    poll_interval=0.05):
+                pass
+        # the work is done after the other process releases the lock
+        Lock.objects.all().delete()
+        with SingleFlight('work', is_done=lambda: True) as leader:
+            self.assertFalse(leader)
@@ -0,0 +1,140 @@
+"""
+Locks shared by processes through the DB (common.models.Lock) and
+single-flight coordination of expensive work.
+"""
+
+from __future__ import unicode_literals
+from django.db import IntegrityError, transaction
+from common.models import Lock
+from common.settings import SINGLE_FLIGHT_TIMEOUT, SINGLE_FLIGHT_LOCK_TTL
+from common.settings import SINGLE_FLIGHT_POLL_INTERVAL
+
+from hashlib import md5
+import datetime
+import os
+import socket
+import threading
+import time
+
+
+class LockTimeout(Exception):
+    """
+    Raised when waiting for a lock takes too long.
+    """
+    pass
+
+
+def _lock_key(key):
+    if len(key) > 255:
+        key = md5(key.encode('utf-8')).hexdigest()
+    return key
+
+
+def _owner():
+    return '{host}:{pid}:{thread}'.format(host=socket.gethostname(),
+        pid=os.getpid(), thread=threading.current_thread().ident)
+
+
+def acquire_lock(key, ttl=SINGLE_FLIGHT_LOCK_TTL):
+    """
+    Tries to acquire the lock (without waiting), an expired lock is taken
+    from its previous owner.
+
+    Returns:
+        owner identification (to release the lock) or None if the lock is
+        held by somebody else
+    """
+    key = _lock_key(key)
+    owner = _owner()
+    now = datetime.datetime.now()
+    expires = now + datetime.timedelta(seconds=ttl)
+    try:
+        with transaction.atomic():
+            Lock.objects.create(key=key, owner=owner, expires=expires)
+        return owner
+    except IntegrityError:
+        taken = Lock.objects.filter(key=key, expires__lt=now)\
+            .update(owner=owner, expires=expires)
+        return owner if taken else None
+
+
+def release_lock(key, owner):
+    """
+    Releases the lock (if it's still held by the owner).
+    """
+    Lock.objects.filter(key=_lock_key(key), owner=owner).delete()
+
+
+def is_locked(key):
+    """
+    Returns True if the lock is held (and not expired).
+    """
+    return Lock.objects.filter(key=_lock_key(key),
+        expires__gte=datetime.datetime.now()).exists()
+
+
+class SingleFlight(object):
+    """
+    Context manager ensuring that a work is done only once even if it's
+    requested by more processes at the same time: the first one does the
+    work, the others wait until it's done.
+
+    Example:
+        with SingleFlight(key, is_done=lambda: result_exists()) as leader:
+            if leader:
+                do_work()
+
+    The context returns True if the caller holds the lock and should do the
+    work, False if the work has been already done (by another process). If
+    the process which does the work fails, one of the waiting processes takes
+    over the work.
+
+    Raises:
+        LockTimeout: if the work is not done (and the lock is held by another
+            process) after the timeout
+    """
+
+    def __init__(self, key, is_done, timeout=SINGLE_FLIGHT_TIMEOUT,
+            ttl=SINGLE_FLIGHT_LOCK_TTL, poll_interval=SINGLE_FLIGHT_POLL_INTERVAL):
+        """
+        Args:
+            key: identification of the work
+            is_done: function returning True if the work is (completely) done
+            timeout: how long to wait for another process [s]
+            ttl: how long the lock is valid (if the process holding it dies,
+                others wait for this time) [s]
+            poll_interval: how often to check the lock [s]
+        """
+        self.key = key
+        self.is_done = is_done
+        self.timeout = timeout
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.owner = None
+
+    def __enter__(self):
+        # fast path: the work is done and nobody is doing it now (partial
+        # results of a running work are not considered done)
+        if self.is_done() and not is_locked(self.key):
+            return False
+        deadline = time.time() + self.timeout
+        while True:
+            self.owner = acquire_lock(self.key, self.ttl)
+            if self.owner is not None:
+                if self.is_done():
+                    self._release()
+                    return False
+                return True
+            if time.time() >= deadline:
+                raise LockTimeout('Waiting for {key} timed out.'.format(
+                    key=self.key))
+            time.sleep(self.poll_interval)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._release()
+        return False
+
+    def _release(self):
+        if self.owner is not None:
+            release_lock(self.key, self.owner)
+            self.owner = None
@@ -3,7 +3,74 @@ Module for NLP tasks
 
 # Prabably do a package from this.
 """
-from nltk import ParentedTree, word_tokenize, pos_tag
+from nltk import ParentedTree
+from nltk.data import load
+from nltk.tag import _POS_TAGGER
+from nltk.tokenize import _treebank_word_tokenize
+import threading
+import time
+
+
+SENTENCE_TOKENIZER = 'tokenizers/punkt/english.pickle'
+
+# NLTK models (loaded once per process, see preload_models)
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _get_model(resource):
+    model = _models.get(resource)
+    if model is None:
+        with _models_lock:
+            model = _models.get(resource)
+            if model is None:
+                model = load(resource)
+                _models[resource] = model
+    return model
+
+
+def preload_models():
+    """
+    Loads NLTK models (sentence tokenizer and POS tagger), so that the first
+    request doesn't have to wait for them. If it's called before a server
+    forks its workers, the models are shared by the workers (copy-on-write).
+
+    Returns:
+        time of loading [s]
+    """
+    start = time.time()
+    for resource in [SENTENCE_TOKENIZER, _POS_TAGGER]:
+        _get_model(resource)
+    return time.time() - start
+
+
+def sent_tokenize(text):
+    """
+    Splits text to sentences (the same as nltk.sent_tokenize).
+    """
+    return _get_model(SENTENCE_TOKENIZER).tokenize(text)
+
+
+def word_tokenize(text):
+    """
+    Splits text to words (the same as nltk.word_tokenize).
+    """
+    return [token for sentence in sent_tokenize(text)
+        for token in _treebank_word_tokenize(sentence)]
+
+
+def pos_tag(tokens):
+    """
+    Assigns a tag to each token (the same as nltk.pos_tag).
+    """
+    return _get_model(_POS_TAGGER).tag(tokens)
+
+
+def pos_tag_sents(sentences):
+    """
+    Assigns tags to tokens of each sentence (the same as nltk.pos_tag_sents).
+    """
+    return _get_model(_POS_TAGGER).tag_sents(sentences)
 
 
 def sentence_to_tree(sentence):
@@ -29,23 +96,34 @@ def is_contextfree(sentence, max_sentence_length=50):
     """
     Returns True if the :sentence: is context-free, False otherwise
     """
+    pos = sentence.pos()
+    return is_contextfree_tokens([word for word, tag in pos],
+        [tag for word, tag in pos], max_sentence_length)
+
+
+def is_contextfree_tokens(words, tags, max_sentence_length=50):
+    """
+    Returns True if the sentence given by its words and their tags is
+    context-free, False otherwise (the same test as is_contextfree, but
+    without the sentence tree)
+    """
     # detect too short or too long sentences
-    length = len(sentence.leaves())
+    length = len(words)
     if length < 5 or length > max_sentence_length:
         return False
 
     # discard questions and exclamation sentences
-    if sentence.leaves()[-1] != '.':
+    if words[-1] != '.':
         return False
 
     # discard sentences containing a pronoun, parenthesis or qoatation
     FORBIDDEN_POS_TAGS = {"''", '(', ')', 'PRP', 'PRP$'}
-    for node in sentence.subtrees():
-        if node.label() in FORBIDDEN_POS_TAGS:
+    for tag in tags:
+        if tag in FORBIDDEN_POS_TAGS:
             return False
 
     FORBIDDEN_WORDS = {':', ';', 'this', 'that', 'these', 'those', 'there', 'then', 'following'}
-    for word in sentence.leaves():
+    for word in words:
         if word.lower() in FORBIDDEN_WORDS:
             return False
 
@@ -61,8 +139,14 @@ def contextfree_sentences(article, max_sentence_length=50):
     Returns:
         list of (context-free) sentences
     """
+    sentences = article.get_sentences()
+    if hasattr(sentences, 'select'):
+        # lazy sentences: trees are built only for context-free sentences
+        return sentences.select(lambda words, tags:
+            is_contextfree_tokens(words, tags, max_sentence_length))
+
     contextfree_sentences = []
-    for sentence in article.get_sentences():
+    for sentence in sentences:
         if is_contextfree(sentence, max_sentence_length):
             contextfree_sentences.append(sentence)
     return contextfree_sentences
@@ -0,0 +1,56 @@
+"""
+Reporting progress of long running tasks (e.g. background jobs).
+
+A task is run inside progress_reporter(callback) and the code doing the work
+reports finished steps by report_progress (so the callback doesn't need to be
+passed through all the layers). Reports are ignored if there is no reporter
+set for the current thread.
+"""
+
+from __future__ import unicode_literals
+from contextlib import contextmanager
+
+import threading
+
+
+_reporters = threading.local()
+
+
+def _ignore_progress(done, total=None):
+    pass
+
+
+@contextmanager
+def progress_reporter(callback):
+    """
+    Sets callback for progress reports in the current thread.
+
+    Args:
+        callback: function (number of finished steps, number of all steps
+            or None if unknown)
+    """
+    previous_callback = getattr(_reporters, 'callback', None)
+    _reporters.callback = callback
+    try:
+        yield
+    finally:
+        _reporters.callback = previous_callback
+
+
+def get_progress_reporter():
+    """
+    Returns progress callback of the current thread (or a function which
+    ignores reports if there is none).
+    """
+    return getattr(_reporters, 'callback', None) or _ignore_progress
+
+
+def report_progress(done, total=None):
+    """
+    Reports progress of the current task.
+
+    Args:
+        done: number of finished steps (e.g. retrieved graphs)
+        total: number of all steps (None if unknown)
+    """
+    get_progress_reporter()(done, total)
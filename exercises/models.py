@@ -3,6 +3,8 @@ from django.db import models
 from collections import defaultdict
 from abstract_component.models import Component
 from common.fields import DictField
+from common.utils.locks import SingleFlight
+from common.utils.progress import report_progress
 from knowledge.models import KnowledgeGraph
 from knowledge.utils.terms import name_to_term
 
@@ -30,23 +32,32 @@ class ExercisesCreator(Component):
             knowledge_graph (knowledge.models.KnowledgeGraph)
         Yields:
             exercises (exercises.models.Exercise)
+        Raises:
+            LockTimeout: if the exercises are being created by another
+                process for too long
         """
-        # first check whether the exercises are not already built
+        # first check whether the exercises are not already built (or being
+        # built by another process, then wait for them)
         exercises = Exercise.objects.filter(
             knowledge_graph=knowledge_graph,
             exercises_creator=self)
-        if exercises:
-            if yielding:
-                for exercise in exercises:
-                    yield exercise
-            return
-
-        behavior = self.get_behavior()
-        for exercise in behavior.create_exercises(knowledge_graph):
-            exercise.exercises_creator = self
-            exercise.knowledge_graph = knowledge_graph
-            exercise.save()
-            if yielding:
+        key = 'create-exercises:{creator}:{graph}'.format(creator=self.pk,
+            graph=knowledge_graph.pk)
+        # all exercises are stored before they are yielded, so the lock isn't
+        # held while the consumer processes them (e.g. grades them)
+        created_exercises = []
+        with SingleFlight(key, is_done=exercises.exists) as leader:
+            if leader:
+                behavior = self.get_behavior()
+                for exercise in behavior.create_exercises(knowledge_graph):
+                    exercise.exercises_creator = self
+                    exercise.knowledge_graph = knowledge_graph
+                    exercise.save()
+                    if yielding:
+                        created_exercises.append(exercise)
+
+        if yielding:
+            for exercise in (created_exercises if leader else exercises):
                 yield exercise
 
     def __unicode__(self):
@@ -81,19 +92,25 @@ class ExercisesGrader(Component):
             IntegrityError: if knowledge_graph or exercise_creator is not
                 already stored in DB (we need their primary keys)
         """
-        self.behavior = self.get_behavior()
-        self.behavior.setup(knowledge_graph.topic)
-        for exercise in exercises_creator.create_exercises(knowledge_graph):
+        # the behavior is set up for this call only (the grader component can
+        # be used by several threads at once)
+        behavior = self.get_behavior()
+        behavior.setup(knowledge_graph.topic)
+        for count, exercise in enumerate(
+                exercises_creator.create_exercises(knowledge_graph), 1):
             # compute grades and store them in DB
-            self._grade_exercise(exercise)
+            self._grade_exercise(exercise, behavior)
+            # number of exercises isn't known in advance
+            report_progress(count)
 
-    def _grade_exercise(self, exercise):
+    def _grade_exercise(self, exercise, behavior):
         """
         Computes grade and stores them (doesn't return anything).
 
         Args:
             exercise (exercises.model.Exercise): exercise to grade, has to be
                 already stored in DB
+            behavior: set up behavior of this grader
         Raises:
             IntegrityError: if the exercise is not already stored in DB
         """
@@ -103,7 +120,7 @@ class ExercisesGrader(Component):
                 exercises_grader=self).exists():
             return  # nothing to do
 
-        grades = self.behavior.grade_exercise(exercise)
+        grades = behavior.grade_exercise(exercise)
         grades.exercise = exercise
         grades.exercises_grader = self
         grades.save()
@@ -6,7 +6,11 @@ from exercises.models import Exercise, ExercisesCreator
 from exercises.models import GradedExercise, ExercisesGrader
 from exercises.utils.distractors import generate_similar_terms, create_choice_list
 from exercises.utils.difficulty import difficulty_normalization
+from common.utils.locks import is_locked
+from knowledge.utils.similarity import NeighbourIndex, TypeSimilarityEngine
+from knowledge.utils.similarity import NEIGHBOURS_COUNT
 from rdflib import Literal
+from json import dumps, loads
 
 
 class ExercisesCreatorTestCase(TestCase):
@@ -36,6 +40,17 @@ class ExercisesCreatorTestCase(TestCase):
         # check that all the exercises were stored
         self.assertEqual(len(Exercise.objects.all()), exercises_count)
 
+    def test_lock_released_before_yielding(self):
+        creator = ExercisesCreator.objects.create(
+            behavior_name='fake', parameters={})
+        key = 'create-exercises:{creator}:{graph}'.format(creator=creator.pk,
+            graph=self.knowledge_graph.pk)
+        exercises = creator.create_exercises(self.knowledge_graph)
+        next(exercises)
+        # exercises are processed by the consumer without the lock
+        self.assertFalse(is_locked(key))
+        self.assertEqual(len(list(exercises)) + 1, Exercise.objects.count())
+
 
 class ExercisesGraderTestCase(TestCase):
     def setUp(self):
@@ -91,6 +106,70 @@ class DistractorsUtilsTestCase(TestCase):
         self.assertEqual(len(set(terms)), 5)
         self.assertNotIn(termA, terms)
 
+    def test_generate_similar_terms_beyond_neighbours(self):
+        knowledge_graph = KnowledgeGraph()
+        terms = [TERM['T{i}'.format(i=i)] for i in range(10)]
+        for i, term in enumerate(terms):
+            knowledge_graph.add((term, RDF['type'], SMARTOO['term']))
+            knowledge_graph.add((term, RDF['type'], ONTOLOGY['Type{i}'.format(i=i % 3)]))
+        knowledge_graph.neighbour_index.size = 2
+        selected = generate_similar_terms(terms[0], knowledge_graph, 6)
+        self.assertEqual(len(set(selected)), 6)
+        self.assertNotIn(terms[0], selected)
+        self.assertTrue(set(selected) <= set(terms))
+
+    def test_neighbours(self):
+        knowledge_graph = KnowledgeGraph()
+        termA = TERM['A']
+        knowledge_graph.add((termA, RDF['type'], ONTOLOGY['Agent']))
+        knowledge_graph.add((termA, RDF['type'], ONTOLOGY['Person']))
+        for i in range(5):
+            term = TERM['B{i}'.format(i=i)]
+            knowledge_graph.add((term, RDF['type'], ONTOLOGY['Agent']))
+            if i % 2 == 0:
+                knowledge_graph.add((term, RDF['type'], ONTOLOGY['Person']))
+        neighbours, similarities = knowledge_graph.neighbour_index.neighbours(
+            termA, 3)
+        self.assertNotIn(termA, neighbours)
+        self.assertEqual(set(neighbours[:3]),
+            set([TERM['B0'], TERM['B2'], TERM['B4']]))
+        self.assertEqual(similarities, sorted(similarities, reverse=True))
+        for term, similarity in zip(neighbours, similarities):
+            self.assertAlmostEqual(similarity,
+                knowledge_graph.similarity(termA, term))
+
+    def test_neighbours_extension_with_ties(self):
+        knowledge_graph = KnowledgeGraph()
+        terms = [TERM['T{i}'.format(i=i)] for i in range(10)]
+        for term in terms:
+            knowledge_graph.add((term, RDF['type'], ONTOLOGY['Agent']))
+        neighbour_index = knowledge_graph.neighbour_index
+        neighbour_index.size = 2
+        first_neighbours = neighbour_index.neighbours(terms[0])[0]
+        all_neighbours = neighbour_index.neighbours(terms[0], 9)[0]
+        self.assertEqual(len(first_neighbours), 2)
+        self.assertEqual(all_neighbours[:2], first_neighbours)
+        self.assertEqual(len(set(all_neighbours)), 9)
+
+    def test_stored_neighbours_extension_with_ties(self):
+        terms = [TERM['T{i:02}'.format(i=i)] for i in range(NEIGHBOURS_COUNT + 10)]
+        types_of_term = dict((term, set([ONTOLOGY['Agent']])) for term in terms)
+        # stored neighbours are extended by another process, which builds
+        # the engine from the terms iterated in a different order
+        neighbour_index = NeighbourIndex(
+            lambda: TypeSimilarityEngine(terms, types_of_term))
+        neighbour_index.precompute()
+        data = loads(dumps(neighbour_index.to_dict()))
+        neighbour_index = NeighbourIndex.from_dict(data,
+            lambda: TypeSimilarityEngine(reversed(terms), types_of_term))
+        stored_neighbours = neighbour_index.neighbours(terms[0])[0]
+        all_neighbours = neighbour_index.neighbours(terms[0],
+            NEIGHBOURS_COUNT + 5)[0]
+        self.assertEqual(len(stored_neighbours), NEIGHBOURS_COUNT)
+        self.assertEqual(all_neighbours[:NEIGHBOURS_COUNT], stored_neighbours)
+        self.assertGreaterEqual(len(all_neighbours), NEIGHBOURS_COUNT + 5)
+        self.assertEqual(len(set(all_neighbours)), len(all_neighbours))
+
     def test_create_choice_list(self):
         knowledge_graph = KnowledgeGraph()
         henry = TERM['Henry_VIII_of_England']
@@ -33,19 +33,21 @@ def generate_similar_terms(term, knowledge_graph, number=3):
     Term arse selected fromterms in knowledge graph, but if there is not enough
     of them made-up terms are used (see TERMS_OF_TYPE dictionary).
     """
-    all_terms = set(knowledge_graph.all_terms)
-    all_terms.discard(term)
-    similarity = {t: knowledge_graph.similarity(term, t) for t in all_terms}
-    sorted_terms = sorted(similarity, key=similarity.get, reverse=True)
-    selected = sorted_terms[:number]
+    # only the most similar terms are needed (neighbours are precomputed
+    # for the graph, more of them are computed if they are not enough)
+    neighbour_index = knowledge_graph.neighbour_index
+    sorted_terms, similarities = neighbour_index.neighbours(term)
 
     selected = []
     i = 0
     number_rest = number
     while number_rest > 0:
+        if i + number_rest >= len(sorted_terms):
+            sorted_terms, similarities = neighbour_index.neighbours(term,
+                i + number_rest + 1)
         if i >= len(sorted_terms):
             break
-        if random() <= selection_probability(sorted_terms, similarity, i, number_rest):
+        if random() <= selection_probability(similarities, i, number_rest):
             number_rest -= 1
             selected.append(sorted_terms[i])
         i += 1
@@ -77,12 +79,21 @@ def generate_similar_terms(term, knowledge_graph, number=3):
     return selected
 
 
-def selection_probability(terms, similarities, i, k=1):
+def selection_probability(similarities, i, k=1):
+    """
+    Returns probability of selecting i-th most similar term when k terms are
+    still to be selected.
+
+    Args:
+        similarities: similarities of the most similar terms (sorted
+            descending), it must contain at least i + k + 1 items or
+            similarities of all terms
+    """
     #urgency = float(k) / (k + 1)
     # make sure the current similarity is not too close to 0
-    similarity_now = max(0.1, similarities[terms[i]])
+    similarity_now = max(0.1, similarities[i])
     if i + k < len(similarities):
-        similarity_next = similarities[terms[i + k]]
+        similarity_next = similarities[i + k]
     else:
         similarity_next = 0.0
     relative_similarity_difference = (similarity_now - similarity_next) / similarity_now
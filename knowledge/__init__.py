@@ -1 +1,3 @@
 from knowledge_builder_behavior import KnowledgeBuilderBehavior
+
+default_app_config = 'knowledge.apps.KnowledgeConfig'
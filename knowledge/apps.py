@@ -0,0 +1,22 @@
+from __future__ import unicode_literals
+from django.apps import AppConfig
+from common.settings import NLP_PRELOAD_MODELS
+from common.utils.nlp import preload_models
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeConfig(AppConfig):
+    name = 'knowledge'
+
+    def ready(self):
+        if NLP_PRELOAD_MODELS:
+            try:
+                loading_time = preload_models()
+                logger.info('NLTK models loaded in {time:.2f} s'.format(
+                    time=loading_time))
+            except LookupError:
+                # models are loaded (or missing data reported) on first use
+                logger.warning('NLTK models not preloaded (NLTK data missing)')
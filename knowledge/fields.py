@@ -3,38 +3,86 @@ from django.utils.encoding import smart_text
 from rdflib import Graph, URIRef
 #from common.utils.wiki import uri_to_name
 from knowledge.namespaces import TERM
+from knowledge.utils.graph_serialization import serialize_graph, deserialize_graph
 
-# we will use turtle syntax for RDF serialization, it is quite compact and
-# readable (it is a subset of n3 (notatation3) and corresponds to SPARQL)
+# we will use turtle syntax for RDF serialization in dumps (e.g. fixtures),
+# it is quite compact and readable (it is a subset of n3 (notatation3) and
+# corresponds to SPARQL)
 RDF_SERIALIZATION_FORMAT = 'turtle'
 
+# in DB, graphs are stored in compact format (which is much faster to load),
+# see knowledge.utils.graph_serialization
+COMPRESS_GRAPHS = True
+
+
+class GraphDescriptor(object):
+    """
+    Lazy access to a graph stored in GraphField. Serialized graph loaded from
+    DB is deserialized only on the first access to the attribute (so queries
+    which don't need the graph, e.g. only topic is used, don't pay for the
+    parsing).
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.field.name]
+        if isinstance(value, basestring):
+            value = self.field.to_python(value)
+            instance.__dict__[self.field.name] = value
+        return value
+
+    def __set__(self, instance, value):
+        if value == '':
+            value = None
+        instance.__dict__[self.field.name] = value
+
+    def get_serialized(self, instance):
+        """
+        Returns serialized graph if it hasn't been deserialized yet, otherwise
+        returns None.
+        """
+        value = instance.__dict__.get(self.field.name)
+        if isinstance(value, basestring):
+            return value
+        return None
+
 
 class GraphField(models.TextField):
     """
-    Model field for rdflib.Graph
+    Model field for rdflib.Graph (deserialized lazily, see GraphDescriptor)
     """
 
-    __metaclass__ = models.SubfieldBase
+    def contribute_to_class(self, cls, name, **kwargs):
+        super(GraphField, self).contribute_to_class(cls, name, **kwargs)
+        setattr(cls, self.name, GraphDescriptor(self))
 
     def to_python(self, value):
         if isinstance(value, Graph):
             return value
 
-        if value == '':
+        if value == '' or value is None:
             return None
 
-        # deserialize string
-        graph = Graph()
-        graph.parse(data=value, format=RDF_SERIALIZATION_FORMAT)
+        # deserialize string (legacy turtle format is also supported)
+        return deserialize_graph(value)
 
-        return graph
+    def pre_save(self, model_instance, add):
+        # graph which hasn't been accessed is saved without deserialization
+        serialized = GraphDescriptor(self).get_serialized(model_instance)
+        if serialized is not None:
+            return serialized
+        return super(GraphField, self).pre_save(model_instance, add)
 
     def get_db_prep_save(self, value, *args, **kwargs):
         if value == '':
             return None
 
         if isinstance(value, Graph):
-            value = value.serialize(format=RDF_SERIALIZATION_FORMAT)
+            value = serialize_graph(value, compress=COMPRESS_GRAPHS)
 
         return super(GraphField, self).get_db_prep_save(value, *args, **kwargs)
 
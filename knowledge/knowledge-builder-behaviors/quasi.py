@@ -25,6 +25,7 @@ class Quasi(KnowledgeBuilderBehavior):
             online=True)
         article.parse_terms_and_sentences(knowledge_graph=knowledge_graph)
 
+        quasifacts = []
         for sentence in contextfree_sentences(article, max_sentence_length):
             #print 'uvazovana veta:', sentence
             before_term = []
@@ -47,22 +48,15 @@ class Quasi(KnowledgeBuilderBehavior):
 
             # add quaisifact about a term in a sentence to the graph
             quasifact = BNode()
-            knowledge_graph.add((
-                quasifact,
-                RDF['type'],
-                Literal('term-in-sentence')))
-            # parts
-            knowledge_graph.add((
-                quasifact,
-                SMARTOO['term'],
-                term))
-            knowledge_graph.add((
-                quasifact,
-                SMARTOO['part-before-term'],
-                Literal(join_words(before_term))))
-            knowledge_graph.add((
-                quasifact,
-                SMARTOO['part-after-term'],
-                Literal(join_words(after_term))))
+            quasifacts.extend([
+                (quasifact, RDF['type'], Literal('term-in-sentence')),
+                # parts
+                (quasifact, SMARTOO['term'], term),
+                (quasifact, SMARTOO['part-before-term'],
+                    Literal(join_words(before_term))),
+                (quasifact, SMARTOO['part-after-term'],
+                    Literal(join_words(after_term)))])
+
+        knowledge_graph.add_many(quasifacts)
 
         return knowledge_graph
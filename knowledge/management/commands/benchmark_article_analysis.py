@@ -0,0 +1,114 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from common.paths import project_path
+from common.utils.nlp import is_contextfree, is_contextfree_tokens
+from knowledge.management.commands.benchmark_terms_inference import create_random_article
+from knowledge.utils.terms import bulk_create_terms_matcher
+from knowledge.utils.text import terms_inference
+from knowledge.utils.token_store import TokenStore, LazySentences
+
+import gc
+import json
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+
+LINCOLN_FIXTURE = 'knowledge/fixtures/lincoln-components-article-global_knowledge.xml'
+
+
+def load_article_content(fixture=LINCOLN_FIXTURE):
+    """
+    Returns content (sentences and terms) of the first article in the fixture.
+    """
+    root = ElementTree.parse(project_path(fixture)).getroot()
+    for field in root.iter('field'):
+        if field.get('name') == 'content' and field.text:
+            return json.loads(field.text)
+
+
+def deep_size(obj, excluded_ids=frozenset()):
+    """
+    Returns memory size of the object and all objects reachable from it
+    (except classes, modules and excluded objects) [B].
+    """
+    seen = set(excluded_ids)
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, type(sys))):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return size
+
+
+def reachable_ids(obj):
+    seen = set()
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) not in seen:
+            seen.add(id(obj))
+            stack.extend(gc.get_referents(obj))
+    return seen
+
+
+def eager_analysis(sentences, terms_matcher):
+    trees, terms_positions = terms_inference(sentences, terms_matcher)
+    selected = [tree for tree in trees if is_contextfree(tree)]
+    return (trees, terms_positions), selected
+
+
+def lazy_analysis(sentences, terms_matcher):
+    lazy_sentences = LazySentences(TokenStore(sentences, terms_matcher))
+    selected = lazy_sentences.select(is_contextfree_tokens)
+    return lazy_sentences, selected
+
+
+class Command(BaseCommand):
+    args = '<repeat>'
+    help = ('Compares memory and time of article analysis with eager sentence'
+        ' trees and with the token store')
+
+    def handle(self, *args, **options):
+        repeat = int(args[0]) if len(args) > 0 else 5
+        lincoln = load_article_content()
+        sentences, terms = create_random_article()
+        # every second sentence ends with a full stop (so about a half of
+        # sentences are context-free)
+        for i, sentence in enumerate(sentences):
+            if i % 2 == 0:
+                sentence.append(['.', '.'])
+        articles = [
+            ('lincoln', lincoln['sentences'], lincoln['terms']),
+            ('lincoln x1000', lincoln['sentences'] * 1000, lincoln['terms']),
+            ('random', sentences, terms)]
+
+        self.stdout.write('#article;method;sentences;tokens;trees built;'
+            'memory before selection [kB];memory [kB];time [ms]')
+        for name, sentences, terms in articles:
+            terms_matcher = bulk_create_terms_matcher(terms)
+            excluded_ids = reachable_ids(sentences)
+            tokens_count = sum(len(sentence) for sentence in sentences)
+            for method, analyse in [('eager', eager_analysis),
+                    ('token store', lazy_analysis)]:
+                start = time.time()
+                for i in range(repeat):
+                    analysis, selected = analyse(sentences, terms_matcher)
+                analysis_time = (time.time() - start) / repeat
+                memory = deep_size(analysis, excluded_ids)
+                if method == 'eager':
+                    trees_count = len(analysis[0])
+                    store_memory = memory
+                else:
+                    trees_count = len(analysis._trees)
+                    store_memory = deep_size(
+                        TokenStore(sentences, terms_matcher), excluded_ids)
+                self.stdout.write('{name};{method};{sentences};{tokens};'
+                    '{trees};{store_memory:.1f};{memory:.1f};{time:.2f}'.format(
+                        name=name, method=method, sentences=len(sentences),
+                        tokens=tokens_count, trees=trees_count,
+                        store_memory=store_memory / 1024.0,
+                        memory=memory / 1024.0, time=1000 * analysis_time))
@@ -0,0 +1,63 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from common.paths import project_path
+from knowledge.utils.graph_serialization import serialize_graph, deserialize_graph
+
+import glob
+import time
+import xml.etree.ElementTree as ElementTree
+
+FIXTURES_PATTERN = 'knowledge/fixtures/*.xml'
+
+
+def load_fixtures_graphs(pattern=FIXTURES_PATTERN):
+    """
+    Returns list of all graphs (serialized in turtle) in fixtures.
+    """
+    graphs = []
+    for file_name in sorted(glob.glob(project_path(pattern))):
+        root = ElementTree.parse(file_name).getroot()
+        for field in root.iter('field'):
+            if field.get('name') == 'graph' and field.text:
+                graphs.append(field.text)
+    return graphs
+
+
+def measure_parse_time(values, repeat):
+    """
+    Returns mean time (in seconds) to deserialize all values.
+    """
+    start = time.time()
+    for i in range(repeat):
+        for value in values:
+            deserialize_graph(value)
+    return (time.time() - start) / repeat
+
+
+class Command(BaseCommand):
+    args = '<repeat>'
+    help = 'Compares parse time and size of graphs in turtle and compact format'
+
+    def handle(self, *args, **options):
+        repeat = int(args[0]) if len(args) > 0 else 10
+        turtle_values = load_fixtures_graphs()
+        graphs = [deserialize_graph(value) for value in turtle_values]
+        formats = [
+            ('turtle', turtle_values),
+            ('compact', [serialize_graph(g, compress=False) for g in graphs]),
+            ('compact+zlib', [serialize_graph(g, compress=True) for g in graphs])]
+
+        self.stdout.write('{count} graphs, {triples} triples, repeat={repeat}'
+            .format(count=len(graphs), triples=sum(len(g) for g in graphs),
+                repeat=repeat))
+        self.stdout.write('#format;parse time [ms];size [B];speedup')
+        turtle_time = None
+        for name, values in formats:
+            parse_time = measure_parse_time(values, repeat)
+            if turtle_time is None:
+                turtle_time = parse_time
+            self.stdout.write('{name};{time:.1f};{size};{speedup:.1f}x'.format(
+                name=name,
+                time=1000 * parse_time,
+                size=sum(len(value.encode('utf-8')) for value in values),
+                speedup=turtle_time / parse_time))
@@ -0,0 +1,97 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from knowledge.management.commands.benchmark_graph_serialization import load_fixtures_graphs
+from knowledge.models import KnowledgeGraph
+from knowledge.namespaces import RDF, RDFS, SMARTOO
+from knowledge.utils.graph_serialization import deserialize_graph
+
+import time
+
+LINCOLN_FIXTURES = 'knowledge/fixtures/lincoln-components-article-global_knowledge.xml'
+
+
+def related_knowledge_triples(graphs, predicates=[RDFS['label'], RDF['type']]):
+    """
+    Returns triples which KnowledgeGraph.add_related_global_knowledge would
+    add for all subjects of given graphs (groupped by terms).
+    """
+    triples_groups = []
+    for graph in graphs:
+        for term in set(graph.subjects()):
+            triples = [(term, RDF['type'], SMARTOO['term'])]
+            for predicate in predicates:
+                for value in graph.objects(term, predicate):
+                    triples.append((term, predicate, value))
+            triples_groups.append(triples)
+    return triples_groups
+
+
+def add_invalidating(triples_groups):
+    """
+    Simulates the former behaviour of KnowledgeGraph.add, which dropped all
+    cached attributes after each triple.
+    """
+    knowledge_graph = KnowledgeGraph()
+    for triples in triples_groups:
+        for triple in triples:
+            knowledge_graph.add(triple)
+            knowledge_graph.__dict__.pop('term_index', None)
+        knowledge_graph.types(triples[0][0])
+    return knowledge_graph
+
+
+def add_one_by_one(triples_groups):
+    knowledge_graph = KnowledgeGraph()
+    for triples in triples_groups:
+        for triple in triples:
+            knowledge_graph.add(triple)
+        # builders read the graph between insertions
+        knowledge_graph.types(triples[0][0])
+    return knowledge_graph
+
+
+def add_in_bulk(triples_groups):
+    knowledge_graph = KnowledgeGraph()
+    for triples in triples_groups:
+        knowledge_graph.add_many(triples)
+        knowledge_graph.types(triples[0][0])
+    return knowledge_graph
+
+
+def add_all_at_once(triples_groups):
+    knowledge_graph = KnowledgeGraph()
+    knowledge_graph.add_many(triple for triples in triples_groups
+        for triple in triples)
+    return knowledge_graph
+
+
+class Command(BaseCommand):
+    args = '<repeat>'
+    help = 'Compares insertion of triples one by one and in bulk (Lincoln fixture)'
+
+    def handle(self, *args, **options):
+        repeat = int(args[0]) if len(args) > 0 else 10
+        graphs = [deserialize_graph(value)
+            for value in load_fixtures_graphs(LINCOLN_FIXTURES)]
+        triples_groups = related_knowledge_triples(graphs)
+
+        self.stdout.write('{count} triples, repeat={repeat}'.format(
+            count=sum(len(triples) for triples in triples_groups),
+            repeat=repeat))
+        self.stdout.write('#method;time [ms];speedup')
+        base_time = None
+        for name, method in [
+                ('add (invalidating)', add_invalidating),
+                ('add', add_one_by_one),
+                ('add_many per term', add_in_bulk),
+                ('add_many', add_all_at_once)]:
+            start = time.time()
+            for i in range(repeat):
+                method(triples_groups)
+            method_time = (time.time() - start) / repeat
+            if base_time is None:
+                base_time = method_time
+            self.stdout.write('{name};{time:.1f};{speedup:.1f}x'.format(
+                name=name,
+                time=1000 * method_time,
+                speedup=base_time / method_time))
@@ -0,0 +1,45 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from common.utils import nlp
+from knowledge.utils.text import shallow_parsing
+
+import nltk.data
+import time
+
+TEXT = ('Abraham Lincoln was the 16th President of the United States. '
+    'He led the country through the American Civil War.')
+
+
+def forget_models():
+    """
+    Removes loaded NLTK models (as in a newly started process).
+    """
+    nlp._models.clear()
+    nltk.data._resource_cache.clear()
+
+
+def measure(function):
+    start = time.time()
+    function()
+    return time.time() - start
+
+
+class Command(BaseCommand):
+    help = 'Measures latency of the first shallow parsing with and without preloaded NLTK models'
+
+    def handle(self, *args, **options):
+        forget_models()
+        cold_time = measure(lambda: shallow_parsing(TEXT))
+        warm_time = measure(lambda: shallow_parsing(TEXT))
+        forget_models()
+        preload_time = nlp.preload_models()
+        preloaded_time = measure(lambda: shallow_parsing(TEXT))
+
+        self.stdout.write('#case;time [ms]')
+        self.stdout.write('first request without preloading;{t:.1f}'.format(
+            t=1000 * cold_time))
+        self.stdout.write('next requests;{t:.1f}'.format(t=1000 * warm_time))
+        self.stdout.write('preloading (at start);{t:.1f}'.format(
+            t=1000 * preload_time))
+        self.stdout.write('first request after preloading;{t:.1f}'.format(
+            t=1000 * preloaded_time))
@@ -0,0 +1,119 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from knowledge.models import KnowledgeGraph
+from knowledge.namespaces import ONTOLOGY, RDF, TERM
+from knowledge.utils.similarity import NeighbourIndex
+
+import json
+import random
+import time
+
+# DBpedia and YAGO types together (e.g. yago:PresidentsOfTheUnitedStates)
+TYPES_COUNT = 5000
+TYPES_PER_TERM = (3, 20)
+
+
+def create_random_graph(terms_count, seed=0):
+    """
+    Returns knowledge graph with given number of terms with random types.
+    Types have skewed popularity (log-uniform distribution of type indices),
+    as there are few general types (e.g. Agent) and many specific ones.
+    """
+    generator = random.Random(seed)
+    types = [ONTOLOGY['Type{i}'.format(i=i)] for i in range(TYPES_COUNT)]
+    triples = []
+    for i in range(terms_count):
+        term = TERM['Term_{i}'.format(i=i)]
+        types_count = generator.randint(*TYPES_PER_TERM)
+        term_types = set()
+        while len(term_types) < types_count:
+            term_types.add(types[int(TYPES_COUNT ** generator.random()) - 1])
+        for type_uri in term_types:
+            triples.append((term, RDF['type'], type_uri))
+    knowledge_graph = KnowledgeGraph()
+    knowledge_graph.add_many(triples)
+    return knowledge_graph
+
+
+class Command(BaseCommand):
+    args = '<queries>'
+    help = 'Compares pairwise and vectorized one-vs-all similarity of terms'
+
+    def handle(self, *args, **options):
+        queries = int(args[0]) if len(args) > 0 else 10
+        self.stdout.write('#terms;pairwise [ms/query];build engine [ms];'
+            'vector [ms/query];dictionary [ms/query];speedup;'
+            'top neighbours [ms/query];max difference;types;'
+            'incidence matrix [kB];dense matrix [kB];'
+            'precompute neighbours [ms];stored neighbours [kB];'
+            'load stored neighbours [ms];stored neighbours [ms/query]')
+        for terms_count in [100, 1000, 10000]:
+            knowledge_graph = create_random_graph(terms_count)
+            all_terms = list(knowledge_graph.all_terms)
+            query_terms = random.Random(1).sample(all_terms, queries)
+
+            start = time.time()
+            expected = [{t: knowledge_graph.similarity(term, t)
+                for t in all_terms} for term in query_terms]
+            pairwise_time = (time.time() - start) / queries
+
+            start = time.time()
+            knowledge_graph.similarity_engine
+            build_time = time.time() - start
+
+            start = time.time()
+            for term in query_terms:
+                knowledge_graph.similarity_engine.similarity_vector(term)
+            vector_time = (time.time() - start) / queries
+
+            start = time.time()
+            results = [knowledge_graph.similarities(term)
+                for term in query_terms]
+            vectorized_time = (time.time() - start) / queries
+
+            start = time.time()
+            for term in query_terms:
+                knowledge_graph.neighbour_index.neighbours(term)
+            neighbours_time = (time.time() - start) / queries
+
+            difference = max(abs(result[t] - expected_result[t])
+                for result, expected_result in zip(results, expected)
+                for t in all_terms)
+            start = time.time()
+            knowledge_graph.precompute_neighbours()
+            precompute_time = time.time() - start
+            stored_data = json.dumps(knowledge_graph.neighbours_data)
+
+            # index loaded from the stored neighbours (as by a new instance)
+            start = time.time()
+            stored_index = NeighbourIndex.from_dict(json.loads(stored_data),
+                lambda: None)
+            load_time = time.time() - start
+            start = time.time()
+            for term in query_terms:
+                stored_index.neighbours(term)
+            stored_time = (time.time() - start) / queries
+
+            engine = knowledge_graph.similarity_engine
+            # float64 terms x types matrix
+            dense_size = 8 * len(engine.terms) * len(engine.types)
+            self.stdout.write('{terms};{pairwise:.2f};{build:.1f};{vector:.2f};'
+                '{vectorized:.2f};{speedup:.1f}x;{neighbours:.2f};'
+                '{difference:.1e};{types};{incidence:.1f};{dense:.1f};'
+                '{precompute:.1f};{stored_size:.1f};{load:.1f};'
+                '{stored:.3f}'.format(
+                    terms=terms_count,
+                    pairwise=1000 * pairwise_time,
+                    build=1000 * build_time,
+                    vector=1000 * vector_time,
+                    vectorized=1000 * vectorized_time,
+                    speedup=pairwise_time / vectorized_time,
+                    neighbours=1000 * neighbours_time,
+                    difference=difference,
+                    types=len(engine.types),
+                    incidence=engine.memory_size() / 1024.0,
+                    dense=dense_size / 1024.0,
+                    precompute=1000 * precompute_time,
+                    stored_size=len(stored_data) / 1024.0,
+                    load=1000 * load_time,
+                    stored=1000 * stored_time))
@@ -0,0 +1,75 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from knowledge.utils.terms import bulk_create_terms_trie, bulk_create_terms_matcher
+from knowledge.utils.text import terms_inference, _find_terms_in_trie
+
+import random
+import time
+
+
+def create_random_article(terms_count=1000, sentences_count=2000,
+        sentence_length=25, vocabulary_size=3000, seed=0):
+    """
+    Returns (sentences, terms) in the format of Article.content: terms are
+    random sequences of 1-4 words, sentences are random words with some
+    occurrences of terms (and their prefixes).
+    """
+    generator = random.Random(seed)
+    vocabulary = ['word{i}'.format(i=i) for i in range(vocabulary_size)]
+    terms = []
+    for i in range(terms_count):
+        words = generator.sample(vocabulary, generator.randint(1, 4))
+        terms.append((' '.join(words), [[word, 'NNP'] for word in words]))
+    sentences = []
+    for i in range(sentences_count):
+        sentence = []
+        while len(sentence) < sentence_length:
+            if generator.random() < 0.2:
+                name, tagged_name = generator.choice(terms)
+                sentence.extend(tagged_name[:generator.randint(1, len(tagged_name))])
+            else:
+                sentence.append([generator.choice(vocabulary), 'NN'])
+        sentences.append(sentence)
+    return sentences, terms
+
+
+def measure(function, repeat):
+    start = time.time()
+    for i in range(repeat):
+        function()
+    return (time.time() - start) / repeat
+
+
+class Command(BaseCommand):
+    args = '<repeat>'
+    help = 'Compares terms matching by trie walks and by compiled automaton'
+
+    def handle(self, *args, **options):
+        repeat = int(args[0]) if len(args) > 0 else 10
+        sentences, terms = create_random_article()
+        sentences_words = [[token[0] for token in sentence]
+            for sentence in sentences]
+        tokens_count = sum(len(words) for words in sentences_words)
+        terms_trie = bulk_create_terms_trie(terms)
+        terms_matcher = bulk_create_terms_matcher(terms)
+
+        self.stdout.write('{sentences} sentences, {tokens} tokens, {terms} terms,'
+            ' repeat={repeat}'.format(sentences=len(sentences),
+                tokens=tokens_count, terms=len(terms), repeat=repeat))
+        self.stdout.write('#method;matching [ms];throughput [tokens/s];'
+            'terms inference [ms]')
+        for name, find_terms, matcher in [
+                ('trie', lambda words: _find_terms_in_trie(words, terms_trie),
+                    terms_trie),
+                ('automaton', terms_matcher.find_terms, terms_matcher)]:
+            matching_time = measure(
+                lambda: [find_terms(words) for words in sentences_words],
+                repeat)
+            inference_time = measure(
+                lambda: terms_inference(sentences, matcher), repeat)
+            self.stdout.write('{name};{matching:.2f};{throughput:.0f};'
+                '{inference:.1f}'.format(
+                    name=name,
+                    matching=1000 * matching_time,
+                    throughput=tokens_count / matching_time,
+                    inference=1000 * inference_time))
@@ -0,0 +1,43 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from knowledge.models import UnresolvedTerm
+from knowledge.utils.terms import term_to_name
+from optparse import make_option
+
+import datetime
+
+
+class Command(BaseCommand):
+    help = 'Lists (or purges) terms which DBpedia could not resolve'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--purge',
+            action='store_true',
+            dest='purge',
+            default=False,
+            help='Delete all unresolved terms'),
+        make_option('--purge-expired',
+            action='store_true',
+            dest='purge_expired',
+            default=False,
+            help='Delete only expired unresolved terms'),
+    )
+
+    def handle(self, *args, **options):
+        if options['purge'] or options['purge_expired']:
+            count = UnresolvedTerm.objects.purge(
+                expired_only=not options['purge'])
+            self.stdout.write('Deleted {count} unresolved terms'.format(
+                count=count))
+            return
+
+        now = datetime.datetime.now()
+        format_description = '{term};{reason};{expires}{expired}'
+        self.stdout.write('#' + format_description)
+        for unresolved_term in UnresolvedTerm.objects.order_by('expires'):
+            line = format_description.format(
+                term=term_to_name(unresolved_term.term),
+                reason=unresolved_term.reason,
+                expires=unresolved_term.expires.strftime('%Y-%m-%d %H:%M'),
+                expired=' (expired)' if unresolved_term.expires <= now else '')
+            self.stdout.write(line)
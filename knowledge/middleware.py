@@ -0,0 +1,33 @@
+from __future__ import unicode_literals
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from knowledge.utils.graph_serialization import get_parse_count, reset_parse_count
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GraphParseCounterMiddleware(object):
+    """
+    Counts graph deserializations during each request (to verify that hot
+    paths don't parse knowledge graphs). The count is reported in the
+    X-Graph-Parses response header and logged. It's used only in DEBUG mode.
+    """
+
+    HEADER = 'X-Graph-Parses'
+
+    def __init__(self):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed()
+
+    def process_request(self, request):
+        reset_parse_count()
+
+    def process_response(self, request, response):
+        parse_count = get_parse_count()
+        response[self.HEADER] = str(parse_count)
+        if parse_count > 0:
+            logger.debug('{count} graph(s) parsed during request {path}'.format(
+                count=parse_count, path=request.path))
+        return response
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import knowledge.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0002_auto_20150410_2004'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnresolvedTerm',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('term', knowledge.fields.TermField(unique=True)),
+                ('reason', models.CharField(max_length=10, choices=[('error', 'retrieval failed'), ('empty', 'empty graph')])),
+                ('expires', models.DateTimeField(db_index=True)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+    ]
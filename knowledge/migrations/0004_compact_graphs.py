@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from knowledge.utils.graph_serialization import serialize_graph, deserialize_graph
+from knowledge.utils.graph_serialization import is_compact, LEGACY_FORMAT
+
+
+def _convert_graphs(apps, to_compact):
+    """
+    Rewrites all stored graphs to compact (or legacy turtle) format.
+    """
+    KnowledgeGraph = apps.get_model('knowledge', 'KnowledgeGraph')
+    # raw values are used to avoid deserialization by the field
+    rows = KnowledgeGraph.objects.values_list('pk', 'graph').iterator()
+    for pk, value in rows:
+        if not value or is_compact(value) == to_compact:
+            continue
+        graph = deserialize_graph(value)
+        if to_compact:
+            value = serialize_graph(graph)
+        else:
+            value = graph.serialize(format=LEGACY_FORMAT).decode('utf-8')
+        KnowledgeGraph.objects.filter(pk=pk).update(graph=value)
+
+
+def graphs_to_compact_format(apps, schema_editor):
+    _convert_graphs(apps, to_compact=True)
+
+
+def graphs_to_legacy_format(apps, schema_editor):
+    _convert_graphs(apps, to_compact=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0003_unresolvedterm'),
+    ]
+
+    operations = [
+        migrations.RunPython(graphs_to_compact_format, graphs_to_legacy_format),
+    ]
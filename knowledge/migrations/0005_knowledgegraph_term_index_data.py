@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from knowledge.utils.graph_serialization import deserialize_graph
+from knowledge.utils.term_index import TermIndex
+import common.fields
+import json
+
+
+def compute_term_indexes(apps, schema_editor):
+    """
+    Computes term indexes of all stored knowledge graphs.
+    """
+    KnowledgeGraph = apps.get_model('knowledge', 'KnowledgeGraph')
+    rows = KnowledgeGraph.objects.values_list('pk', 'graph').iterator()
+    for pk, value in rows:
+        if not value:
+            continue
+        index = TermIndex.from_graph(deserialize_graph(value))
+        KnowledgeGraph.objects.filter(pk=pk).update(
+            term_index_data=json.dumps(index.to_dict()))
+
+
+def forget_term_indexes(apps, schema_editor):
+    # the column is removed by reversing AddField
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0004_compact_graphs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgegraph',
+            name='term_index_data',
+            field=common.fields.DictField(default=None, null=True, blank=True),
+            preserve_default=True,
+        ),
+        migrations.RunPython(compute_term_indexes,
+            forget_term_indexes),
+    ]
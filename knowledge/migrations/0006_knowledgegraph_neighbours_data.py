@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from knowledge.utils.similarity import TypeSimilarityEngine, NeighbourIndex
+from knowledge.utils.term_index import TermIndex
+import common.fields
+import json
+
+
+def precompute_neighbours(apps, schema_editor):
+    """
+    Precomputes neighbours of terms of all stored knowledge graphs (except
+    graphs of global knowledge).
+    """
+    KnowledgeGraph = apps.get_model('knowledge', 'KnowledgeGraph')
+    rows = KnowledgeGraph.objects\
+        .exclude(knowledge_builder__behavior_name='global-knowledge')\
+        .values_list('pk', 'term_index_data').iterator()
+    for pk, value in rows:
+        if not value:
+            continue
+        term_index = TermIndex.from_dict(json.loads(value))
+        if term_index is None:
+            continue
+        engine = TypeSimilarityEngine(term_index.all_terms,
+            term_index.types_of_term)
+        neighbour_index = NeighbourIndex(lambda: engine)
+        neighbour_index.precompute()
+        KnowledgeGraph.objects.filter(pk=pk).update(
+            neighbours_data=json.dumps(neighbour_index.to_dict()))
+
+
+def forget_neighbours(apps, schema_editor):
+    # the column is removed by reversing AddField
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0005_knowledgegraph_term_index_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgegraph',
+            name='neighbours_data',
+            field=common.fields.DictField(default=None, null=True, blank=True),
+            preserve_default=True,
+        ),
+        migrations.RunPython(precompute_neighbours,
+            forget_neighbours),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import common.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0006_knowledgegraph_neighbours_data'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='knowledgegraph',
+            name='neighbours_data',
+            field=common.fields.LazyDictField(default=None, null=True, blank=True),
+            preserve_default=True,
+        ),
+    ]
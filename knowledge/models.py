@@ -1,26 +1,40 @@
 # encoding=utf-8
 from __future__ import unicode_literals
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.utils.functional import cached_property
 
 from abstract_component.models import Component
 #from common.utils.http import iri2uri
+from common.utils.locks import SingleFlight
 from common.utils.metrics import euclidian_length, sigmoid
+from common.utils.progress import get_progress_reporter
 from common.utils.wiki import uri_to_name
-from common.fields import DictField
+from common.fields import DictField, LazyDictField
 from common.settings import ONLINE_ENABLED
+from common.settings import DBPEDIA_SPARQL_ENDPOINT, DBPEDIA_BATCH_SIZE
+from common.settings import DBPEDIA_WORKERS, DBPEDIA_DEADLINE
+from common.settings import UNRESOLVED_TERM_ERROR_TTL, UNRESOLVED_TERM_EMPTY_TTL
+from common.settings import UNRESOLVED_TERM_MIRROR_TTL
 from knowledge.fields import GraphField, TermField
 from knowledge.namespaces import NAMESPACES_DICT, RDF, RDFS, ONTOLOGY, SMARTOO, TERM
-from knowledge.utils.terms import bulk_create_terms_trie, name_to_term  # , term_to_name
-from knowledge.utils.text import shallow_parsing, shallow_parsing_phrases, terms_inference
-from knowledge.utils.sparql import retrieve_graph_from_dbpedia
+from knowledge.utils.terms import bulk_create_terms_matcher, name_to_term  # , term_to_name
+from knowledge.utils.terms import persons_names
+from knowledge.utils.analysis_cache import article_analysis_cache, content_hash
+from knowledge.utils.token_store import TokenStore, LazySentences
+from knowledge.utils.text import shallow_parsing, shallow_parsing_phrases
+from knowledge.utils.sparql import retrieve_graph_from_dbpedia, retrieve_graphs_from_dbpedia
+from knowledge.utils.concurrent_retrieval import retrieve_graphs_concurrently
+from knowledge.utils.term_index import TermIndex
+from knowledge.utils.similarity import TypeSimilarityEngine, NeighbourIndex
 
 from rdflib import Graph, URIRef
 from collections import defaultdict
 from wikipedia.exceptions import WikipediaException
 #from nltk import ParentedTree
 import wikipedia
+import datetime
+import hashlib
 import logging
 import traceback
 
@@ -49,13 +63,21 @@ class KnowledgeBuilder(Component):
             IntegrityError: if this knowledge builder is not already in DB
                 (its ID is needed to store the graph)
             ValueError: if the topic is invalid (there is no such topic)
+            LockTimeout: if the knowledge graph is being built by another
+                process for too long
         """
         # At first check if the knowledge graph hasn't already been created
-        # (for this builder-topic combo)
-        if KnowledgeGraph.objects.filter(topic=topic,
-                knowledge_builder=self).exists():
-            return  # already created, nothing to do
-
+        # (for this builder-topic combo); if it's being created by another
+        # process, wait for it
+        is_built = KnowledgeGraph.objects.filter(topic=topic,
+            knowledge_builder=self).exists
+        key = 'build-knowledge:{builder}:{topic}'.format(builder=self.pk,
+            topic=topic)
+        with SingleFlight(key, is_done=is_built) as leader:
+            if leader:
+                self._build_knowledge(topic)
+
+    def _build_knowledge(self, topic):
         try:
             behavior = self.get_behavior()
         except Exception:
@@ -78,6 +100,7 @@ class KnowledgeBuilder(Component):
 
         knowledge_graph.knowledge_builder = self
         knowledge_graph.topic = topic
+        knowledge_graph.precompute_neighbours()
         knowledge_graph.save()
 
     def __str__(self):
@@ -192,7 +215,8 @@ class Article(models.Model):
     def sentences(self):
         """
         List of sentences in the article.
-        Each sentence is represented as a tree.
+        Each sentence is represented as a tree (trees are built lazily, only
+        for accessed sentences).
         """
         return self.parse_terms_and_sentences(return_sentences=True)
 
@@ -201,7 +225,21 @@ class Article(models.Model):
         """
         Dictionary mapping terms to their positions in sentences
         """
-        return self.parse_terms_and_sentences(return_terms=True)
+        # NOTE: all sentences trees are built (and kept by this instance)
+        terms_positions = defaultdict(list)
+        for index in range(len(self.sentences)):
+            for term_node in self.sentences.term_nodes(index):
+                terms_positions[term_node.term].append(term_node)
+        return terms_positions
+
+    @cached_property
+    def token_store(self):
+        """
+        Compact representation of sentences and terms occurrences
+        (TokenStore).
+        """
+        self.parse_terms_and_sentences()
+        return self.token_store
 
     @cached_property
     def euclidian_length(self):
@@ -219,22 +257,46 @@ class Article(models.Model):
         # content must be set before
         assert self.content is not None
 
-        # vytvoreni TermsTrie ze vsech pojmu
-        terms_trie = bulk_create_terms_trie(self.content['terms'], knowledge_graph)
+        key = self._analysis_key(knowledge_graph)
+        token_store = article_analysis_cache.get(key) if key else None
+        if token_store is None:
+            # vytvoreni TermsTrie ze vsech pojmu (zkompilovaneho do automatu)
+            terms_matcher = bulk_create_terms_matcher(self.content['terms'], knowledge_graph)
 
-        sentences, terms_positions = terms_inference(self.content['sentences'], terms_trie)
+            token_store = TokenStore(self.content['sentences'], terms_matcher)
+            if key:
+                article_analysis_cache.set(key, token_store,
+                    token_store.memory_size())
 
-        # set both self.sentences and self.terms_positions
-        self.sentences = sentences
-        self.terms_positions = terms_positions
+        # set self.token_store and self.sentences (the token store can be
+        # shared, but sentence trees are built and kept only by this instance,
+        # terms positions will be computed from them when needed)
+        self.token_store = token_store
+        self.sentences = LazySentences(token_store)
+        self.__dict__.pop('terms_positions', None)
 
         # return what was requested
         if return_terms and return_sentences:
-            return terms_positions, sentences
+            return self.terms_positions, self.sentences
         elif return_terms:
-            return terms_positions
+            return self.terms_positions
         elif return_sentences:
-            return sentences
+            return self.sentences
+
+    def _analysis_key(self, knowledge_graph=None):
+        """
+        Returns key of the article analysis in the cache (None if the article
+        is not stored in DB). Knowledge graph revision is a hash of the persons
+        among the terms, as this is the only information from the knowledge
+        graph which influences the analysis.
+        """
+        if self.pk is None:
+            return None
+        revision = None
+        if knowledge_graph:
+            persons = sorted(persons_names(self.content['terms'], knowledge_graph))
+            revision = hashlib.md5('\n'.join(persons).encode('utf-8')).hexdigest()
+        return (self.pk, content_hash(self.content), revision)
 
     def get_name(self):
         """
@@ -246,7 +308,7 @@ class Article(models.Model):
         """
         Returns set of all terms in the article.
         """
-        return set(self.terms_positions.keys())
+        return set(self.token_store.term_counts)
 
     def get_term_positions(self, term):
         """
@@ -258,7 +320,7 @@ class Article(models.Model):
         """
         Returns number of occurences of given term in the article
         """
-        occurences = len(self.get_term_positions(term))
+        occurences = self.token_store.term_count(term)
         if term == self.topic:
             occurences += self.HEADLINE_WEIGHT
         return occurences
@@ -307,7 +369,31 @@ class KnowledgeGraph(models.Model):
     # graph representation
     graph = GraphField(default=get_initialized_graph)
 
-    _CACHED_ATTRIBUTES = ['terms_of_type', 'types_of_term', 'all_terms']
+    # precomputed index of terms, types and labels (see TermIndex.to_dict),
+    # it's computed from the graph if it's missing (e.g. for legacy rows) and
+    # decoded only when the index is needed
+    term_index_data = LazyDictField(null=True, blank=True, default=None)
+
+    # precomputed most similar terms of all terms (see NeighbourIndex.to_dict),
+    # they are computed when the graph is built (missing for global knowledge)
+    # and decoded only when the neighbour index is needed
+    neighbours_data = LazyDictField(null=True, blank=True, default=None)
+
+    # the graph has changed since the neighbours were precomputed
+    _neighbours_outdated = False
+
+    @cached_property
+    def term_index(self):
+        """
+        Index of terms, their types and labels (TermIndex).
+        """
+        if self.term_index_data:
+            index = TermIndex.from_dict(self.term_index_data)
+            if index is not None:
+                return index
+        return TermIndex.from_graph(self.graph)
+
+    _CACHED_ATTRIBUTES = ['similarity_engine', 'neighbour_index']
 
     def _update_notification(self):
         # after an update, we may need to recompute some attributes
@@ -316,12 +402,56 @@ class KnowledgeGraph(models.Model):
         # computation of attribute if it is not cached.
         for attribute in self._CACHED_ATTRIBUTES:
             self.__dict__.pop(attribute, None)
+        # precomputed neighbours will be computed again before saving
+        if not KnowledgeGraph.neighbours_data.is_null(self):
+            self.neighbours_data = None
+            self._neighbours_outdated = True
+
+    def save(self, *args, **kwargs):
+        # store the index with the graph (if it could have changed)
+        if (KnowledgeGraph.term_index_data.is_null(self)
+                or 'term_index' in self.__dict__):
+            self.term_index_data = self.term_index.to_dict()
+        if self._neighbours_outdated:
+            self.precompute_neighbours()
+        super(KnowledgeGraph, self).save(*args, **kwargs)
+
+    def precompute_neighbours(self):
+        """
+        Computes the most similar terms for all terms in the graph (they are
+        stored with the graph, see neighbour_index).
+        """
+        neighbour_index = self.neighbour_index
+        neighbour_index.precompute()
+        self.neighbours_data = neighbour_index.to_dict()
+        self._neighbours_outdated = False
 
     def add(self, triple):
         """
         Adds new triple to knowledge graph.
         """
+        # NOTE: index must be obtained before the graph is changed (otherwise
+        # it could be computed from the already changed graph)
+        term_index = self.term_index
         self.graph.add(triple)
+        term_index.add(triple)
+        self._update_notification()
+
+    def add_many(self, triples):
+        """
+        Adds many triples to knowledge graph at once (by a single insertion
+        into the graph and a single invalidation of cached attributes).
+
+        Args:
+            triples: iterable of triples
+        """
+        triples = list(triples)
+        term_index = self.term_index
+        graph = self.graph
+        graph.addN((subject, predicate, obj, graph)
+            for subject, predicate, obj in triples)
+        for triple in triples:
+            term_index.add(triple)
         self._update_notification()
 
     def add_related_global_knowledge(self, article,
@@ -345,19 +475,22 @@ class KnowledgeGraph(models.Model):
             if primary_graph:
                 terms.update(primary_graph.all_terms)
 
+            # retrieve graphs for all terms at once
+            secondary_graphs = global_knowledge.get_graphs(terms, online=online)
+
+            triples = []
             for term in terms:
                 # add the term in graph
-                self.add((term, RDF['type'], SMARTOO['term']))
-                secondary_graph = global_knowledge.get_graph(term, online=online)
+                triples.append((term, RDF['type'], SMARTOO['term']))
+                secondary_graph = secondary_graphs[term]
 
                 if not secondary_graph:
                     continue
 
                 for predicate in predicates:
                     for value in secondary_graph.get_objects(term, predicate):
-                        self.add((term, predicate, value))
-
-            self._update_notification()
+                        triples.append((term, predicate, value))
+            self.add_many(triples)
         except ValueError:
             #logger.error('ValueError: ' + unicode(article.topic) + '\n' + traceback.f)
             logger.error(traceback.format_exc())
@@ -385,7 +518,7 @@ class KnowledgeGraph(models.Model):
         Returns:
             label [unicode]
         """
-        result = self.graph.label(uri)
+        result = self.term_index.labels.get(uri)
         if result:
             return unicode(result)
         elif fallback_guess:
@@ -429,26 +562,50 @@ class KnowledgeGraph(models.Model):
         return similarity
 
     @cached_property
+    def similarity_engine(self):
+        """
+        Engine for computing similarity of a term to all terms in the graph
+        (TypeSimilarityEngine).
+        """
+        return TypeSimilarityEngine(self.all_terms, self.types_of_term)
+
+    def similarities(self, term):
+        """
+        Measures the similarity (see similarity()) between the given term and
+        all terms in the knowledge graph at once.
+
+        Returns:
+            dictionary mapping terms to their similarity to the given term
+        """
+        return self.similarity_engine.similarities(term)
+
+    @cached_property
+    def neighbour_index(self):
+        """
+        Index of the most similar terms for each term (NeighbourIndex), it's
+        loaded from precomputed neighbours if they are stored.
+        """
+        get_engine = lambda: self.similarity_engine
+        if self.neighbours_data:
+            index = NeighbourIndex.from_dict(self.neighbours_data, get_engine)
+            if index is not None:
+                return index
+        return NeighbourIndex(get_engine)
+
+    @property
     def types_of_term(self):
         """
         Mapping from terms to a set of their types (each type is URIRef).
         """
-        types_dict = defaultdict(set)
-        for term, type_uri in self.graph.subject_objects(predicate=RDF['type']):
-            types_dict[term].add(type_uri)
-        return types_dict
+        return self.term_index.types_of_term
 
-    @cached_property
+    @property
     def terms_of_type(self):
         """
         Mapping form types to all terms of that type (in the graph).
         """
-        terms_dict = defaultdict(set)
-        for term, type_uri in self.graph.subject_objects(predicate=RDF['type']):
-            terms_dict[type_uri].add(term)
-        return terms_dict
+        return self.term_index.terms_of_type
 
-    # if it's used often, consider caching (@cached_property etc.)
     @property
     def all_terms(self):
         """
@@ -456,14 +613,7 @@ class KnowledgeGraph(models.Model):
 
         As terms are consider all subjects/objects in the TERM namespace.
         """
-        terms = set()
-        term_prefix = unicode(TERM)
-        # NOTE: Graph.all_nodes() iterates through all subjects and objects
-        for node in self.graph.all_nodes():
-            if isinstance(node, URIRef) and node.startswith(term_prefix):
-                terms.add(node)
-
-        return terms
+        return self.term_index.all_terms
 
     def get_subjects(self, predicate=None, object=None):
         return list(self.graph.subjects(predicate, object))
@@ -486,13 +636,173 @@ class KnowledgeGraph(models.Model):
 #   Global Knowledge
 # ----------------------------------------------------------------------------
 
+class UnresolvedTermManager(models.Manager):
+    """
+    Negative cache of terms which DBpedia can't resolve. Unresolved terms are
+    stored in DB and mirrored in process memory for a short time (records can
+    be purged by other processes).
+    """
+
+    # in-process mirror: term -> time until which the term is considered
+    # unresolved without checking the DB
+    _mirror = {}
+    mirror_ttl = UNRESOLVED_TERM_MIRROR_TTL
+
+    def _to_term(self, value):
+        # values_list returns raw values (not URIRefs, which are not equal to
+        # strings)
+        return self.model._meta.get_field('term').to_python(value)
+
+    def _remember(self, term, expires):
+        """
+        Mirrors unresolved term (but not longer than for mirror_ttl).
+        """
+        trusted_until = datetime.datetime.now() \
+            + datetime.timedelta(seconds=self.mirror_ttl)
+        self._mirror[term] = min(expires, trusted_until)
+
+    def record(self, terms, reason):
+        """
+        Stores given terms as unresolved (or prolongs their expiration).
+
+        Args:
+            terms: collection of terms [URIRef]
+            reason: UnresolvedTerm.ERROR or UnresolvedTerm.EMPTY
+        """
+        terms = set(terms)
+        if not terms:
+            return
+        ttl = UnresolvedTerm.TTL[reason]
+        expires = datetime.datetime.now() + datetime.timedelta(seconds=ttl)
+        terms = list(terms)
+        for start in range(0, len(terms), GlobalKnowledge.LOOKUP_CHUNK_SIZE):
+            chunk = terms[start:start + GlobalKnowledge.LOOKUP_CHUNK_SIZE]
+            self._record_chunk(chunk, reason, expires)
+        for term in terms:
+            self._remember(term, expires)
+
+    def _record_chunk(self, terms, reason, expires):
+        # existing records are updated at once, missing ones created at once
+        records = self.filter(term__in=terms)
+        stored_terms = set(self._to_term(value)
+            for value in records.values_list('term', flat=True))
+        records.update(reason=reason, expires=expires)
+        missing_terms = [term for term in terms if term not in stored_terms]
+        if not missing_terms:
+            return
+        try:
+            with transaction.atomic():
+                self.bulk_create([UnresolvedTerm(term=term, reason=reason,
+                    expires=expires) for term in missing_terms])
+        except IntegrityError:
+            # some of the terms has been just recorded by another process
+            for term in missing_terms:
+                with transaction.atomic():
+                    self.update_or_create(term=term,
+                        defaults={'reason': reason, 'expires': expires})
+
+    def get_unresolved(self, terms):
+        """
+        Returns set of given terms which are known to be unresolvable (and
+        the information hasn't expired yet).
+        """
+        now = datetime.datetime.now()
+        unresolved = set()
+        unknown_terms = []
+        for term in set(terms):
+            expires = self._mirror.get(term)
+            if expires is not None and expires > now:
+                unresolved.add(term)
+            else:
+                unknown_terms.append(term)
+
+        for start in range(0, len(unknown_terms), GlobalKnowledge.LOOKUP_CHUNK_SIZE):
+            chunk = unknown_terms[start:start + GlobalKnowledge.LOOKUP_CHUNK_SIZE]
+            records = self.filter(term__in=chunk, expires__gt=now)\
+                .values_list('term', 'expires')
+            for value, expires in records:
+                term = self._to_term(value)
+                self._remember(term, expires)
+                unresolved.add(term)
+        return unresolved
+
+    def is_unresolved(self, term):
+        return term in self.get_unresolved([term])
+
+    def purge(self, expired_only=False):
+        """
+        Deletes records from the negative cache (all or only expired).
+
+        Returns:
+            number of deleted records
+        """
+        records = self.all()
+        if expired_only:
+            records = records.filter(expires__lte=datetime.datetime.now())
+        count = records.count()
+        records.delete()
+        # other processes forget the purged terms when their mirrors expire
+        self._mirror.clear()
+        return count
+
+
+class UnresolvedTerm(models.Model):
+    """
+    Model for a term which couldn't be resolved by DBpedia (see
+    UnresolvedTermManager).
+    """
+    ERROR = 'error'
+    EMPTY = 'empty'
+    REASONS = ((ERROR, 'retrieval failed'), (EMPTY, 'empty graph'))
+
+    TTL = {
+        ERROR: UNRESOLVED_TERM_ERROR_TTL,
+        EMPTY: UNRESOLVED_TERM_EMPTY_TTL
+    }
+
+    term = TermField(unique=True)
+    reason = models.CharField(max_length=10, choices=REASONS)
+    expires = models.DateTimeField(db_index=True)
+
+    objects = UnresolvedTermManager()
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __unicode__(self):
+        return '<UnresolvedTerm {term}; reason={reason}; expires={expires}>'.format(
+            term=self.term,
+            reason=self.reason,
+            expires=self.expires)
+
+
 class GlobalKnowledge(object):
     BEHAVIOR_NAME = 'global-knowledge'
 
-    def __init__(self):
+    # maximum number of terms in one "topic IN (...)" lookup (SQLite doesn't
+    # allow more than 999 query parameters)
+    LOOKUP_CHUNK_SIZE = 500
+
+    def __init__(self, endpoint=DBPEDIA_SPARQL_ENDPOINT,
+            batch_size=DBPEDIA_BATCH_SIZE, workers=DBPEDIA_WORKERS,
+            deadline=DBPEDIA_DEADLINE):
+        """
+        Args:
+            endpoint: URL of the SPARQL endpoint to retrieve graphs from
+            batch_size: maximum number of terms retrieved by a single query
+            workers: number of concurrent queries (if 1, graphs are retrieved
+                sequentially)
+            deadline: time limit for the retrieval of graphs by get_graphs;
+                terms which are not retrieved in time are skipped
+                (only for concurrent retrieval)
+        """
         # we don't need knowledge builder to build anything, but we need it as
         # an identifier for knowledge graphs which belongs to global knowledge
         self.knowledge_builder = self._get_global_knowledge_builder()
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.workers = workers
+        self.deadline = deadline
 
     def _get_global_knowledge_builder(self):
         """
@@ -527,21 +837,10 @@ class GlobalKnowledge(object):
                 knowledge_builder=self.knowledge_builder)
             return knowledge_graph
         except ObjectDoesNotExist:
-            if online:
+            if online and not UnresolvedTerm.objects.is_unresolved(term):
                 # use public endpoint to retrieve the graph
-                graph = retrieve_graph_from_dbpedia(term)
-
-                # store created graph in DB
-                try:
-                    knowledge_graph = KnowledgeGraph.objects.create(
-                        knowledge_builder=self.knowledge_builder,
-                        topic=term,
-                        graph=graph)
-                except Exception:
-                    logger.error('retrieve_graph_from_dbpedia failed\n' + traceback.format_exc())
-                    return None
-
-                return knowledge_graph
+                graph = retrieve_graph_from_dbpedia(term, endpoint=self.endpoint)
+                return self._store_graphs({term: graph})[term]
             else:
                 return None
 
@@ -549,3 +848,146 @@ class GlobalKnowledge(object):
             logger.error('Getting graph for {term} failed; {message}; {excType}'
                 .format(term=term, message=exc.message, excType=unicode(type(exc))))
             return None
+
+    def get_graphs(self, terms, online=True):
+        """
+        Returns graphs for all given terms. Graphs which are not already
+        stored in DB are retrieved from public endpoint in batches (if
+        :online: is True) and stored.
+
+        Args:
+            terms: collection of terms [URIRef]
+            online: if graph is not in DB, should it get on the web? [bool]
+        Returns:
+            dictionary mapping terms to knowledge graphs (terms for which the
+            graph is not available are mapped to None)
+        """
+        terms = set(terms)
+        knowledge_graphs = self.get_stored_graphs(terms)
+        missing_terms = [term for term in terms if term not in knowledge_graphs]
+        for term in missing_terms:
+            knowledge_graphs[term] = None
+
+        if online and missing_terms:
+            # don't try again terms which DBpedia recently couldn't resolve
+            unresolved_terms = UnresolvedTerm.objects.get_unresolved(missing_terms)
+            missing_terms = [term for term in missing_terms
+                if term not in unresolved_terms]
+
+        if online and missing_terms:
+            # progress is reported as the number of terms which don't need to
+            # be retrieved anymore (stored, unresolved or just retrieved)
+            report_progress = get_progress_reporter()
+            known_count = len(terms) - len(missing_terms)
+            report_progress(known_count, len(terms))
+            progress = lambda count: report_progress(known_count + count,
+                len(terms))
+            # use public endpoint to retrieve the graphs
+            if self.workers > 1:
+                graphs = retrieve_graphs_concurrently(missing_terms,
+                    batch_size=self.batch_size,
+                    endpoint=self.endpoint,
+                    workers=self.workers,
+                    deadline=self.deadline,
+                    progress=progress)
+            else:
+                graphs = retrieve_graphs_from_dbpedia(missing_terms,
+                    batch_size=self.batch_size,
+                    endpoint=self.endpoint,
+                    progress=progress)
+            knowledge_graphs.update(self._store_graphs(graphs))
+
+        return knowledge_graphs
+
+    def get_stored_graphs(self, terms):
+        """
+        Returns graphs for given terms which are already stored in DB. Graphs
+        are loaded by a few bulk queries (instead of a query per term).
+
+        Args:
+            terms: collection of terms [URIRef]
+        Returns:
+            dictionary mapping terms to knowledge graphs (terms without
+            stored graph are not included)
+        """
+        terms = list(terms)
+        knowledge_graphs = {}
+        for start in range(0, len(terms), self.LOOKUP_CHUNK_SIZE):
+            chunk = terms[start:start + self.LOOKUP_CHUNK_SIZE]
+            stored_graphs = KnowledgeGraph.objects.filter(
+                knowledge_builder=self.knowledge_builder,
+                topic__in=chunk)
+            for knowledge_graph in stored_graphs:
+                knowledge_graphs[knowledge_graph.topic] = knowledge_graph
+        return knowledge_graphs
+
+    def _store_graphs(self, graphs):
+        """
+        Stores retrieved graphs in DB (by a single bulk query if possible).
+        Terms for which the retrieval failed or the graph is empty are
+        recorded as unresolved instead.
+
+        Args:
+            graphs: dictionary mapping terms to graphs (or None if the
+                retrieval failed)
+        Returns:
+            dictionary mapping terms to created knowledge graphs (graphs which
+            can't be stored are mapped to None)
+        """
+        UnresolvedTerm.objects.record(
+            [term for term, graph in graphs.items() if graph is None],
+            UnresolvedTerm.ERROR)
+        UnresolvedTerm.objects.record(
+            [term for term, graph in graphs.items()
+                if graph is not None and len(graph) == 0],
+            UnresolvedTerm.EMPTY)
+
+        knowledge_graphs = {}
+        for term, graph in graphs.items():
+            if graph:
+                knowledge_graphs[term] = KnowledgeGraph(
+                    knowledge_builder=self.knowledge_builder,
+                    topic=term,
+                    graph=graph)
+                # bulk_create doesn't call save(), so the index is set here
+                knowledge_graphs[term].term_index_data = \
+                    knowledge_graphs[term].term_index.to_dict()
+        try:
+            with transaction.atomic():
+                KnowledgeGraph.objects.bulk_create(knowledge_graphs.values())
+        except IntegrityError:
+            # some of the graphs has been already stored (e.g. by another
+            # process), store the graphs one by one
+            for term, knowledge_graph in knowledge_graphs.items():
+                knowledge_graphs[term] = self._store_graph(term,
+                    knowledge_graph.graph)
+        else:
+            # bulk_create doesn't set primary keys, so the stored graphs are
+            # loaded again
+            if knowledge_graphs:
+                knowledge_graphs = self.get_stored_graphs(list(knowledge_graphs))
+
+        for term, graph in graphs.items():
+            if not graph:
+                knowledge_graphs[term] = None
+        return knowledge_graphs
+
+    def _store_graph(self, term, graph):
+        """
+        Stores retrieved graph for the term in DB.
+
+        Returns:
+            created knowledge graph or None if it can't be stored (e.g.
+            the retrieval failed)
+        """
+        if graph is None:
+            return None
+        try:
+            with transaction.atomic():
+                return KnowledgeGraph.objects.create(
+                    knowledge_builder=self.knowledge_builder,
+                    topic=term,
+                    graph=graph)
+        except Exception:
+            logger.error('retrieve_graph_from_dbpedia failed\n' + traceback.format_exc())
+            return None
@@ -0,0 +1,129 @@
+"""
+Local stand-in for a SPARQL endpoint (for testing retrieval of global
+knowledge without connection to DBpedia).
+"""
+
+from __future__ import unicode_literals
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from rdflib import URIRef
+from urlparse import parse_qs, urlparse
+from urllib import unquote
+import json
+import re
+import threading
+import time
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeSparqlServer(object):
+    """
+    Minimal SPARQL endpoint running in a background thread. It only
+    understands the queries used for retrieving global knowledge, i.e. it
+    finds all subjects (URIs) in the query and returns all stored triples
+    about them.
+
+    Attributes:
+        triples: dictionary mapping subjects (URIRef) to list of
+            (predicate, object) pairs (object is an URIRef or a Literal)
+        queries: list of all received queries
+        fail_count: number of next requests to answer with HTTP error
+        delay: how long (in seconds) to wait before answering a request
+        max_concurrent: maximum number of simultaneously processed requests
+    """
+
+    SUBJECT_PATTERN = re.compile(r'<([^>]+)>')
+
+    def __init__(self, triples=None):
+        self.triples = triples or {}
+        self.queries = []
+        self.fail_count = 0
+        self.delay = 0
+        self.max_concurrent = 0
+        self._concurrent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0),
+            self._create_handler())
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        return 'http://127.0.0.1:{port}/sparql'.format(
+            port=self._server.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def answer(self, query):
+        """
+        Returns (status, body) of the response to the query.
+        """
+        with self._lock:
+            self._concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self._concurrent)
+        try:
+            time.sleep(self.delay)
+            return self._answer(query)
+        finally:
+            with self._lock:
+                self._concurrent -= 1
+
+    def _answer(self, query):
+        with self._lock:
+            self.queries.append(query)
+            if self.fail_count > 0:
+                self.fail_count -= 1
+                return 503, 'Service Unavailable'
+
+        # ignore namespaces in FILTER clauses
+        where_clause = query.split('FILTER')[0]
+        bindings = []
+        for subject_url in self.SUBJECT_PATTERN.findall(where_clause):
+            subject = unquote(subject_url.encode('utf-8')).decode('utf-8')
+            for predicate, obj in self.triples.get(URIRef(subject), []):
+                object_type = 'uri' if isinstance(obj, URIRef) else 'literal'
+                bindings.append({
+                    's': {'type': 'uri', 'value': subject_url},
+                    'p': {'type': 'uri', 'value': unicode(predicate)},
+                    'o': {'type': object_type, 'value': unicode(obj)}})
+        body = json.dumps({
+            'head': {'vars': ['s', 'p', 'o']},
+            'results': {'bindings': bindings}})
+        return 200, body
+
+    def _create_handler(self):
+        fake_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parameters = parse_qs(urlparse(self.path).query)
+                self._respond(parameters)
+
+            def do_POST(self):
+                length = int(self.headers.getheader('content-length', 0))
+                parameters = parse_qs(self.rfile.read(length))
+                self._respond(parameters)
+
+            def _respond(self, parameters):
+                query = parameters.get('query', [''])[0].decode('utf-8')
+                status, body = fake_server.answer(query)
+                self.send_response(status)
+                self.send_header('Content-Type',
+                    'application/sparql-results+json')
+                self.end_headers()
+                self.wfile.write(body.encode('utf-8'))
+
+            def log_message(self, *args):
+                pass  # keep test output clean
+
+        return Handler
@@ -6,6 +6,12 @@ from django.test import TestCase
 from common.settings import SKIP_ONLINE_TESTS
 from knowledge.models import Article, article_search
 from knowledge.namespaces import TERM
+from knowledge.utils.analysis_cache import AnalysisCache, article_analysis_cache
+from knowledge.utils.terms import bulk_create_terms_matcher
+from knowledge.utils.text import terms_inference, tag_sentences, shallow_parsing
+from knowledge.utils.token_store import TokenStore, LazySentences
+from common.utils.nlp import contextfree_sentences, is_contextfree
+from nltk import sent_tokenize, word_tokenize, pos_tag
 from unittest import skipIf
 
 
@@ -82,6 +88,16 @@ Probably encouraged by these dissensions among the men of Tabor, the Bohemian no
         #    print
         self.assertEqual(len(sentences), 19)
 
+    def test_parallel_shallow_parsing(self):
+        text = ('Prokop was a member of the Utraquists. He studied in Prague. '
+            'He then traveled for several years in foreign countries. '
+            'The struggle began at Prague. The Taborites were defeated.')
+        sentences = sent_tokenize(text)
+        expected = [pos_tag(word_tokenize(sentence)) for sentence in sentences]
+        self.assertEqual(tag_sentences(sentences, processes=1), expected)
+        self.assertEqual(tag_sentences(sentences, processes=2), expected)
+        self.assertEqual(shallow_parsing(text, processes=2), expected)
+
     #def test_nonexisting_article_retrieval(self):
     #    with self.assertRaises(ObjectDoesNotExist):
     #        Article.objects.get(topic=TERM['Mr_Alpha'])
@@ -114,3 +130,71 @@ class ArticleWithFixtureTestCase(TestCase):
         # 2 terms: Lincoln has 2 occurencs + 10 bonus as a topic, War has 1
         # occurence -> sqrt(12^2 + 1^2) = sqrt(145) ~= 12.041945
         self.assertAlmostEqual(euclidian_length, 12.041945, places=2)
+
+    def test_analysis_cache(self):
+        article_analysis_cache.clear()
+        sentences = self.article.get_sentences()
+        hits = article_analysis_cache.hits
+        # other instance of the same article uses the cached analysis
+        article = Article.objects.get(topic=self.topic)
+        self.assertEqual(article.get_sentences(), sentences)
+        self.assertIs(article.token_store, self.article.token_store)
+        self.assertEqual(article_analysis_cache.hits, hits + 1)
+        # but sentence trees are built only for the instance (so the shared
+        # store doesn't grow)
+        self.assertIsNot(article.get_sentences()[0], sentences[0])
+        self.assertEqual(article.token_store.memory_size(),
+            article_analysis_cache.size)
+        # positions of missing terms don't leak to other instances
+        article.get_term_positions(TERM['Pan_Tau'])
+        self.assertNotIn(TERM['Pan_Tau'],
+            Article.objects.get(topic=self.topic).get_all_terms())
+        # change of the content invalidates the analysis
+        article = Article.objects.get(topic=self.topic)
+        article.content['sentences'] = article.content['sentences'][:1]
+        self.assertEqual(len(article.get_sentences()), 1)
+        self.assertEqual(article_analysis_cache.hits, hits + 2)
+
+    def test_token_store_equals_terms_inference(self):
+        content = self.article.content
+        terms_matcher = bulk_create_terms_matcher(content['terms'])
+        sentences, terms_positions = terms_inference(content['sentences'],
+            terms_matcher)
+        token_store = TokenStore(content['sentences'], terms_matcher)
+        self.assertEqual(LazySentences(token_store), sentences)
+        for term, positions in terms_positions.items():
+            self.assertEqual(token_store.term_count(term), len(positions))
+        self.assertEqual(set(token_store.term_counts), set(terms_positions))
+
+    def test_lazy_sentences(self):
+        article_analysis_cache.clear()
+        sentences = self.article.get_sentences()
+        self.assertEqual(len(sentences._trees), 0)
+        # only context-free sentences are materialized
+        selected = contextfree_sentences(self.article)
+        self.assertEqual(len(sentences._trees), len(selected))
+        # term nodes are nodes of the materialized trees
+        for term_node in self.article.get_term_positions(self.topic):
+            self.assertIn(term_node.root(), list(sentences))
+        self.assertEqual(selected,
+            [s for s in sentences if is_contextfree(s)])
+        self.assertEqual(sentences[-1], sentences[len(sentences) - 1])
+        self.assertEqual(sentences[:1], [sentences[0]])
+
+
+class AnalysisCacheTestCase(TestCase):
+    def test_lru_eviction_by_size(self):
+        cache = AnalysisCache(max_size=100)
+        cache.set('a', 'A', 40)
+        cache.set('b', 'B', 40)
+        self.assertEqual(cache.get('a'), 'A')
+        # 'b' is the least recently used
+        cache.set('c', 'C', 40)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(cache.get('c'), 'C')
+        self.assertEqual(cache.size, 80)
+        # values bigger than the cache are not stored
+        cache.set('d', 'D', 101)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(len(cache), 2)
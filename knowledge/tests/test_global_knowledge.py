@@ -1,12 +1,21 @@
 # encoding=utf-8
 
 from __future__ import unicode_literals
+from django.core.management import call_command
 from django.test import TestCase
 from common.settings import SKIP_ONLINE_TESTS
 from knowledge.models import KnowledgeBuilder
-from knowledge.models import KnowledgeGraph, GlobalKnowledge
-from knowledge.namespaces import TERM
+from knowledge.models import KnowledgeGraph, GlobalKnowledge, UnresolvedTerm
+from knowledge.namespaces import RDF, RDFS, ONTOLOGY, TERM
+from knowledge.tests.fake_sparql import FakeSparqlServer
+from knowledge.utils.concurrent_retrieval import retrieve_graphs_concurrently
+from knowledge.utils.sparql import retrieve_graphs_from_dbpedia
+from knowledge.utils.terms import term_to_name
+from rdflib import Literal
+from StringIO import StringIO
 from unittest import skipIf
+import datetime
+import time
 
 
 class GlobalKnowledgeEmptyDBTestCase(TestCase):
@@ -68,3 +77,308 @@ class GlobalKnowledgeTestCase(TestCase):
         self.assertIsNotNone(knowledge_graph)
         self.assertIsInstance(knowledge_graph, KnowledgeGraph)
         self.assertGreater(len(knowledge_graph.graph), 0)
+
+
+class GlobalKnowledgeBatchRetrievalTestCase(TestCase):
+    """
+    Tests batched retrieval of global knowledge from a local SPARQL endpoint.
+    """
+    def setUp(self):
+        self.terms = [TERM['Term_{i}'.format(i=i)] for i in range(7)]
+        self.terms.append(TERM['John_C._Frémont'])
+        triples = {}
+        for term in self.terms:
+            triples[term] = [
+                (RDFS['label'], Literal(term_to_name(term))),
+                (RDF['type'], ONTOLOGY['Person']),
+                (ONTOLOGY['wikiPageID'], Literal('123'))]
+        self.server = FakeSparqlServer(triples).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_retrieve_graphs_from_dbpedia(self):
+        unknown_term = TERM['Unknown']
+        graphs = retrieve_graphs_from_dbpedia(self.terms + [unknown_term],
+            batch_size=3, endpoint=self.server.endpoint)
+        # 9 terms in batches of 3 -> 3 queries
+        self.assertEqual(len(self.server.queries), 3)
+        self.assertEqual(set(graphs.keys()), set(self.terms + [unknown_term]))
+        for term in self.terms:
+            graph = graphs[term]
+            # wiki predicates are filtered
+            self.assertEqual(len(graph), 2)
+            self.assertIn((term, RDF['type'], ONTOLOGY['Person']), graph)
+        self.assertEqual(len(graphs[unknown_term]), 0)
+
+    def test_retrieve_graphs_from_dbpedia_failure(self):
+        self.server.fail_count = 1
+        graphs = retrieve_graphs_from_dbpedia(self.terms, batch_size=5,
+            endpoint=self.server.endpoint)
+        # the first batch failed, the second one is OK
+        self.assertEqual(sum(1 for g in graphs.values() if g is None), 5)
+        self.assertEqual(sum(1 for g in graphs.values() if g is not None), 3)
+
+    def test_get_graphs(self):
+        global_knowledge = GlobalKnowledge(endpoint=self.server.endpoint,
+            batch_size=4)
+        knowledge_graphs = global_knowledge.get_graphs(self.terms)
+        self.assertEqual(len(self.server.queries), 2)
+        for term in self.terms:
+            self.assertIsInstance(knowledge_graphs[term], KnowledgeGraph)
+            self.assertEqual(knowledge_graphs[term].label(term,
+                fallback_guess=False), term_to_name(term))
+        # graphs are stored, so the second call doesn't use the endpoint
+        knowledge_graphs = global_knowledge.get_graphs(self.terms)
+        self.assertEqual(len(self.server.queries), 2)
+        self.assertEqual(len(knowledge_graphs), len(self.terms))
+        self.assertEqual(KnowledgeGraph.objects.filter(
+            knowledge_builder=global_knowledge.knowledge_builder).count(),
+            len(self.terms))
+
+    def test_get_graphs_offline(self):
+        global_knowledge = GlobalKnowledge(endpoint=self.server.endpoint)
+        knowledge_graphs = global_knowledge.get_graphs(self.terms,
+            online=False)
+        self.assertEqual(len(self.server.queries), 0)
+        self.assertTrue(all(g is None for g in knowledge_graphs.values()))
+
+
+class GlobalKnowledgeStoredGraphsTestCase(TestCase):
+    """
+    Tests bulk retrieval of global knowledge graphs already stored in DB.
+    """
+    def setUp(self):
+        self.global_knowledge = GlobalKnowledge()
+        self.stored_terms = [TERM['Term_{i}'.format(i=i)] for i in range(5)]
+        self.stored_terms.append(TERM['John_C._Frémont'])
+        for term in self.stored_terms:
+            KnowledgeGraph.objects.create(
+                knowledge_builder=self.global_knowledge.knowledge_builder,
+                topic=term)
+        # graph of a different builder shouldn't be returned
+        other_builder = KnowledgeBuilder.objects.create(behavior_name='fake')
+        self.other_term = TERM['Other']
+        KnowledgeGraph.objects.create(knowledge_builder=other_builder,
+            topic=self.other_term)
+
+    def test_get_stored_graphs(self):
+        missing_term = TERM['Missing']
+        terms = self.stored_terms + [missing_term, self.other_term]
+        with self.assertNumQueries(1):
+            knowledge_graphs = self.global_knowledge.get_stored_graphs(terms)
+        self.assertEqual(set(knowledge_graphs.keys()), set(self.stored_terms))
+        for term, knowledge_graph in knowledge_graphs.items():
+            self.assertEqual(knowledge_graph.topic, term)
+
+    def test_get_stored_graphs_chunks(self):
+        self.global_knowledge.LOOKUP_CHUNK_SIZE = 4
+        with self.assertNumQueries(2):
+            knowledge_graphs = self.global_knowledge.get_stored_graphs(
+                self.stored_terms)
+        self.assertEqual(len(knowledge_graphs), len(self.stored_terms))
+
+    def test_get_graphs_offline(self):
+        missing_term = TERM['Missing']
+        with self.assertNumQueries(1):
+            knowledge_graphs = self.global_knowledge.get_graphs(
+                self.stored_terms + [missing_term], online=False)
+        self.assertIsNone(knowledge_graphs[missing_term])
+        self.assertIsNotNone(knowledge_graphs[self.stored_terms[0]])
+
+
+class GlobalKnowledgeConcurrentRetrievalTestCase(TestCase):
+    """
+    Tests concurrent retrieval of global knowledge from a local SPARQL
+    endpoint.
+    """
+    def setUp(self):
+        self.terms = [TERM['Term_{i}'.format(i=i)] for i in range(12)]
+        triples = {}
+        for term in self.terms:
+            triples[term] = [(RDF['type'], ONTOLOGY['Person'])]
+        self.server = FakeSparqlServer(triples).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def retrieve(self, **kwargs):
+        parameters = {
+            'batch_size': 2,
+            'endpoint': self.server.endpoint,
+            'workers': 3,
+            'retries': 2,
+            'retry_backoff': 0.01,
+            'deadline': 10,
+            'requests_per_second': 1000}
+        parameters.update(kwargs)
+        return retrieve_graphs_concurrently(self.terms, **parameters)
+
+    def test_retrieve_graphs_concurrently(self):
+        self.server.delay = 0.05
+        graphs = self.retrieve()
+        self.assertEqual(set(graphs.keys()), set(self.terms))
+        for term in self.terms:
+            self.assertIn((term, RDF['type'], ONTOLOGY['Person']), graphs[term])
+        self.assertEqual(len(self.server.queries), 6)
+        # the number of concurrent requests is bounded by number of workers
+        self.assertGreater(self.server.max_concurrent, 1)
+        self.assertLessEqual(self.server.max_concurrent, 3)
+
+    def test_retries(self):
+        self.server.fail_count = 4
+        graphs = self.retrieve()
+        self.assertEqual(set(graphs.keys()), set(self.terms))
+        self.assertEqual(len(self.server.queries), 6 + 4)
+
+    def test_retries_exhausted(self):
+        self.server.fail_count = 3
+        graphs = self.retrieve(workers=1, retries=2)
+        # the first batch failed 3 times, its terms are reported as failed
+        self.assertEqual(set(graphs.keys()), set(self.terms))
+        self.assertEqual(sum(1 for g in graphs.values() if g is None), 2)
+
+    def test_retries_exhausted_recorded_as_unresolved(self):
+        global_knowledge = GlobalKnowledge(endpoint=self.server.endpoint)
+        self.server.fail_count = 1
+        graphs = self.retrieve(workers=1, retries=0)
+        try:
+            knowledge_graphs = global_knowledge._store_graphs(graphs)
+            failed_terms = set(term for term, knowledge_graph
+                in knowledge_graphs.items() if knowledge_graph is None)
+            self.assertEqual(len(failed_terms), 2)
+            self.assertEqual(
+                UnresolvedTerm.objects.get_unresolved(self.terms),
+                failed_terms)
+            self.assertEqual(set(UnresolvedTerm.objects.values_list(
+                'reason', flat=True)), set([UnresolvedTerm.ERROR]))
+        finally:
+            UnresolvedTerm.objects.purge()
+
+    def test_deadline(self):
+        self.server.delay = 0.3
+        graphs = self.retrieve(workers=2, deadline=0.45)
+        # only first two batches were retrieved before the deadline
+        self.assertEqual(len(graphs), 4)
+
+    def test_rate_limit(self):
+        start = time.time()
+        self.retrieve(workers=3, requests_per_second=20)
+        # 6 requests, 20 per second -> at least 0.25 s
+        self.assertGreaterEqual(time.time() - start, 0.25)
+
+    def test_get_graphs_concurrently(self):
+        global_knowledge = GlobalKnowledge(endpoint=self.server.endpoint,
+            batch_size=5, workers=2)
+        self.server.fail_count = 1
+        # stored graphs lookup + unresolved terms lookup + bulk insert
+        # (inside a savepoint) + lookup of the inserted graphs
+        with self.assertNumQueries(6):
+            knowledge_graphs = global_knowledge.get_graphs(self.terms)
+        self.assertEqual(len(knowledge_graphs), len(self.terms))
+        self.assertTrue(all(knowledge_graphs.values()))
+        # returned graphs are the stored ones
+        self.assertTrue(all(knowledge_graph.pk is not None
+            for knowledge_graph in knowledge_graphs.values()))
+        self.assertEqual(KnowledgeGraph.objects.filter(
+            knowledge_builder=global_knowledge.knowledge_builder).count(),
+            len(self.terms))
+
+
+class UnresolvedTermsTestCase(TestCase):
+    """
+    Tests negative cache of terms which DBpedia can't resolve.
+    """
+    def setUp(self):
+        self.known_term = TERM['Known']
+        self.empty_term = TERM['Empty']
+        self.server = FakeSparqlServer({
+            self.known_term: [(RDF['type'], ONTOLOGY['Person'])]}).start()
+        self.global_knowledge = GlobalKnowledge(endpoint=self.server.endpoint,
+            workers=1)
+
+    def tearDown(self):
+        self.server.stop()
+        UnresolvedTerm.objects.purge()
+
+    def test_empty_graph(self):
+        knowledge_graphs = self.global_knowledge.get_graphs(
+            [self.known_term, self.empty_term])
+        self.assertIsNotNone(knowledge_graphs[self.known_term])
+        self.assertIsNone(knowledge_graphs[self.empty_term])
+        self.assertEqual(len(self.server.queries), 1)
+        # empty graph is not stored, the term is remembered instead
+        self.assertFalse(KnowledgeGraph.objects.filter(
+            topic=self.empty_term).exists())
+        unresolved_term = UnresolvedTerm.objects.get(term=self.empty_term)
+        self.assertEqual(unresolved_term.reason, UnresolvedTerm.EMPTY)
+        # the unresolved term is not retrieved again
+        self.assertIsNone(self.global_knowledge.get_graph(self.empty_term))
+        self.global_knowledge.get_graphs([self.empty_term])
+        self.assertEqual(len(self.server.queries), 1)
+
+    def test_retrieval_error(self):
+        self.server.fail_count = 1
+        self.assertIsNone(self.global_knowledge.get_graph(self.known_term))
+        unresolved_term = UnresolvedTerm.objects.get(term=self.known_term)
+        self.assertEqual(unresolved_term.reason, UnresolvedTerm.ERROR)
+        self.assertIsNone(self.global_knowledge.get_graph(self.known_term))
+        self.assertEqual(len(self.server.queries), 1)
+
+    def test_expiration(self):
+        UnresolvedTerm.objects.record([self.known_term], UnresolvedTerm.ERROR)
+        self.assertTrue(UnresolvedTerm.objects.is_unresolved(self.known_term))
+        # expire the record (and forget the in-process mirror)
+        UnresolvedTerm.objects.update(
+            expires=datetime.datetime.now() - datetime.timedelta(seconds=1))
+        UnresolvedTerm.objects._mirror.clear()
+        self.assertFalse(UnresolvedTerm.objects.is_unresolved(self.known_term))
+        self.assertIsNotNone(self.global_knowledge.get_graph(self.known_term))
+        self.assertEqual(UnresolvedTerm.objects.purge(expired_only=True), 1)
+
+    def test_record_many(self):
+        terms = [TERM['Unresolved_{i}'.format(i=i)] for i in range(50)]
+        UnresolvedTerm.objects.record(terms[:20], UnresolvedTerm.EMPTY)
+        # select of recorded terms, their update and insert of the others
+        # (in a savepoint)
+        with self.assertNumQueries(5):
+            UnresolvedTerm.objects.record(terms, UnresolvedTerm.ERROR)
+        self.assertEqual(UnresolvedTerm.objects.filter(
+            reason=UnresolvedTerm.ERROR).count(), 50)
+
+    def test_unresolved_from_db(self):
+        UnresolvedTerm.objects.record([self.empty_term], UnresolvedTerm.EMPTY)
+        UnresolvedTerm.objects._mirror.clear()
+        self.assertTrue(UnresolvedTerm.objects.is_unresolved(self.empty_term))
+        # the term is mirrored again
+        with self.assertNumQueries(0):
+            self.assertTrue(UnresolvedTerm.objects.is_unresolved(
+                self.empty_term))
+
+    def test_mirror(self):
+        UnresolvedTerm.objects.record([self.empty_term], UnresolvedTerm.EMPTY)
+        with self.assertNumQueries(0):
+            self.assertTrue(UnresolvedTerm.objects.is_unresolved(
+                self.empty_term))
+
+    def test_mirror_expiration(self):
+        mirror_ttl = UnresolvedTerm.objects.mirror_ttl
+        try:
+            UnresolvedTerm.objects.mirror_ttl = 0
+            UnresolvedTerm.objects.record([self.empty_term],
+                UnresolvedTerm.EMPTY)
+            # purge by another process (this process mirror is not cleared)
+            UnresolvedTerm.objects.all().delete()
+            self.assertFalse(UnresolvedTerm.objects.is_unresolved(
+                self.empty_term))
+        finally:
+            UnresolvedTerm.objects.mirror_ttl = mirror_ttl
+
+    def test_management_command(self):
+        UnresolvedTerm.objects.record([self.empty_term], UnresolvedTerm.EMPTY)
+        output = StringIO()
+        call_command('unresolved_terms', stdout=output)
+        self.assertIn('Empty;empty;', output.getvalue())
+        call_command('unresolved_terms', purge=True, stdout=StringIO())
+        self.assertEqual(UnresolvedTerm.objects.count(), 0)
+        self.assertFalse(UnresolvedTerm.objects.is_unresolved(self.empty_term))
@@ -0,0 +1,96 @@
+# encoding=utf-8
+
+from __future__ import unicode_literals
+from django.test import TestCase
+from knowledge.fields import RDF_SERIALIZATION_FORMAT
+from knowledge.models import KnowledgeBuilder, KnowledgeGraph
+from knowledge.namespaces import RDF, RDFS, ONTOLOGY, TERM, XSD
+from knowledge.utils.graph_serialization import serialize_graph
+from knowledge.utils.graph_serialization import deserialize_graph, is_compact
+from knowledge.utils.graph_serialization import get_parse_count, reset_parse_count
+from rdflib import BNode, Graph, Literal, Namespace
+
+
+class GraphSerializationTestCase(TestCase):
+    def setUp(self):
+        self.graph = Graph()
+        NS = Namespace('http://example.com/test/')
+        self.graph.bind('ns', NS)
+        tom = TERM['Tom']
+        self.graph.add((tom, RDF['type'], ONTOLOGY['Person']))
+        self.graph.add((tom, RDFS['label'], Literal('Tom')))
+        self.graph.add((tom, RDFS['label'], Literal('Tomáš', lang='cs')))
+        self.graph.add((tom, NS['age'], Literal('42', datatype=XSD['integer'])))
+        self.graph.add((tom, NS['likes'], BNode('apples')))
+
+    def test_round_trip(self):
+        for compress in [False, True]:
+            value = serialize_graph(self.graph, compress=compress)
+            self.assertTrue(is_compact(value))
+            graph = deserialize_graph(value)
+            self.assertTrue(graph.isomorphic(self.graph))
+            self.assertEqual(set(graph), set(self.graph))
+            self.assertIn(('ns', Namespace('http://example.com/test/')),
+                list(graph.namespaces()))
+
+    def test_legacy_format(self):
+        value = self.graph.serialize(format=RDF_SERIALIZATION_FORMAT)
+        value = value.decode('utf-8')
+        self.assertFalse(is_compact(value))
+        graph = deserialize_graph(value)
+        self.assertTrue(graph.isomorphic(self.graph))
+
+    def test_unsupported_version(self):
+        value = serialize_graph(self.graph).replace('smartoo-graph/1;',
+            'smartoo-graph/99;')
+        with self.assertRaises(ValueError):
+            deserialize_graph(value)
+
+
+class GraphFieldTestCase(TestCase):
+    fixtures = ['lincoln-components-article-global_knowledge.xml']
+
+    def test_legacy_rows_are_readable(self):
+        # fixtures store graphs in the legacy (turtle) format
+        knowledge_builder = KnowledgeBuilder.objects.get(
+            behavior_name='fake', parameters={})
+        graph = Graph()
+        graph.add((TERM['Tom'], RDFS['label'], Literal('Tom')))
+        knowledge_graph = KnowledgeGraph.objects.create(
+            knowledge_builder=knowledge_builder,
+            topic=TERM['Tom'],
+            graph=graph)
+        KnowledgeGraph.objects.filter(pk=knowledge_graph.pk).update(
+            graph=graph.serialize(format=RDF_SERIALIZATION_FORMAT))
+        knowledge_graph = KnowledgeGraph.objects.get(pk=knowledge_graph.pk)
+        self.assertTrue(knowledge_graph.graph.isomorphic(graph))
+        # after saving, graph is stored in the compact format
+        knowledge_graph.save()
+        value = KnowledgeGraph.objects.filter(pk=knowledge_graph.pk)\
+            .values_list('graph', flat=True)[0]
+        self.assertTrue(is_compact(value))
+
+    def test_lazy_deserialization(self):
+        reset_parse_count()
+        knowledge_graph = KnowledgeGraph.objects.get(
+            topic=TERM['Abraham_Lincoln'])
+        self.assertEqual(knowledge_graph.topic, TERM['Abraham_Lincoln'])
+        self.assertEqual(get_parse_count(), 0)
+        self.assertGreater(len(knowledge_graph.graph), 0)
+        self.assertEqual(get_parse_count(), 1)
+        # graph is parsed only once
+        knowledge_graph.graph
+        self.assertEqual(get_parse_count(), 1)
+
+    def test_save_without_deserialization(self):
+        # graphs in fixtures don't have stored term index yet
+        KnowledgeGraph.objects.get(topic=TERM['Abraham_Lincoln']).save()
+        knowledge_graph = KnowledgeGraph.objects.get(
+            topic=TERM['Abraham_Lincoln'])
+        value = KnowledgeGraph.objects.filter(pk=knowledge_graph.pk)\
+            .values_list('graph', flat=True)[0]
+        reset_parse_count()
+        knowledge_graph.save()
+        self.assertEqual(get_parse_count(), 0)
+        self.assertEqual(value, KnowledgeGraph.objects.filter(
+            pk=knowledge_graph.pk).values_list('graph', flat=True)[0])
@@ -2,6 +2,7 @@
 
 from __future__ import unicode_literals
 from django.test import TestCase
+from abstract_component.behavior_registry import reload_behaviors
 from knowledge.models import KnowledgeBuilder, Article
 from knowledge.models import KnowledgeGraph
 from knowledge.namespaces import TERM
@@ -56,3 +57,44 @@ class KnowledgeBuilderTestCase(TestCase):
         knowledge_graph = KnowledgeGraph.objects.all().first()
         self.assertIsNotNone(knowledge_graph)
         self.assertIsInstance(knowledge_graph, KnowledgeGraph)
+        # neighbours of terms are precomputed with the graph
+        self.assertIsNotNone(knowledge_graph.neighbours_data)
+
+    def test_behavior_class_loaded_once(self):
+        knowledge_builder = KnowledgeBuilder.objects.create(
+            behavior_name='fake',
+            parameters={"alpha": 0.5})
+        behavior1 = knowledge_builder.get_behavior()
+        behavior2 = KnowledgeBuilder.objects.get(
+            pk=knowledge_builder.pk).get_behavior()
+        # behavior instances are not shared (they can keep per-call state)
+        self.assertIsNot(behavior1, behavior2)
+        self.assertIs(type(behavior1), type(behavior2))
+        # behavior class is shared even by different components
+        other_builder = KnowledgeBuilder.objects.create(
+            behavior_name='fake',
+            parameters={"alpha": 1.0})
+        behavior3 = other_builder.get_behavior()
+        self.assertIsNot(behavior1, behavior3)
+        self.assertIs(type(behavior1), type(behavior3))
+        self.assertAlmostEqual(behavior3.get_parameter('alpha'), 1.0)
+
+    def test_behavior_parameters_change(self):
+        knowledge_builder = KnowledgeBuilder.objects.create(
+            behavior_name='fake',
+            parameters={"alpha": 0.5})
+        behavior1 = knowledge_builder.get_behavior()
+        knowledge_builder.parameters = {"alpha": 0.7}
+        behavior2 = knowledge_builder.get_behavior()
+        self.assertIsNot(behavior1, behavior2)
+        self.assertAlmostEqual(behavior2.get_parameter('alpha'), 0.7)
+
+    def test_reload_behaviors(self):
+        knowledge_builder = KnowledgeBuilder.objects.create(
+            behavior_name='fake',
+            parameters={"alpha": 0.5})
+        behavior1 = knowledge_builder.get_behavior()
+        reload_behaviors()
+        behavior2 = knowledge_builder.get_behavior()
+        self.assertIsNot(behavior1, behavior2)
+        self.assertIsNot(type(behavior1), type(behavior2))
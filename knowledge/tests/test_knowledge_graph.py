@@ -6,6 +6,8 @@ from django.test import TestCase
 from knowledge.models import KnowledgeBuilder, Article
 from knowledge.models import KnowledgeGraph
 from knowledge.namespaces import RDF, RDFS, ONTOLOGY, SMARTOO, TERM
+from knowledge.utils.graph_serialization import get_parse_count, reset_parse_count
+from knowledge.utils.term_index import TermIndex
 #from knowledge.utils.sparql import prepared_query
 from rdflib import Graph, Literal, Namespace
 
@@ -71,6 +73,28 @@ class KnowledgeGraphWithoutFixtureTestCase(TestCase):
         self.assertEqual(sorted(knowledge_graph.all_terms), [termA, termB, termC])
 
 
+    def test_add_many(self):
+        termA = TERM['A']
+        termB = TERM['B']
+        triples = [
+            (termA, RDF['type'], SMARTOO['term']),
+            (termA, RDF['type'], ONTOLOGY['Agent']),
+            (termB, RDF['type'], ONTOLOGY['Agent']),
+            (termB, RDFS['label'], Literal('Bee'))]
+        knowledge_graph = KnowledgeGraph()
+        # read the cached index before insertion
+        self.assertEqual(knowledge_graph.all_terms, set())
+        knowledge_graph.add_many(triples)
+        expected_graph = KnowledgeGraph()
+        for triple in triples:
+            expected_graph.add(triple)
+        self.assertTrue(knowledge_graph.graph.isomorphic(expected_graph.graph))
+        self.assertEqual(knowledge_graph.all_terms, set([termA, termB]))
+        self.assertEqual(knowledge_graph.terms_of_type[ONTOLOGY['Agent']],
+            set([termA, termB]))
+        self.assertEqual(knowledge_graph.label(termB), 'Bee')
+
+
 class KnowledgeGraphTestCase(TestCase):
     fixtures = ['lincoln-components-article-global_knowledge.xml']
 
@@ -123,6 +147,88 @@ class KnowledgeGraphTestCase(TestCase):
         self.assertIn(ONTOLOGY['Person'], types)
         self.assertNotIn(ONTOLOGY['Activity'], types)
 
+    def test_stored_term_index(self):
+        term = TERM['Abraham_Lincoln']
+        knowledge_graph = KnowledgeGraph.objects.get(topic=term)
+        expected_index = TermIndex.from_graph(knowledge_graph.graph)
+        knowledge_graph.save()
+        # index is loaded with the row, the graph is not parsed
+        reset_parse_count()
+        knowledge_graph = KnowledgeGraph.objects.get(topic=term)
+        # the index is decoded only when it's needed
+        self.assertIsNotNone(KnowledgeGraph.term_index_data.get_encoded(
+            knowledge_graph))
+        self.assertEqual(knowledge_graph.types_of_term,
+            expected_index.types_of_term)
+        self.assertEqual(knowledge_graph.terms_of_type,
+            expected_index.terms_of_type)
+        self.assertEqual(knowledge_graph.all_terms, expected_index.all_terms)
+        self.assertEqual(knowledge_graph.label(term), 'Abraham Lincoln')
+        self.assertEqual(get_parse_count(), 0)
+
+    def test_term_index_after_add(self):
+        term = TERM['Abraham_Lincoln']
+        knowledge_graph = KnowledgeGraph.objects.get(topic=term)
+        knowledge_graph.save()
+        knowledge_graph = KnowledgeGraph.objects.get(topic=term)
+        knowledge_graph.add((TERM['Tom'], RDF['type'], ONTOLOGY['Person']))
+        knowledge_graph.add((TERM['Tom'], RDFS['label'], Literal('Tommy')))
+        self.assertIn(TERM['Tom'], knowledge_graph.all_terms)
+        self.assertIn(TERM['Tom'],
+            knowledge_graph.terms_of_type[ONTOLOGY['Person']])
+        knowledge_graph.save()
+        knowledge_graph = KnowledgeGraph.objects.get(topic=term)
+        self.assertEqual(knowledge_graph.types(TERM['Tom']),
+            set([ONTOLOGY['Person']]))
+        self.assertEqual(knowledge_graph.label(TERM['Tom']), 'Tommy')
+        self.assertEqual(knowledge_graph.all_terms,
+            TermIndex.from_graph(knowledge_graph.graph).all_terms)
+
+    def test_similarities(self):
+        term = TERM['Abraham_Lincoln']
+        knowledge_graph = KnowledgeGraph.objects.get(topic=term)
+        similarities = knowledge_graph.similarities(term)
+        self.assertEqual(set(similarities), knowledge_graph.all_terms)
+        for other_term, similarity in similarities.items():
+            self.assertAlmostEqual(similarity,
+                knowledge_graph.similarity(term, other_term))
+        # term which is not in the graph
+        unknown_similarities = knowledge_graph.similarities(TERM['Pan_Tau'])
+        for other_term, similarity in unknown_similarities.items():
+            self.assertAlmostEqual(similarity,
+                knowledge_graph.similarity(TERM['Pan_Tau'], other_term))
+        # engine is rebuilt after the graph is changed
+        knowledge_graph.add((TERM['Tom'], RDF['type'], ONTOLOGY['Person']))
+        self.assertAlmostEqual(knowledge_graph.similarities(term)[TERM['Tom']],
+            knowledge_graph.similarity(term, TERM['Tom']))
+
+    def test_precomputed_neighbours(self):
+        term = TERM['Abraham_Lincoln']
+        knowledge_graph = KnowledgeGraph.objects.get(topic=term)
+        expected = knowledge_graph.neighbour_index.neighbours(term)
+        knowledge_graph.precompute_neighbours()
+        knowledge_graph.save()
+        # neighbours are loaded with the row, no similarity is computed
+        knowledge_graph = KnowledgeGraph.objects.get(topic=term)
+        # and they are decoded only when they are needed
+        self.assertIsNotNone(KnowledgeGraph.neighbours_data.get_encoded(
+            knowledge_graph))
+        self.assertEqual(knowledge_graph.neighbour_index.neighbours(term),
+            expected)
+        self.assertNotIn('similarity_engine', knowledge_graph.__dict__)
+        # the neighbours are computed again when the changed graph is saved
+        tom = TERM['Tom']
+        knowledge_graph.add_many([(tom, RDF['type'], type_uri)
+            for type_uri in knowledge_graph.types(term)])
+        self.assertIsNone(knowledge_graph.neighbours_data)
+        knowledge_graph.save()
+        knowledge_graph = KnowledgeGraph.objects.get(topic=term)
+        self.assertIsNotNone(knowledge_graph.neighbours_data)
+        neighbours, similarities = knowledge_graph.neighbour_index.neighbours(
+            term)
+        self.assertIn(tom, neighbours)
+        self.assertNotIn('similarity_engine', knowledge_graph.__dict__)
+
     def test_add_related_global_knowledge(self):
         topic = TERM['Abraham_Lincoln']
         article = Article.objects.get(topic=topic)
@@ -2,9 +2,14 @@
 
 from __future__ import unicode_literals
 from django.test import TestCase
+from knowledge.management.commands.benchmark_terms_inference import create_random_article
+from knowledge.models import Article, KnowledgeGraph
+from knowledge.utils.terms import bulk_create_terms_trie, bulk_create_terms_matcher
 from knowledge.utils.termstrie import TermsTrie
+from knowledge.utils.text import terms_inference, _find_terms_in_trie
 from knowledge.namespaces import TERM
 from rdflib import URIRef
+import threading
 
 
 class TermTestCase(TestCase):
@@ -38,3 +43,97 @@ class TermsTrieTestCase(TestCase):
         terms_trie = TermsTrie()
         terms_trie.add("Mathematics", [("Mathematics", "NN")])
         self.assertEquals(terms_trie.get(['Mathematics']), 'Mathematics')
+
+
+class TermsMatcherTestCase(TestCase):
+    fixtures = ['lincoln-components-article-global_knowledge.xml']
+
+    def assertSameInference(self, sentences, terms, knowledge_graph=None):
+        terms_trie = bulk_create_terms_trie(terms, knowledge_graph)
+        terms_matcher = bulk_create_terms_matcher(terms, knowledge_graph)
+        trees, positions = terms_inference(sentences, terms_trie)
+        matcher_trees, matcher_positions = terms_inference(sentences,
+            terms_matcher)
+        self.assertEqual(matcher_trees, trees)
+        self.assertEqual(set(matcher_positions), set(positions))
+        for term in positions:
+            self.assertEqual(
+                [(node.parent_index(), node.leaves()) for node in matcher_positions[term]],
+                [(node.parent_index(), node.leaves()) for node in positions[term]])
+
+    def test_overlapping_terms(self):
+        terms = [
+            ('a b c', [('a', 'NN'), ('b', 'NN'), ('c', 'NN')]),
+            ('b c d e', [('b', 'NN'), ('c', 'NN'), ('d', 'NN'), ('e', 'NN')]),
+            ('c', [('c', 'NN')]),
+            ('b', [('b', 'NN')]),
+            ('d e f', [('d', 'NN'), ('e', 'NN'), ('f', 'NN')])]
+        sentence = [(word, 'NN') for word in 'x a b d b c d e f a b c c'.split()]
+        terms_matcher = bulk_create_terms_matcher(terms)
+        self.assertEqual(
+            terms_matcher.find_terms([word for word, tag in sentence]),
+            [(2, 1, 'b'), (4, 4, 'b c d e'), (9, 3, 'a b c'), (12, 1, 'c')])
+        self.assertSameInference([sentence], terms)
+
+    def test_lincoln_article(self):
+        article = Article.objects.get(topic=TERM['Abraham_Lincoln'])
+        self.assertSameInference(article.content['sentences'],
+            article.content['terms'])
+        # with subnames of persons
+        knowledge_graph = KnowledgeGraph.objects.get(
+            topic=TERM['Abraham_Lincoln'])
+        self.assertSameInference(article.content['sentences'],
+            article.content['terms'], knowledge_graph)
+
+    def test_random_article(self):
+        sentences, terms = create_random_article(terms_count=200,
+            sentences_count=100, vocabulary_size=300)
+        self.assertSameInference(sentences, terms)
+
+
+class TermsTrieCursorTestCase(TestCase):
+    def setUp(self):
+        self.terms_trie = TermsTrie()
+        self.terms_trie.add('blue squares', [('blue', 'JJ'), ('squares', 'NNS')])
+        self.terms_trie.add('blue triangles', [('blue', 'JJ'), ('triangles', 'NNS')])
+        self.terms_trie.add('White', [('White', 'JJ')])
+        self.terms_trie.add('white cubes', [('white', 'JJ'), ('cubes', 'NNS')])
+
+    def test_cursor(self):
+        terms_trie = self.terms_trie
+        node = terms_trie.step(terms_trie.root(), 'Blue')
+        self.assertIsNotNone(node)
+        self.assertIsNone(terms_trie.term(node))
+        # cursor doesn't change, so the search can branch
+        squares = terms_trie.step(node, 'squares')
+        triangles = terms_trie.step(node, 'triangles')
+        self.assertEqual(terms_trie.term(squares), 'blue squares')
+        self.assertEqual(terms_trie.term(triangles), 'blue triangles')
+        self.assertIsNone(terms_trie.step(node, 'cubes'))
+
+    def test_get(self):
+        self.assertEqual(self.terms_trie.get(['White', 'cubes']), 'white cubes')
+        self.assertEqual(self.terms_trie.get(['white']), 'White')
+        self.assertIsNone(self.terms_trie.get(['white', 'squares']))
+        self.assertIsNone(self.terms_trie.get([]))
+
+    def test_shared_trie(self):
+        sentences, terms = create_random_article(terms_count=200,
+            sentences_count=50, vocabulary_size=300)
+        terms_trie = bulk_create_terms_trie(terms)
+        expected = [_find_terms_in_trie([token[0] for token in sentence],
+            terms_trie) for sentence in sentences]
+        results = {}
+
+        def find_all(thread_number):
+            results[thread_number] = [
+                _find_terms_in_trie([token[0] for token in sentence], terms_trie)
+                for sentence in sentences]
+
+        threads = [threading.Thread(target=find_all, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(4):
+            self.assertEqual(results[i], expected)
@@ -0,0 +1,87 @@
+"""
+Process-wide cache of article analyses (token stores with terms occurrences).
+
+Analyses are keyed by (article pk, content hash, knowledge graph revision) and
+evicted in least-recently-used order when their (estimated) total memory size
+exceeds the limit.
+"""
+
+from __future__ import unicode_literals
+from collections import OrderedDict
+from common.settings import ARTICLE_ANALYSIS_CACHE_SIZE
+
+import hashlib
+import json
+import threading
+
+
+class AnalysisCache(object):
+    """
+    LRU cache limited by the total size of the stored values.
+
+    Attributes:
+        max_size: maximum total size of stored values [B]
+        size: current total size of stored values [B]
+        hits, misses: number of successful and unsuccessful lookups
+    """
+
+    def __init__(self, max_size=ARTICLE_ANALYSIS_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, size), the least recently used first
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns cached value (or None if there is no value for the key).
+        """
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                self.misses += 1
+                return None
+            # move to the end (most recently used)
+            self._items[key] = item
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, size):
+        """
+        Stores value in the cache (values bigger than the whole cache are not
+        stored) and evicts the least recently used values if needed.
+        """
+        with self._lock:
+            old_item = self._items.pop(key, None)
+            if old_item is not None:
+                self.size -= old_item[1]
+            if size > self.max_size:
+                return
+            self._items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                evicted_key, (evicted_value, evicted_size) = \
+                    self._items.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+def content_hash(content):
+    """
+    Returns hash of article content (dictionary).
+    """
+    serialized = json.dumps(content, sort_keys=True)
+    return hashlib.md5(serialized.encode('utf-8')).hexdigest()
+
+
+# analyses of articles shared by all articles instances in the process
+article_analysis_cache = AnalysisCache()
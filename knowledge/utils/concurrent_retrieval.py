@@ -0,0 +1,184 @@
+"""
+Concurrent retrieval of global knowledge from a SPARQL endpoint.
+
+Batches of terms are retrieved by a bounded pool of worker threads. Requests
+to each endpoint are rate limited, failed requests are retried with
+exponential backoff and terms which are not retrieved before the deadline are
+skipped. Terms of batches which failed even after all retries are reported
+(mapped to None), same as by the sequential retrieval.
+"""
+
+from __future__ import unicode_literals
+from common.settings import ONLINE_ENABLED
+from common.settings import DBPEDIA_SPARQL_ENDPOINT, DBPEDIA_BATCH_SIZE
+from common.settings import DBPEDIA_WORKERS, DBPEDIA_REQUESTS_PER_SECOND
+from common.settings import DBPEDIA_RETRIES, DBPEDIA_RETRY_BACKOFF
+from common.settings import DBPEDIA_DEADLINE
+from knowledge.utils.sparql import query_graphs_batch
+from urllib2 import URLError
+from Queue import Queue, Empty
+
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# how often to report progress of the retrieval [s]
+PROGRESS_INTERVAL = 0.5
+
+
+class RateLimiter(object):
+    """
+    Limits the number of requests per second (shared by all threads).
+    """
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the next request is allowed.
+        """
+        with self._lock:
+            now = time.time()
+            request_time = max(now, self._next_time)
+            self._next_time = request_time + self.interval
+        if request_time > now:
+            time.sleep(request_time - now)
+
+
+# rate limiters for endpoints (shared by all retrievals in the process)
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(endpoint, requests_per_second=DBPEDIA_REQUESTS_PER_SECOND):
+    """
+    Returns rate limiter for given endpoint.
+    """
+    with _rate_limiters_lock:
+        if endpoint not in _rate_limiters:
+            _rate_limiters[endpoint] = RateLimiter(requests_per_second)
+        return _rate_limiters[endpoint]
+
+
+def retrieve_graphs_concurrently(terms,
+        batch_size=DBPEDIA_BATCH_SIZE,
+        endpoint=DBPEDIA_SPARQL_ENDPOINT,
+        workers=DBPEDIA_WORKERS,
+        retries=DBPEDIA_RETRIES,
+        retry_backoff=DBPEDIA_RETRY_BACKOFF,
+        deadline=DBPEDIA_DEADLINE,
+        requests_per_second=DBPEDIA_REQUESTS_PER_SECOND,
+        progress=None):
+    """
+    Retrieves graphs for many terms using a pool of worker threads.
+
+    Args:
+        terms: collection of terms [URIRef]
+        batch_size: maximum number of terms in one query
+        endpoint: URL of the SPARQL endpoint
+        workers: maximum number of concurrent requests
+        retries: how many times to retry a failed request
+        retry_backoff: delay (in seconds) before the first retry, it's doubled
+            for each next retry
+        deadline: time limit (in seconds) for the whole retrieval
+        requests_per_second: rate limit for the endpoint (it's set by the
+            first retrieval from the endpoint)
+        progress: function called with the number of processed terms when
+            it changes (optional, it's called from the calling thread)
+    Returns:
+        dictionary mapping terms to their graphs; if the query for a batch
+        fails (even after all retries), graphs for all terms in the batch are
+        None; terms which were not retrieved before the deadline are not
+        included
+    """
+    assert ONLINE_ENABLED
+    end_time = time.time() + deadline
+    rate_limiter = get_rate_limiter(endpoint, requests_per_second)
+
+    terms = list(terms)
+    if not terms:
+        return {}
+    batches = Queue()
+    for start in range(0, len(terms), batch_size):
+        batches.put(terms[start:start + batch_size])
+
+    graphs = {}
+    graphs_lock = threading.Lock()
+    # after the deadline, results of still running workers are ignored
+    finished = threading.Event()
+
+    def retrieve_batch(batch):
+        """
+        Returns graphs of the batch (None if the deadline is reached).
+        """
+        for attempt in range(retries + 1):
+            if time.time() >= end_time:
+                return None
+            rate_limiter.wait()
+            try:
+                return query_graphs_batch(batch, endpoint)
+            except URLError as exc:
+                # can occur if DBpedia is under maintenance (quite often)
+                logger.warning('Getting graphs for {count} terms failed'
+                    ' (attempt {attempt}); {message}'.format(
+                        count=len(batch),
+                        attempt=attempt + 1,
+                        message=unicode(exc)))
+                if attempt < retries:
+                    delay = retry_backoff * 2 ** attempt
+                    time.sleep(max(0, min(delay, end_time - time.time())))
+        logger.error('Getting graphs for {count} terms failed after {attempts}'
+            ' attempts'.format(count=len(batch), attempts=retries + 1))
+        return {term: None for term in batch}
+
+    def worker():
+        while not finished.is_set():
+            try:
+                batch = batches.get_nowait()
+            except Empty:
+                return
+            try:
+                batch_graphs = retrieve_batch(batch)
+            except Exception:
+                logger.exception('Retrieval of a batch failed.')
+                batch_graphs = {term: None for term in batch}
+            if batch_graphs is not None:
+                with graphs_lock:
+                    if not finished.is_set():
+                        graphs.update(batch_graphs)
+
+    threads = []
+    for i in range(max(1, min(workers, batches.qsize()))):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    reported_count = 0
+    for thread in threads:
+        while thread.is_alive() and time.time() < end_time:
+            thread.join(max(0, min(PROGRESS_INTERVAL, end_time - time.time())))
+            if progress is not None:
+                with graphs_lock:
+                    processed_count = len(graphs)
+                if processed_count > reported_count:
+                    progress(processed_count)
+                    reported_count = processed_count
+
+    with graphs_lock:
+        finished.set()
+        result = dict(graphs)
+    if progress is not None and len(result) > reported_count:
+        progress(len(result))
+
+    skipped_count = len(terms) - len(result)
+    if skipped_count > 0:
+        logger.warning('Skipped {count} terms during global knowledge'
+            ' retrieval'.format(count=skipped_count))
+    return result
@@ -0,0 +1,175 @@
+"""
+Compact serialization of RDF graphs.
+
+Graph is serialized as a table of (interned) nodes and a flat array of
+integer triples (indices to the nodes table), encoded in JSON and optionally
+compressed (zlib + base64). Serialized value starts with a header which
+identifies the format version, so that graphs serialized in legacy format
+(turtle) can still be read.
+
+Example of (uncompressed) serialized graph:
+
+    smartoo-graph/1;j;{"ns": [["dbpedia", "http://dbpedia.org/resource/"]],
+                       "nodes": [[0, "http://dbpedia.org/resource/A"],
+                                 [0, "http://www.w3.org/2000/01/rdf-schema#label"],
+                                 [2, "A", "en"]],
+                       "triples": [0, 1, 2]}
+"""
+
+from __future__ import unicode_literals
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.plugins.memory import Memory
+
+import base64
+import json
+import threading
+import zlib
+
+
+# legacy serialization format
+LEGACY_FORMAT = 'turtle'
+
+FORMAT_VERSION = 1
+HEADER = 'smartoo-graph/{version};'.format(version=FORMAT_VERSION)
+HEADER_PREFIX = 'smartoo-graph/'
+
+# encoding flags
+JSON = 'j'
+COMPRESSED_JSON = 'z'
+
+# per-thread statistics of deserializations (instrumentation, see
+# knowledge.middleware.GraphParseCounterMiddleware)
+_statistics = threading.local()
+
+# node kinds
+URI_NODE = 0
+BLANK_NODE = 1
+LITERAL_NODE = 2
+TYPED_LITERAL_NODE = 3
+
+
+def _encode_node(node):
+    if isinstance(node, URIRef):
+        return [URI_NODE, unicode(node)]
+    elif isinstance(node, BNode):
+        return [BLANK_NODE, unicode(node)]
+    elif isinstance(node, Literal):
+        if node.datatype is not None:
+            return [TYPED_LITERAL_NODE, unicode(node), unicode(node.datatype)]
+        elif node.language:
+            return [LITERAL_NODE, unicode(node), node.language]
+        else:
+            return [LITERAL_NODE, unicode(node)]
+    raise ValueError('Unsupported node: {node}'.format(node=repr(node)))
+
+
+def _decode_node(encoded_node):
+    kind = encoded_node[0]
+    if kind == URI_NODE:
+        # URIs were validated when the graph was created, so the (slow)
+        # validation in URIRef constructor is skipped
+        return unicode.__new__(URIRef, encoded_node[1])
+    elif kind == BLANK_NODE:
+        return BNode(encoded_node[1])
+    elif kind == LITERAL_NODE:
+        language = encoded_node[2] if len(encoded_node) > 2 else None
+        return Literal(encoded_node[1], lang=language)
+    elif kind == TYPED_LITERAL_NODE:
+        return Literal(encoded_node[1], datatype=URIRef(encoded_node[2]))
+    raise ValueError('Unknown node kind: {kind}'.format(kind=kind))
+
+
+def serialize_graph(graph, compress=True):
+    """
+    Serializes graph into the compact format.
+
+    Args:
+        graph: rdflib.Graph
+        compress: whether to compress the serialized graph
+    Returns:
+        serialized graph [unicode]
+    """
+    node_indices = {}
+    nodes = []
+    triples = []
+    for triple in graph:
+        for node in triple:
+            index = node_indices.get(node)
+            if index is None:
+                index = len(nodes)
+                node_indices[node] = index
+                nodes.append(_encode_node(node))
+            triples.append(index)
+
+    data = json.dumps({
+        'ns': [[prefix, unicode(namespace)]
+            for prefix, namespace in graph.namespaces()],
+        'nodes': nodes,
+        'triples': triples
+    }, separators=(',', ':'), ensure_ascii=False)
+
+    if compress:
+        encoded = base64.b64encode(zlib.compress(data.encode('utf-8')))
+        return HEADER + COMPRESSED_JSON + ';' + encoded.decode('ascii')
+    else:
+        return HEADER + JSON + ';' + data
+
+
+def deserialize_graph(value):
+    """
+    Deserializes graph from the compact (or legacy) format.
+
+    Args:
+        value: serialized graph [unicode]
+    Returns:
+        rdflib.Graph
+    """
+    _statistics.parse_count = get_parse_count() + 1
+    if not is_compact(value):
+        graph = Graph()
+        graph.parse(data=value, format=LEGACY_FORMAT)
+        return graph
+
+    version, encoding, data = value[len(HEADER_PREFIX):].split(';', 2)
+    if int(version) != FORMAT_VERSION:
+        raise ValueError('Unsupported graph format version: ' + version)
+    if encoding == COMPRESSED_JSON:
+        data = zlib.decompress(base64.b64decode(data)).decode('utf-8')
+    elif encoding != JSON:
+        raise ValueError('Unknown graph encoding: ' + encoding)
+    data = json.loads(data)
+
+    # plain (context unaware) memory store is much faster to fill than the
+    # default IOMemory store and deserialized graphs don't need contexts
+    graph = Graph(store=Memory())
+    for prefix, namespace in data['ns']:
+        graph.bind(prefix, URIRef(namespace))
+    nodes = [_decode_node(node) for node in data['nodes']]
+    triples = data['triples']
+    add = graph.store.add
+    for i in xrange(0, len(triples), 3):
+        add((nodes[triples[i]], nodes[triples[i + 1]], nodes[triples[i + 2]]),
+            graph, False)
+    return graph
+
+
+def is_compact(value):
+    """
+    Returns True if the value is a graph serialized in the compact format.
+    """
+    return value.startswith(HEADER_PREFIX)
+
+
+def get_parse_count():
+    """
+    Returns number of graph deserializations in the current thread (since
+    the last reset).
+    """
+    return getattr(_statistics, 'parse_count', 0)
+
+
+def reset_parse_count():
+    """
+    Resets counter of graph deserializations in the current thread.
+    """
+    _statistics.parse_count = 0
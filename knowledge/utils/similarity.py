@@ -0,0 +1,258 @@
+"""
+Vectorized similarity of terms based on their common types.
+
+Membership of terms in types is encoded as a sparse incidence matrix (terms x
+types) in a column-compressed layout: for each type, indices of its terms are
+stored in one integer array. The matrix is built once per knowledge graph.
+Numbers of common types of one term with all terms are then computed by
+counting term indices in the columns of the term's types (i.e. only nonzero
+entries are touched).
+"""
+
+from __future__ import unicode_literals
+from rdflib import URIRef
+import numpy
+
+
+# how many most similar terms are precomputed for each term
+NEIGHBOURS_COUNT = 20
+
+NEIGHBOURS_VERSION = 2
+
+
+def types_similarity(common_types_count):
+    """
+    Normalizes number(s) of common types to similarity between 0 and 1 (the
+    same measure as KnowledgeGraph.similarity uses), works both for numbers and
+    numpy arrays.
+    """
+    # NOTE: devide common_types_count to make the function increse slower
+    common_types_count = numpy.maximum(1, common_types_count)
+    return 2.0 * (1.0 / (1.0 + numpy.exp(-common_types_count / 8.0)) - 0.5)
+
+
+class TypeSimilarityEngine(object):
+    """
+    Computes similarity of a term to all terms at once.
+
+    Attributes:
+        terms: sorted list of terms (rows of the incidence matrix)
+        types: list of types (columns of the incidence matrix)
+    """
+
+    def __init__(self, terms, types_of_term):
+        """
+        Args:
+            terms: collection of terms to compare with
+            types_of_term: mapping from terms to a set of their types
+        """
+        # terms are sorted, so the order of rows (which breaks ties between
+        # neighbours) doesn't depend on the order of the given collection
+        # (e.g. set iteration order) and is the same in every process
+        self.terms = sorted(terms)
+        self._term_indices = {t: i for i, t in enumerate(self.terms)}
+        self._types_of_term = types_of_term
+        self.types = sorted(set(type_uri for term in self.terms
+            for type_uri in types_of_term.get(term, ())))
+        self._type_indices = {t: i for i, t in enumerate(self.types)}
+        # terms of i-th type are term_ids[type_starts[i]:type_starts[i + 1]]
+        columns = [[] for type_uri in self.types]
+        for row, term in enumerate(self.terms):
+            for type_uri in types_of_term.get(term, ()):
+                columns[self._type_indices[type_uri]].append(row)
+        self._type_starts = numpy.zeros(len(self.types) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(column) for column in columns],
+            out=self._type_starts[1:])
+        self._term_ids = numpy.fromiter(
+            (row for column in columns for row in column),
+            dtype=numpy.int32, count=self._type_starts[-1])
+
+    def index(self, term):
+        """
+        Returns position of the term in self.terms (None if it's not there).
+        """
+        return self._term_indices.get(term)
+
+    def memory_size(self):
+        """
+        Returns memory size of the incidence matrix [B].
+        """
+        return self._type_starts.nbytes + self._term_ids.nbytes
+
+    def common_types_counts(self, term):
+        """
+        Returns numpy array of numbers of common types of the term with all
+        terms (in the order of self.terms).
+        """
+        columns = [self._term_ids[self._type_starts[i]:self._type_starts[i + 1]]
+            for i in self._type_ids(term)]
+        if not columns:
+            return numpy.zeros(len(self.terms), dtype=numpy.int64)
+        return numpy.bincount(numpy.concatenate(columns),
+            minlength=len(self.terms))
+
+    def _type_ids(self, term):
+        type_ids = []
+        for type_uri in self._types_of_term.get(term, ()):
+            index = self._type_indices.get(type_uri)
+            if index is not None:
+                type_ids.append(index)
+        return type_ids
+
+    def similarity_vector(self, term):
+        """
+        Returns numpy array of similarities of the term to all terms (in the
+        order of self.terms).
+        """
+        return types_similarity(self.common_types_counts(term))
+
+    def similarities(self, term):
+        """
+        Returns dictionary mapping all terms to their similarity to the given
+        term.
+        """
+        return dict(zip(self.terms, self.similarity_vector(term).tolist()))
+
+
+class NeighbourIndex(object):
+    """
+    Index of the most similar terms for each term. Neighbours of all terms are
+    precomputed when a knowledge graph is built and stored with the graph
+    (see to_dict). Neighbours of other terms (or more neighbours than
+    precomputed) are computed on request (by a single one-vs-all similarity
+    computation) and then remembered.
+
+    Attributes:
+        size: how many neighbours to compute for each term
+    """
+
+    def __init__(self, get_engine, size=NEIGHBOURS_COUNT):
+        """
+        Args:
+            get_engine: function returning TypeSimilarityEngine (it's called
+                only if some neighbours need to be computed)
+            size: how many neighbours to precompute for each term
+        """
+        self._get_engine = get_engine
+        self._engine = None
+        self.size = size
+        # term -> (list of neighbours, list of their common types counts,
+        # whether all other terms are included)
+        self._neighbours = {}
+        # stored neighbours which haven't been decoded yet: term -> row (see
+        # to_dict) and list of nodes the rows refer to
+        self._rows = {}
+        self._nodes = []
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = self._get_engine()
+        return self._engine
+
+    def neighbours(self, term, count=None):
+        """
+        Returns terms most similar to the given term (the term itself is not
+        included) and their similarities, both sorted by the similarity
+        (descending).
+
+        Args:
+            term: term for which to find neighbours
+            count: minimal number of neighbours to return (default is the size
+                of the index), less are returned only if there are not enough
+                terms
+        Returns:
+            (list of terms, list of similarities)
+        """
+        count = count or self.size
+        terms, counts, complete = self._get_neighbours(term)
+        if len(terms) < count and not complete:
+            # compute more neighbours than needed to prevent recomputing
+            count = max(count, self.size, 2 * len(terms))
+            terms, counts = self._compute_neighbours(term, count)
+            complete = len(terms) < count
+            self._neighbours[term] = (terms, counts, complete)
+        similarities = types_similarity(numpy.array(counts, dtype=numpy.float64))
+        return terms, similarities.tolist()
+
+    def precompute(self):
+        """
+        Computes neighbours of all terms of the similarity engine.
+        """
+        for term in self.engine.terms:
+            self.neighbours(term)
+
+    def _get_neighbours(self, term):
+        neighbours = self._neighbours.get(term)
+        if neighbours is None:
+            row = self._rows.pop(term, None)
+            if row is None:
+                return [], [], False
+            term_id, complete, neighbour_ids, counts = row
+            neighbours = ([self._nodes[i] for i in neighbour_ids], counts,
+                bool(complete))
+            self._neighbours[term] = neighbours
+        return neighbours
+
+    def _compute_neighbours(self, term, count):
+        # similarity is an increasing function of the number of common types
+        # (at least 1, see types_similarity), so the counts are compared
+        counts = numpy.maximum(1, self.engine.common_types_counts(term))
+        candidates = numpy.arange(len(counts))
+        term_index = self.engine.index(term)
+        if term_index is not None:
+            candidates = numpy.delete(candidates, term_index)
+        if count < len(candidates):
+            # select top candidates (unordered) in linear time, including all
+            # candidates tied with the last one
+            threshold = numpy.partition(-counts[candidates], count - 1)[count - 1]
+            candidates = candidates[-counts[candidates] <= threshold]
+        # ties are ordered by the term index (i.e. by URI), so neighbours
+        # computed for a bigger count (possibly in another process) always
+        # extend the previously computed ones
+        order = candidates[numpy.lexsort((candidates, -counts[candidates]))]
+        order = order[:count]
+        return ([self.engine.terms[i] for i in order], counts[order].tolist())
+
+    def to_dict(self):
+        """
+        Returns compact representation of all computed neighbours (for storing
+        in DictField): terms are interned in a list of nodes and referenced by
+        their positions, similarities are represented by the numbers of common
+        types.
+        """
+        node_indices = {}
+        nodes = []
+
+        def intern(node):
+            index = node_indices.get(node)
+            if index is None:
+                index = node_indices[node] = len(nodes)
+                nodes.append(unicode(node))
+            return index
+
+        for term in list(self._rows):
+            self._get_neighbours(term)
+        rows = [[intern(term), int(complete), [intern(t) for t in terms], counts]
+            for term, (terms, counts, complete) in self._neighbours.items()]
+        return {
+            'version': NEIGHBOURS_VERSION,
+            'size': self.size,
+            'nodes': nodes,
+            'neighbours': rows}
+
+    @classmethod
+    def from_dict(cls, data, get_engine):
+        """
+        Creates index from its compact representation (see to_dict), returns
+        None if the representation has unsupported version. Neighbours of
+        a term are decoded on the first request.
+        """
+        if data.get('version') != NEIGHBOURS_VERSION:
+            return None
+        index = cls(get_engine, size=data['size'])
+        # URIs were validated when the index was created
+        index._nodes = [unicode.__new__(URIRef, node) for node in data['nodes']]
+        index._rows = dict((index._nodes[row[0]], row)
+            for row in data['neighbours'])
+        return index
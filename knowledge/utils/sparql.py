@@ -4,10 +4,11 @@ Utilities for SPARQL language
 
 from __future__ import unicode_literals
 from common.settings import ONLINE_ENABLED
+from common.settings import DBPEDIA_SPARQL_ENDPOINT, DBPEDIA_BATCH_SIZE
 from knowledge.namespaces import NAMESPACES_DICT, RDF, RDFS, FOAF, ONTOLOGY, DCTERMS
 from rdflib.plugins.sparql import prepareQuery
 from rdflib import Graph, Literal, URIRef
-from SPARQLWrapper import SPARQLWrapper, JSON
+from SPARQLWrapper import SPARQLWrapper, JSON, GET, POST
 from urllib import quote_plus
 from urllib2 import HTTPError
 
@@ -26,78 +27,211 @@ def prepared_query(query_string):
     return prepareQuery(query_string, initNs=NAMESPACES_DICT)
 
 
-def retrieve_graph_from_dbpedia(term):
+# objects which are too long (e.g. abstracts) are not included in graphs
+LITERAL_MAX_LENGTH = 600
+
+# only triples with predicates from these namespaces are retrieved
+PREDICATE_NAMESPACES = [FOAF, RDF, RDFS, DCTERMS, ONTOLOGY]
+
+
+def term_to_sparql_url(term):
+    """
+    Returns (percent-encoded) URL of the term to use in SPARQL queries.
+    """
+    term_utf = term.encode('utf-8')
+    return quote_plus(term_utf, safe=str("/:#,()'")).decode('utf-8')
+
+
+def _predicates_filter():
+    """
+    Returns SPARQL FILTER clauses restricting ?p to the relevant namespaces and
+    ?o to URIs and english literals.
+    """
+    namespaces_conditions = '\n                || '.join(
+        'STRSTARTS(STR(?p), "{namespace}")'.format(namespace=unicode(namespace))
+        for namespace in PREDICATE_NAMESPACES)
+    return """
+            FILTER( {namespaces_conditions})
+            FILTER (isURI(?o) || langMatches(lang(?o), "EN"))
+    """.format(namespaces_conditions=namespaces_conditions)
+
+
+def _execute_query(query, endpoint, method=GET):
+    """
+    Executes SPARQL query on given endpoint and returns decoded JSON results.
+
+    Raises:
+        HTTPError: if the endpoint is not available
+    """
+    sparql = SPARQLWrapper(endpoint)
+    sparql.setQuery(query.encode('utf-8'))
+    sparql.setReturnFormat(JSON)
+    sparql.setMethod(method)
+    results = sparql.query()
+    # workaround for "Invalid \escape" error which can be raised by
+    # convert()
+    body = results.response.read()
+    return cjson.decode(body)
+
+
+def _create_graph():
+    """
+    Returns empty graph with bound relevant namespaces.
+    """
+    graph = Graph()
+    for prefix, namespace in NAMESPACES_DICT.items():
+        graph.bind(prefix, namespace)
+    return graph
+
+
+def _binding_to_predicate_object(result):
+    """
+    Returns (predicate, object) pair from a result binding or None if the
+    triple shouldn't be included in the graph.
+
+    Raises:
+        KeyError: if the binding is incomplete
+    """
+    p = URIRef(result['p']['value'])
+    # filter wikiPageRevisionID, wikiPageExternalLike etc.
+    if p.startswith(ONTOLOGY['wiki']):
+        return None
+    if result['o']['type'] == 'uri':
+        o = URIRef(result['o']['value'])
+    else:
+        o = Literal(result['o']['value'])
+        # if object is too long (e.g. abstract, ignore it)
+        if len(o) > LITERAL_MAX_LENGTH:
+            return None
+    return p, o
+
+
+def retrieve_graph_from_dbpedia(term, endpoint=DBPEDIA_SPARQL_ENDPOINT):
     assert ONLINE_ENABLED
     logger.info('online access - DBpedia: {term}'.format(term=unicode(term)))
-    term_utf = term.encode('utf-8')
-    term_url = quote_plus(term_utf, safe=str("/:#,()'"))
-    #print '---'
-    #print 'term_url', term_url
-    sparql = SPARQLWrapper("http://dbpedia.org/sparql")
-    #query = """
-    #    SELECT ?p ?o
-    #    WHERE {{ <{term_url}> ?p ?o }}
-    #""".format(term_url=term_url)
     query = """
         SELECT ?p ?o
         WHERE {{
             <{term_url}> ?p ?o
-            FILTER( STRSTARTS(STR(?p), "{foaf}")
-                || STRSTARTS(STR(?p), "{rdf}")
-                || STRSTARTS(STR(?p), "{rdfs}")
-                || STRSTARTS(STR(?p), "{dcterms}")
-                || STRSTARTS(STR(?p), "{ontology}"))
-            FILTER (isURI(?o) || langMatches(lang(?o), "EN"))
+            {filter}
         }}
-    """.format(term_url=term_url,
-            foaf=unicode(FOAF),
-            rdf=unicode(RDF),
-            rdfs=unicode(RDFS),
-            dcterms=unicode(DCTERMS),
-            ontology=unicode(ONTOLOGY))
+    """.format(term_url=term_to_sparql_url(term), filter=_predicates_filter())
 
-    sparql.setQuery(query.encode('utf-8'))
-    sparql.setReturnFormat(JSON)
     try:
-        results = sparql.query()
-        # workaround for "Invalid \escape" error which can be raised by
-        # convert()
-        body = results.response.read()
-        results = cjson.decode(body)
+        results = _execute_query(query, endpoint)
     except HTTPError as exc:
         # can occur if DBpedia is under maintenance (quite often)
         logger.error('Getting graph for {term} failed; {message}; {excType}'
             .format(term=term, message=exc.message, excType=unicode(type(exc))))
         return None
 
-    # create graph and bind relevant namespaces
-    graph = Graph()
-    for prefix, namespace in NAMESPACES_DICT.items():
-        graph.bind(prefix, namespace)
-
-    LITERAL_MAX_LENGTH = 600
+    graph = _create_graph()
     for result in results["results"]["bindings"]:
         try:
-            p = URIRef(result['p']['value'])
-            # filter wikiPageRevisionID, wikiPageExternalLike etc.
-            if p.startswith(ONTOLOGY['wiki']):
-                continue
-            if result['o']['type'] == 'uri':
-                o = URIRef(result['o']['value'])
-            else:
-                o = Literal(result['o']['value'])
-                # if object is too long (e.g. abstract, ignore it)
-                if len(o) > LITERAL_MAX_LENGTH:
-                    continue
-            graph.add((term, p, o))
-            #print type(p), p
-            #print type(o), o
-            #print '*'
+            predicate_object = _binding_to_predicate_object(result)
         except KeyError:
             continue
+        if predicate_object is not None:
+            graph.add((term,) + predicate_object)
 
     # check if the graph is not empty
     if not graph:
         logger.warning('Retrieved empty graph for ' + unicode(term))
 
     return graph
+
+
+def retrieve_graphs_from_dbpedia(terms, batch_size=DBPEDIA_BATCH_SIZE,
+        endpoint=DBPEDIA_SPARQL_ENDPOINT, progress=None):
+    """
+    Retrieves graphs for many terms at once. Terms are split into batches and
+    graphs for all terms in a batch are retrieved by a single query.
+
+    Args:
+        terms: collection of terms [URIRef]
+        batch_size: maximum number of terms in one query
+        endpoint: URL of the SPARQL endpoint
+        progress: function called with the number of processed terms after
+            each batch (optional)
+    Returns:
+        dictionary mapping terms to their graphs; if the query for a batch
+        fails, graphs for all terms in the batch are None
+    """
+    assert ONLINE_ENABLED
+    terms = list(terms)
+    graphs = {}
+    for start in range(0, len(terms), batch_size):
+        batch = terms[start:start + batch_size]
+        graphs.update(retrieve_graphs_batch_from_dbpedia(batch, endpoint))
+        if progress is not None:
+            progress(len(graphs))
+    return graphs
+
+
+def retrieve_graphs_batch_from_dbpedia(terms, endpoint=DBPEDIA_SPARQL_ENDPOINT):
+    """
+    Retrieves graphs for given terms by a single query.
+
+    Returns:
+        dictionary mapping terms to their graphs (or to None if the query
+        failed)
+    """
+    try:
+        return query_graphs_batch(terms, endpoint)
+    except HTTPError as exc:
+        # can occur if DBpedia is under maintenance (quite often)
+        logger.error('Getting graphs for {count} terms failed; {message}; {excType}'
+            .format(count=len(terms), message=exc.message,
+                excType=unicode(type(exc))))
+        return {term: None for term in terms}
+
+
+def query_graphs_batch(terms, endpoint=DBPEDIA_SPARQL_ENDPOINT):
+    """
+    Retrieves graphs for given terms by a single query.
+
+    Returns:
+        dictionary mapping terms to their graphs
+    Raises:
+        HTTPError: if the endpoint is not available
+    """
+    logger.info('online access - DBpedia: {count} terms'.format(
+        count=len(terms)))
+    # the endpoint can return subjects either encoded or not
+    url_to_term = {}
+    for term in terms:
+        url_to_term[term_to_sparql_url(term)] = term
+        url_to_term[unicode(term)] = term
+
+    query = """
+        SELECT ?s ?p ?o
+        WHERE {{
+            VALUES ?s {{ {subjects} }}
+            ?s ?p ?o
+            {filter}
+        }}
+    """.format(
+        subjects=' '.join('<{url}>'.format(url=term_to_sparql_url(term))
+            for term in terms),
+        filter=_predicates_filter())
+
+    # batch queries can be too long for GET
+    results = _execute_query(query, endpoint, method=POST)
+
+    graphs = {term: _create_graph() for term in terms}
+    for result in results["results"]["bindings"]:
+        try:
+            term = url_to_term.get(result['s']['value'])
+            if term is None:
+                continue
+            predicate_object = _binding_to_predicate_object(result)
+        except KeyError:
+            continue
+        if predicate_object is not None:
+            graphs[term].add((term,) + predicate_object)
+
+    for term, graph in graphs.items():
+        if not graph:
+            logger.warning('Retrieved empty graph for ' + unicode(term))
+
+    return graphs
@@ -0,0 +1,109 @@
+"""
+Index of terms, their types and labels in a knowledge graph.
+
+The index is computed when a knowledge graph is saved and stored with it (in a
+compact form), so that loaded graphs can answer type, term and label lookups
+without scanning (or even deserializing) the rdflib graph.
+"""
+
+from __future__ import unicode_literals
+from collections import defaultdict
+from knowledge.namespaces import RDF, RDFS, TERM
+from rdflib import URIRef
+
+
+INDEX_VERSION = 1
+
+TERM_PREFIX = unicode(TERM)
+
+
+class TermIndex(object):
+    """
+    Attributes:
+        types_of_term: mapping from terms to a set of their types (URIRef)
+        terms_of_type: mapping from types to a set of terms of that type
+        all_terms: set of all terms (subjects/objects in the TERM namespace)
+        labels: mapping from URIs to their labels [unicode]
+
+    Only URI references are indexed (types of blank nodes are ignored).
+    """
+
+    def __init__(self):
+        self.types_of_term = defaultdict(set)
+        self.terms_of_type = defaultdict(set)
+        self.all_terms = set()
+        self.labels = {}
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Creates index of given rdflib.Graph.
+        """
+        index = cls()
+        for triple in graph:
+            index.add(triple)
+        return index
+
+    def add(self, triple):
+        """
+        Updates the index after the triple was added to the graph.
+        """
+        subject, predicate, obj = triple
+        for node in (subject, obj):
+            if isinstance(node, URIRef) and node.startswith(TERM_PREFIX):
+                self.all_terms.add(node)
+        if not isinstance(subject, URIRef):
+            return
+        if predicate == RDF['type'] and isinstance(obj, URIRef):
+            self.types_of_term[subject].add(obj)
+            self.terms_of_type[obj].add(subject)
+        elif predicate == RDFS['label'] and subject not in self.labels:
+            self.labels[subject] = unicode(obj)
+
+    def to_dict(self):
+        """
+        Returns compact representation of the index (for storing in
+        DictField): all URIs are interned in a list of nodes and referenced by
+        their positions.
+        """
+        node_indices = {}
+        nodes = []
+
+        def intern(node):
+            index = node_indices.get(node)
+            if index is None:
+                index = node_indices[node] = len(nodes)
+                nodes.append(unicode(node))
+            return index
+
+        types = [[intern(term)] + [intern(type_uri) for type_uri in types]
+            for term, types in self.types_of_term.items() if types]
+        terms = [intern(term) for term in self.all_terms]
+        labels = [[intern(uri), label] for uri, label in self.labels.items()]
+        return {
+            'version': INDEX_VERSION,
+            'nodes': nodes,
+            'types': types,
+            'terms': terms,
+            'labels': labels}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates index from its compact representation (see to_dict), returns
+        None if the representation has unsupported version.
+        """
+        if data.get('version') != INDEX_VERSION:
+            return None
+        # URIs were validated when the index was created
+        nodes = [unicode.__new__(URIRef, node) for node in data['nodes']]
+        index = cls()
+        for type_row in data['types']:
+            term = nodes[type_row[0]]
+            types = set(nodes[i] for i in type_row[1:])
+            index.types_of_term[term] = types
+            for type_uri in types:
+                index.terms_of_type[type_uri].add(term)
+        index.all_terms = set(nodes[i] for i in data['terms'])
+        index.labels = dict((nodes[i], label) for i, label in data['labels'])
+        return index
@@ -5,6 +5,7 @@ Terms related utilities
 from __future__ import unicode_literals
 from knowledge.namespaces import TERM, ONTOLOGY
 from knowledge.utils.termstrie import TermsTrie
+from knowledge.utils.terms_matcher import TermsMatcher
 #from urllib import quote_plus, unquote_plus
 
 
@@ -39,14 +40,37 @@ def bulk_create_terms_trie(terms, knowledge_graph=None):
         terms trie
     """
     terms_trie = TermsTrie()
+    persons = persons_names(terms, knowledge_graph)
     for name, tagged_name in terms:
-        if knowledge_graph and ONTOLOGY['Person'] in knowledge_graph.types(name_to_term(name)):
+        if name in persons:
             terms_trie.add_with_subnames(name, tagged_name)
         else:
             terms_trie.add(name, tagged_name)
     return terms_trie
 
 
+def persons_names(terms, knowledge_graph=None):
+    """
+    Returns set of names of given terms which are persons according to the
+    knowledge graph (subnames of persons are also considered to be terms).
+
+    Args:
+        terms: list of tuples of term label and shallowed parsed term
+    """
+    if not knowledge_graph:
+        return set()
+    return set(name for name, tagged_name in terms
+        if ONTOLOGY['Person'] in knowledge_graph.types(name_to_term(name)))
+
+
+def bulk_create_terms_matcher(terms, knowledge_graph=None):
+    """
+    Returns compiled terms matcher (TermsMatcher) created from given list of
+    labels (the same input as for bulk_create_terms_trie)
+    """
+    return TermsMatcher.from_trie(bulk_create_terms_trie(terms, knowledge_graph))
+
+
 def create_term_pairs_1toN(leading_term, other_terms):
     """
     Creates list of term *names* of :leading_term: with each of :other_terms:
@@ -0,0 +1,115 @@
+"""
+Aho-Corasick automaton for finding terms occurrences in tokenized sentences.
+
+The automaton is compiled from a TermsTrie (so it recognizes exactly the same
+token sequences, including subnames) and finds leftmost-longest,
+non-overlapping occurrences of terms in one pass through a sentence.
+"""
+
+from __future__ import unicode_literals
+from collections import deque
+
+
+class TermsMatcher(object):
+    """
+    Compiled terms matcher.
+
+    States of the automaton are numbered (0 is the root), for each state it
+    stores transitions (dictionary: lowercased word -> state), failure link,
+    link to the nearest state (via failure links) which ends a term, depth (in
+    number of tokens) and name of the term ending in the state (or None).
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output_link = [0]
+        self._depth = [0]
+        self._names = [None]
+
+    @classmethod
+    def from_trie(cls, terms_trie):
+        """
+        Compiles matcher from given TermsTrie.
+        """
+        matcher = cls()
+        matcher._add_trie_nodes(terms_trie)
+        matcher._compute_links()
+        return matcher
+
+    def _add_trie_nodes(self, terms_trie):
+        # iterative depth first traversal of the trie (to avoid recursion
+        # limit for very long terms)
+        stack = [(terms_trie.root(), 0)]
+        while stack:
+            node, state = stack.pop()
+            self._names[state] = terms_trie.term(node)
+            for word, child in terms_trie.children(node):
+                child_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output_link.append(0)
+                self._depth.append(self._depth[state] + 1)
+                self._names.append(None)
+                self._goto[state][word] = child_state
+                stack.append((child, child_state))
+
+    def _compute_links(self):
+        # breadth first traversal, failure links of shallower states are
+        # computed before deeper states
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(word, 0)
+                self._fail[child] = fail
+                self._output_link[child] = fail if self._names[fail] \
+                    else self._output_link[fail]
+                queue.append(child)
+
+    def find_terms(self, words):
+        """
+        Finds leftmost-longest non-overlapping occurrences of terms (the same
+        as repeatedly taking the longest term starting at the current position
+        and skipping it, or skipping one word if there is no such term).
+
+        Args:
+            words: list of words (unicode)
+        Returns:
+            list of (position, length, term name) sorted by position
+        """
+        goto = self._goto
+        fail = self._fail
+        output_link = self._output_link
+        depth = self._depth
+        names = self._names
+
+        # the longest term starting at each position: (length, name)
+        longest = [None] * len(words)
+        state = 0
+        for end, word in enumerate(words):
+            word = word.lower()
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            match = state if names[state] else output_link[state]
+            while match:
+                length = depth[match]
+                start = end - length + 1
+                if longest[start] is None or longest[start][0] < length:
+                    longest[start] = (length, names[match])
+                match = output_link[match]
+
+        occurrences = []
+        position = 0
+        while position < len(words):
+            if longest[position] is None:
+                position += 1
+            else:
+                length, name = longest[position]
+                occurrences.append((position, length, name))
+                position += length
+        return occurrences
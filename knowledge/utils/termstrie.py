@@ -1,5 +1,5 @@
 from __future__ import unicode_literals
-from nltk import word_tokenize, pos_tag
+from common.utils.nlp import word_tokenize, pos_tag
 
 
 class TermsTrie(object):
@@ -69,12 +69,40 @@ class TermsTrie(object):
 
         :canonical_form: [list<unicode>]
         """
-        self.search_start()
+        node = self.root()
         for lemma in canonical_form:
-            possible_continuation = self.search_continue(lemma)
-            if not possible_continuation:
+            node = self.step(node, lemma)
+            if node is None:
                 return None
-        return self.search_result()
+        return self.term(node)
+
+    # Cursor API: search state is kept by the caller in a node handle, so one
+    # trie can be searched by many threads at once (unlike search_start,
+    # search_continue and search_result, which keep state in the trie).
+
+    def root(self):
+        """Returns handle of the root node (start of a search)
+        """
+        return self._trie
+
+    def step(self, node, lemma):
+        """Returns handle of the node reached from given node by the lemma
+
+        :return: node handle or None if the lemma is not possible next step
+        """
+        return node.get(lemma.lower())
+
+    def term(self, node):
+        """Returns name of the term ending in given node (None if there is no
+        such term)
+        """
+        return node.get(TermsTrie._TERM_END, None)
+
+    def children(self, node):
+        """Returns list of (word, child node handle) pairs of given node
+        """
+        return [(word, child) for word, child in node.items()
+            if word != TermsTrie._TERM_END]
 
     def search_start(self, first_lemma=None):
         """Starts multistep search
@@ -109,3 +137,4 @@ class TermsTrie(object):
             return None
         # if there is the end of a term, return the term (None otherwise)
         return self._current.get(TermsTrie._TERM_END, None)
+
@@ -6,31 +6,88 @@ Terms related utilities
 
 from __future__ import unicode_literals
 
+from common.settings import NLP_PROCESSES, NLP_PARALLEL_MIN_SENTENCES
+from common.utils.nlp import preload_models, sent_tokenize, word_tokenize, pos_tag_sents
 from knowledge.utils.terms import name_to_term
+from knowledge.utils.termstrie import TermsTrie
 
 from collections import defaultdict
-from nltk import ParentedTree, sent_tokenize, word_tokenize, pos_tag
+from itertools import chain
+from multiprocessing import Pool
+from nltk import ParentedTree
 import re
+import threading
 
 
-def shallow_parsing(text):
+def shallow_parsing(text, processes=None):
     """
     Tokenizes text to words and sentences and assings a tag to each word.
     """
     text = preporcess_article_text(text)
     sentences = sent_tokenize(text)
-    parsed_sentences = []
-    for sentence in sentences:
-        parsed_sentence = pos_tag(word_tokenize(sentence))
-        parsed_sentences.append(parsed_sentence)
-    return parsed_sentences
+    return tag_sentences(sentences, processes)
 
 
-def shallow_parsing_phrases(phrases):
+def shallow_parsing_phrases(phrases, processes=None):
     """
     Tokenizes and tags phrases.
     """
-    return [pos_tag(word_tokenize(phrase)) for phrase in phrases]
+    return tag_sentences(phrases, processes)
+
+
+def tag_sentences(sentences, processes=None):
+    """
+    Tokenizes and tags sentences (or phrases) in one batch. Long lists of
+    sentences can be split into chunks tagged by a pool of processes, the
+    result is the same as of sequential tagging.
+
+    Args:
+        sentences: list of sentences (unicode)
+        processes: number of processes to use (1 = tagging in this process),
+            default is NLP_PROCESSES for lists of at least
+            NLP_PARALLEL_MIN_SENTENCES sentences and 1 for shorter lists
+    Returns:
+        list of tagged sentences (lists of (word, tag) pairs)
+    """
+    if processes is None:
+        processes = NLP_PROCESSES \
+            if len(sentences) >= NLP_PARALLEL_MIN_SENTENCES else 1
+    if processes <= 1 or len(sentences) < 2:
+        return _tag_batch(sentences)
+
+    # more chunks than processes to balance the load, but chunks are
+    # continuous, so the order of sentences is kept
+    chunks_count = min(len(sentences), 4 * processes)
+    chunk_size = -(-len(sentences) // chunks_count)
+    chunks = [sentences[i:i + chunk_size]
+        for i in range(0, len(sentences), chunk_size)]
+    tagged_chunks = _get_pool(processes).map(_tag_batch, chunks)
+    return list(chain.from_iterable(tagged_chunks))
+
+
+def _tag_batch(sentences):
+    tokenized_sentences = [word_tokenize(sentence) for sentence in sentences]
+    return pos_tag_sents(tokenized_sentences)
+
+
+_pool = None
+_pool_processes = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(processes):
+    """
+    Returns pool of tagging processes (created on the first request, workers
+    share models preloaded in this process or load them when they start).
+    """
+    global _pool, _pool_processes
+    with _pool_lock:
+        if _pool is None or _pool_processes != processes:
+            if _pool is not None:
+                _pool.terminate()
+            _pool = Pool(processes, initializer=preload_models)
+            _pool_processes = processes
+        return _pool
 
 
 def preporcess_article_text(text):
@@ -64,51 +121,70 @@ def preporcess_article_text(text):
     return '\n'.join(text_lines)
 
 
-def terms_inference(sentences, terms_trie):
+def terms_inference(sentences, terms_matcher):
     """
-    Given (tokenized and tagged) sentences and a trie of terms, it will
+    Given (tokenized and tagged) sentences and a matcher of terms, it will
     infere terms occurences and return list of sentence trees.
 
     Args:
         sentences: shallow-parsed text
-        terms_trie: trie of terms
+        terms_matcher: compiled terms matcher (TermsMatcher) or trie of terms
+            (TermsTrie, slower)
     Return:
         list of shallow parse trees with inferred terms,
         dictionary of refferences to terms positions
     """
+    if isinstance(terms_matcher, TermsTrie):
+        find_terms = lambda words: _find_terms_in_trie(words, terms_matcher)
+    else:
+        find_terms = terms_matcher.find_terms
+
     parsed_sentences = []
     terms_positions = defaultdict(list)
     for sentence in sentences:
-        parsed_sentence = ParentedTree('S', [])
+        occurrences = find_terms([token[0] for token in sentence])
+        parsed_sentence, term_nodes = sentence_tree(sentence, occurrences)
+        for term_node in term_nodes:
+            terms_positions[term_node.term].append(term_node)
+        parsed_sentences.append(parsed_sentence)
+
+    return parsed_sentences, terms_positions
+
 
-        token_index = 0
-        while token_index < len(sentence):
-            term_label, term_length = _longest_matching_term(sentence,
-                token_index, terms_trie)
+def sentence_tree(sentence, occurrences):
+    """
+    Creates shallow parse tree of a sentence with given terms occurences.
 
-            if term_length > 0:
-                # term found
-                term_node = ParentedTree('TERM', [])
+    Args:
+        sentence: list of tagged tokens
+        occurrences: list of (position, length, term name) sorted by position
+    Returns:
+        sentence tree, list of term nodes (with term attribute)
+    """
+    parsed_sentence = ParentedTree('S', [])
+    term_nodes = []
 
-                term = name_to_term(term_label)
-                term_node.term = term
-                terms_positions[term].append(term_node)
+    token_index = 0
+    for position, term_length, term_label in occurrences:
+        # there are no terms before the found one
+        for token in sentence[token_index:position]:
+            _append_word_token(parsed_sentence, token)
 
-                for token in sentence[token_index:token_index + term_length]:
-                    _append_word_token(term_node, token)
-                parsed_sentence.append(term_node)
+        # term found
+        term_node = ParentedTree('TERM', [])
+        term_node.term = name_to_term(term_label)
+        term_nodes.append(term_node)
 
-                token_index += term_length
+        for token in sentence[position:position + term_length]:
+            _append_word_token(term_node, token)
+        parsed_sentence.append(term_node)
 
-            else:
-                # there is no term starting from current postion
-                token = sentence[token_index]
-                _append_word_token(parsed_sentence, token)
-                token_index += 1
+        token_index = position + term_length
 
-        parsed_sentences.append(parsed_sentence)
+    for token in sentence[token_index:]:
+        _append_word_token(parsed_sentence, token)
 
-    return parsed_sentences, terms_positions
+    return parsed_sentence, term_nodes
 
 
 def _append_word_token(node, token):
@@ -117,7 +193,25 @@ def _append_word_token(node, token):
     #node.append(ParentedTree(pos_tag, [token]))
 
 
-def _longest_matching_term(text, pos, terms_trie):
+def _find_terms_in_trie(words, terms_trie):
+    """
+    Finds terms occurences by searching for the longest matching term from
+    each position (see TermsMatcher.find_terms).
+    """
+    occurrences = []
+    position = 0
+    while position < len(words):
+        term_label, term_length = _longest_matching_term(words, position,
+            terms_trie)
+        if term_length > 0:
+            occurrences.append((position, term_length, term_label))
+            position += term_length
+        else:
+            position += 1
+    return occurrences
+
+
+def _longest_matching_term(words, pos, terms_trie):
     """
     Returns longest matching term and its length from given position
 
@@ -127,13 +221,14 @@ def _longest_matching_term(text, pos, terms_trie):
     max_length = 0
     current_length = 0
     longest_term = None
-    terms_trie.search_start()
-    while pos + current_length < len(text):
-        token = text[pos + current_length]
-        word = token[0]
-        if not terms_trie.search_continue(word):
+    # search state is kept in the node handle (trie can be shared)
+    node = terms_trie.root()
+    while pos + current_length < len(words):
+        word = words[pos + current_length]
+        node = terms_trie.step(node, word)
+        if node is None:
             break
-        found_term = terms_trie.search_result()
+        found_term = terms_trie.term(node)
         if found_term:
             longest_term = found_term
             max_length = current_length + 1
@@ -0,0 +1,192 @@
+"""
+Compact representation of an analysed article.
+
+Words and tags are interned and stored as arrays of ids, occurrences of terms
+as (position, length, term name id) spans of sentences. The token store is
+immutable, so it can be shared (e.g. by all instances of an article). Sentence
+trees (nltk.ParentedTree) are built only for sentences which are actually
+requested and they are kept by LazySentences (not by the shared store).
+"""
+
+from __future__ import unicode_literals
+from knowledge.utils.terms import name_to_term
+from knowledge.utils.text import sentence_tree
+from array import array
+from collections import Counter
+import sys
+
+
+def _int_array(values=()):
+    return array(str('i'), values)
+
+
+class TokenStore(object):
+    """
+    Attributes:
+        term_counts: mapping from terms found in the article to the number of
+            their occurrences
+    """
+
+    def __init__(self, sentences, terms_matcher):
+        """
+        Args:
+            sentences: list of sentences (lists of [word, tag] tokens)
+            terms_matcher: TermsMatcher for finding terms occurrences
+        """
+        words, tags, names = {}, {}, {}
+        self._words = []
+        self._tags = []
+        # names of terms (as found by the terms matcher)
+        self._names = []
+        self._word_ids = _int_array()
+        self._tag_ids = _int_array()
+        # tokens of i-th sentence are in [sentence_starts[i], sentence_starts[i + 1])
+        self._sentence_starts = _int_array([0])
+        # spans of i-th sentence are in [span_starts[i], span_starts[i + 1])
+        self._span_starts = _int_array([0])
+        self._span_positions = _int_array()
+        self._span_lengths = _int_array()
+        self._span_names = _int_array()
+        self.term_counts = Counter()
+
+        for sentence in sentences:
+            sentence_words = []
+            for word, tag in sentence:
+                sentence_words.append(word)
+                if word not in words:
+                    words[word] = len(self._words)
+                    self._words.append(word)
+                if tag not in tags:
+                    tags[tag] = len(self._tags)
+                    self._tags.append(tag)
+                self._word_ids.append(words[word])
+                self._tag_ids.append(tags[tag])
+            self._sentence_starts.append(len(self._word_ids))
+
+            for position, length, name in terms_matcher.find_terms(sentence_words):
+                if name not in names:
+                    names[name] = len(self._names)
+                    self._names.append(name)
+                self.term_counts[name_to_term(name)] += 1
+                self._span_positions.append(position)
+                self._span_lengths.append(length)
+                self._span_names.append(names[name])
+            self._span_starts.append(len(self._span_names))
+
+    def __len__(self):
+        """
+        Returns number of sentences.
+        """
+        return len(self._sentence_starts) - 1
+
+    def sentence_tokens(self, index):
+        """
+        Returns (list of words, list of tags) of the sentence.
+        """
+        start = self._sentence_starts[index]
+        end = self._sentence_starts[index + 1]
+        return ([self._words[i] for i in self._word_ids[start:end]],
+            [self._tags[i] for i in self._tag_ids[start:end]])
+
+    def sentence_occurrences(self, index):
+        """
+        Returns list of (position, length, term name) of terms occurrences in
+        the sentence.
+        """
+        start = self._span_starts[index]
+        end = self._span_starts[index + 1]
+        return [(self._span_positions[i], self._span_lengths[i],
+            self._names[self._span_names[i]]) for i in range(start, end)]
+
+    def build_sentence(self, index):
+        """
+        Builds tree of the sentence.
+
+        Returns:
+            sentence tree, list of term nodes (with term attribute)
+        """
+        words, tags = self.sentence_tokens(index)
+        return sentence_tree(zip(words, tags), self.sentence_occurrences(index))
+
+    def term_count(self, term):
+        """
+        Returns number of occurrences of the term in the article.
+        """
+        return self.term_counts.get(term, 0)
+
+    def memory_size(self):
+        """
+        Returns estimated memory size of the store [B].
+        """
+        arrays = [self._word_ids, self._tag_ids, self._sentence_starts,
+            self._span_starts, self._span_positions, self._span_lengths,
+            self._span_names]
+        size = sum(a.itemsize * len(a) for a in arrays)
+        for strings in [self._words, self._tags, self._names, self.term_counts]:
+            size += sum(sys.getsizeof(string) for string in strings)
+        return size
+
+
+class LazySentences(object):
+    """
+    Read-only list of sentence trees of a TokenStore, trees are built only
+    when they are accessed (and then remembered by this list).
+    """
+
+    def __init__(self, token_store):
+        self.token_store = token_store
+        # materialized sentence trees: sentence index -> (tree, term nodes)
+        self._trees = {}
+
+    def _materialize(self, index):
+        materialized = self._trees.get(index)
+        if materialized is None:
+            materialized = self.token_store.build_sentence(index)
+            # NOTE: if two threads build the same tree, only one is kept
+            materialized = self._trees.setdefault(index, materialized)
+        return materialized
+
+    def sentence(self, index):
+        """
+        Returns tree of the sentence (built on the first request).
+        """
+        return self._materialize(index)[0]
+
+    def term_nodes(self, index):
+        """
+        Returns term nodes of the sentence tree.
+        """
+        return self._materialize(index)[1]
+
+    def __len__(self):
+        return len(self.token_store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.sentence(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('sentence index out of range')
+        return self.sentence(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.sentence(index)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def select(self, predicate):
+        """
+        Returns trees of sentences which satisfy the predicate, only these
+        trees are built.
+
+        Args:
+            predicate: function (list of words, list of tags) -> bool
+        """
+        return [self.sentence(index) for index in range(len(self))
+            if predicate(*self.token_store.sentence_tokens(index))]
@@ -54,6 +54,10 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 )
 
+# counting graph deserializations is only a debugging tool
+if DEBUG:
+    MIDDLEWARE_CLASSES += ('knowledge.middleware.GraphParseCounterMiddleware',)
+
 ROOT_URLCONF = 'smartoo.urls'
 
 WSGI_APPLICATION = 'development.wsgi.application'
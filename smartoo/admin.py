@@ -1,14 +1,17 @@
 from django.contrib import admin
 from knowledge.models import Article, KnowledgeBuilder, KnowledgeGraph
+from knowledge.models import UnresolvedTerm
 from exercises.models import Exercise, GradedExercise
 from exercises.models import ExercisesCreator, ExercisesGrader
 from practice.models import Practicer
-from smartoo.models import FeedbackedExercise, Session, AccumulativeFeedback
+from smartoo.models import FeedbackedExercise, Session, AccumulativeFeedback, Job
+from smartoo.models import ComponentsPerformance
 
 # models admin registration
 admin.site.register(Article)
 admin.site.register(KnowledgeBuilder)
 admin.site.register(KnowledgeGraph)
+admin.site.register(UnresolvedTerm)
 admin.site.register(Exercise)
 admin.site.register(GradedExercise)
 admin.site.register(ExercisesCreator)
@@ -17,3 +20,5 @@ admin.site.register(Practicer)
 admin.site.register(FeedbackedExercise)
 admin.site.register(Session)
 admin.site.register(AccumulativeFeedback)
+admin.site.register(Job)
+admin.site.register(ComponentsPerformance)
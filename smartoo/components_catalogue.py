@@ -0,0 +1,106 @@
+"""
+In-process catalogue of enabled components (so that components selection
+doesn't need to query them for each new session).
+"""
+
+from __future__ import unicode_literals
+from django.db.models.signals import post_save, post_delete
+from common.settings import COMPONENTS_CATALOGUE_TTL
+from knowledge.models import KnowledgeBuilder
+from exercises.models import ExercisesCreator, ExercisesGrader
+from practice.models import Practicer
+
+import copy
+import threading
+import time
+
+
+# component models in the order of session steps
+COMPONENTS_MODELS = [KnowledgeBuilder, ExercisesCreator, ExercisesGrader,
+    Practicer]
+
+
+class ComponentsSnapshot(object):
+    """
+    Enabled components of all steps loaded at once. A snapshot is never
+    changed (reloading the catalogue creates a new one), so components
+    selected from its lists can be always taken from it.
+    """
+
+    def __init__(self, components):
+        """
+        Args:
+            components: list (for each step) of dictionaries: pk -> component
+        """
+        self._components = components
+
+    def get_components_lists(self):
+        """
+        Returns sorted lists of primary keys of enabled components for each
+        step.
+        """
+        return [sorted(components) for components in self._components]
+
+    def get_component(self, step, pk):
+        """
+        Returns enabled component of the step with given primary key (a deep
+        copy of the cached instance, so it can be modified, including its
+        parameters).
+
+        Raises:
+            KeyError: if there is no such enabled component
+        """
+        return copy.deepcopy(self._components[step][pk])
+
+
+class ComponentsCatalogue(object):
+    """
+    Enabled components of all steps, loaded on the first request and kept
+    until a component is saved or deleted (in this process) or until the
+    time to live expires (changes made by other processes or by bulk
+    updates).
+    """
+
+    def __init__(self, ttl=COMPONENTS_CATALOGUE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._loaded = None
+
+    def get_snapshot(self):
+        """
+        Returns currently enabled components (ComponentsSnapshot). Components
+        selection should use a single snapshot, as the catalogue can be
+        reloaded (or invalidated) at any time.
+        """
+        with self._lock:
+            if self._snapshot is None or time.time() - self._loaded > self.ttl:
+                self._snapshot = ComponentsSnapshot([
+                    {component.pk: component
+                        for component in model.objects.filter(enabled=True)}
+                    for model in COMPONENTS_MODELS])
+                self._loaded = time.time()
+            return self._snapshot
+
+    def get_components_lists(self):
+        """
+        Returns sorted lists of primary keys of currently enabled components
+        for each step.
+        """
+        return self.get_snapshot().get_components_lists()
+
+    def invalidate(self, **kwargs):
+        """
+        Forgets loaded components (can be used as a signal receiver).
+        """
+        with self._lock:
+            self._snapshot = None
+
+
+components_catalogue = ComponentsCatalogue()
+
+for model in COMPONENTS_MODELS:
+    post_save.connect(components_catalogue.invalidate, sender=model,
+        dispatch_uid='components_catalogue_save_' + model.__name__)
+    post_delete.connect(components_catalogue.invalidate, sender=model,
+        dispatch_uid='components_catalogue_delete_' + model.__name__)
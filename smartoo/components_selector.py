@@ -1,12 +1,12 @@
 from __future__ import division
 
+from bisect import bisect_left
 from itertools import product
-from collections import defaultdict
 from random import uniform
+import random
 
-from knowledge.models import KnowledgeBuilder
-from exercises.models import ExercisesCreator, ExercisesGrader
-from practice.models import Practicer
+from common.settings import COMPONENTS_SELECTION
+from smartoo.components_catalogue import components_catalogue
 from smartoo.exceptions import SmartooError
 
 
@@ -15,8 +15,19 @@ class ComponentsSelector(object):
     Class for intelligent selecting session components.
     """
 
-    def __init__(self, session_manager):
-        self._session_manager = session_manager
+    def __init__(self, performances_manager, mode=None,
+            catalogue=components_catalogue):
+        """
+        Args:
+            performances_manager: manager of aggregated performances of
+                components combinations (smartoo.models.ComponentsPerformance)
+            mode: 'proportional' or 'thompson' (see SELECTION_ENGINES),
+                default is COMPONENTS_SELECTION setting
+            catalogue: catalogue of enabled components
+        """
+        self._performances_manager = performances_manager
+        self.mode = mode or COMPONENTS_SELECTION
+        self._catalogue = catalogue
 
     def select_components(self):
         """
@@ -30,87 +41,263 @@ class ComponentsSelector(object):
              exercises.models.ExerciseGrader,
              practice.models.Practicer)
         Raises:
-            django.core.exceptions.ObjectDoesNotExist: if there is no available
-                componente for a step
+            SmartooError: if there is no available componente for a step
         """
-        knowledge_builders = KnowledgeBuilder.objects.filter(enabled=True)
-        exercises_creators = ExercisesCreator.objects.filter(enabled=True)
-        exercises_graders = ExercisesGrader.objects.filter(enabled=True)
-        practicers = Practicer.objects.filter(enabled=True)
-
-        components_lists = map(
-            lambda queryset: queryset.values_list('pk', flat=True),
-            [knowledge_builders, exercises_creators,
-                exercises_graders, practicers])
+        # lists and selected components are taken from the same snapshot
+        # (a component can't be disabled in between)
+        snapshot = self._catalogue.get_snapshot()
+        components_lists = snapshot.get_components_lists()
 
         # check that there is at least one enabled component for each step
-        if any([not queryset.exists() for queryset in components_lists]):
+        if any([not components for components in components_lists]):
             raise SmartooError("No enabled components for a step.")
 
-        #print knowledge_builders.values_list('id', flat=True)
-        #print knowledge_builders.values_list('pk', flat=True)
-
-        performances = self.create_performances_list(components_lists)
+        # use bayes to randomly select components (component by component,
+        # without enumerating all combinations) or Thompson sampling
+        aggregates = self.load_aggregates(components_lists)
+        engine = SELECTION_ENGINES[self.mode](components_lists, aggregates)
+        components_keys = engine.sample()
 
-        # use bayes to randomly select components
-        components_keys = []
-        for step in range(4):
-            component_key = weighted_choice(performances, step)
-            components_keys.append(component_key)
-            # filter performances
-            performances = [p for p in performances if p[step] == component_key]
-
-        knowledge_builder = knowledge_builders.get(pk=components_keys[0])
-        exercises_creator = exercises_creators.get(pk=components_keys[1])
-        exercises_grader = exercises_graders.get(pk=components_keys[2])
-        practicer = practicers.get(pk=components_keys[3])
+        knowledge_builder, exercises_creator, exercises_grader, practicer = [
+            snapshot.get_component(step, pk)
+            for step, pk in enumerate(components_keys)]
 
         return (knowledge_builder, exercises_creator,
                 exercises_grader, practicer)
 
-    def create_performances_list(self, components_lists):
-        performances = defaultdict(list)
-
-        # retrieve all sessions with their feedbacks
-        # NOTE: sessions with small number of questions should be perioically
-        # deleted
-        sessions = self._session_manager.all()
-        for session in sessions:
-            # skip too sessions
-            if session.feedback.get_all_questions_count() < 3:
-                continue
-            components_keys = (
-                session.knowledge_builder.pk,
-                session.exercises_creator.pk,
-                session.exercises_grader.pk,
-                session.practicer.pk)
+    def load_aggregates(self, components_lists):
+        """
+        Returns aggregated performances of (counted) sessions for each
+        combination of currently enabled components.
+
+        Returns:
+            dictionary: components keys -> (performance sum, sessions count)
+        """
+        aggregates = {}
+        values = self._performances_manager.values_list(
+            'knowledge_builder_id', 'exercises_creator_id',
+            'exercises_grader_id', 'practicer_id',
+            'performance_sum', 'sessions_count')
+        components_sets = [set(components) for components in components_lists]
+        for value in values:
+            components_keys = tuple(value[:4])
             # check that all components are currently  enabled
-            if all([components_keys[i] in components_lists[i]
+            if all([components_keys[i] in components_sets[i]
                     for i in range(4)]):
-                performance = session.feedback.get_performance()
-                performances[components_keys].append(performance)
+                aggregates[components_keys] = tuple(value[4:])
+        return aggregates
+
+    def create_performances_list(self, components_lists):
+        """
+        Returns list of all combinations of components with their (smoothed)
+        mean performance.
+        """
+        aggregates = self.load_aggregates(components_lists)
+        return create_performances_list(components_lists, aggregates)
 
-        # smoothing: add one made up session with average performance
-        AVERAGE_PERFORMANCE = 0.5
-        for components_keys in product(*components_lists):
-            performances[tuple(components_keys)].append(AVERAGE_PERFORMANCE)
 
-        # transform to list and shrink to average number for a components-combo
-        performances_list = []
-        for components_keys in performances:
-            component_performances = performances[components_keys]
-            performance = sum(component_performances) / len(component_performances)
-            performance_record = list(components_keys)
-            performance_record.append(performance)
-            performances_list.append(performance_record)
+class FactorizedPerformances(object):
+    """
+    Smoothed performances of all combinations of components, which are not
+    enumerated: every combination has the prior (average) performance, except
+    observed combinations, whose deviations from the prior are stored.
+
+    Sampling a combination proportionally to its performance is the same as
+    sampling the components step by step proportionally to the sum of
+    performances of combinations with already selected components (as
+    select_from_performances_list does with the full list), but each step
+    takes only O(m + log n) time, where n is the number of components and m
+    the number of observed combinations with already selected components.
+    """
+
+    def __init__(self, components_lists, aggregates):
+        """
+        Args:
+            components_lists: sorted lists of components keys for each step
+            aggregates: dictionary mapping observed combinations to
+                (performance sum, sessions count)
+        """
+        self.components_lists = components_lists
+        self.deviations = {}
+        for components_keys, (performance_sum, count) in aggregates.items():
+            performance = smoothed_performance(performance_sum, count)
+            self.deviations[components_keys] = performance - AVERAGE_PERFORMANCE
+
+    def sample(self, random=random):
+        """
+        Returns randomly selected combination of components (list of keys).
 
-        return performances_list
+        Args:
+            random: random numbers generator (random.Random)
+        """
+        components_keys = []
+        observed = list(self.deviations.items())
+        for step, components in enumerate(self.components_lists):
+            # prior weight of a component = prior performances of all
+            # combinations of the remaining steps
+            combinations_count = 1
+            for next_components in self.components_lists[step + 1:]:
+                combinations_count *= len(next_components)
+            prior_weight = AVERAGE_PERFORMANCE * combinations_count
+
+            # observed components and their weights (sorted by keys)
+            deviations = {}
+            for keys, deviation in observed:
+                deviations[keys[step]] = deviations.get(keys[step], 0.0) + deviation
+            observed_keys = sorted(deviations)
+            cumulative_weights = []
+            total = 0.0
+            for key in observed_keys:
+                total += prior_weight + deviations[key]
+                cumulative_weights.append(total)
+            unobserved_count = len(components) - len(observed_keys)
+
+            point = random.uniform(0, total + prior_weight * unobserved_count)
+            if point < total or unobserved_count == 0:
+                index = min(bisect_left(cumulative_weights, point),
+                    len(observed_keys) - 1)
+                component_key = observed_keys[index]
+            else:
+                rank = min(int((point - total) / prior_weight),
+                    unobserved_count - 1)
+                component_key = components[_unobserved_index(components,
+                    observed_keys, rank)]
+
+            components_keys.append(component_key)
+            observed = [(keys, deviation) for keys, deviation in observed
+                if keys[step] == component_key]
+        return components_keys
+
+
+class ThompsonSampling(object):
+    """
+    Thompson sampling of combinations of components: performance of each
+    combination has Beta posterior (uniform prior updated by sessions
+    performances taken as fractional successes), one value is sampled from
+    each posterior and the combination with the highest value is selected.
+
+    Unobserved combinations all have the uniform prior, the maximum of their
+    samples is sampled at once (maximum of k uniform samples has the same
+    distribution as u ** (1 / k)) and the winning combination is any of them
+    (chosen uniformly), so the selection takes O(m) time for m observed
+    combinations, independently of the number of all combinations.
+    """
+
+    def __init__(self, components_lists, aggregates):
+        """
+        Args:
+            components_lists: lists of components keys for each step
+            aggregates: dictionary mapping observed combinations to
+                (performance sum, sessions count)
+        """
+        self.components_lists = components_lists
+        self.posteriors = {}
+        for components_keys, (performance_sum, count) in aggregates.items():
+            self.posteriors[components_keys] = (1.0 + performance_sum,
+                1.0 + max(0.0, count - performance_sum))
+        self.combinations_count = 1
+        for components in components_lists:
+            self.combinations_count *= len(components)
+
+    def sample(self, random=random):
+        """
+        Returns selected combination of components (list of keys).
+
+        Args:
+            random: random numbers generator (random.Random)
+        """
+        best_keys, best_value = None, -1.0
+        for components_keys, (alpha, beta) in self.posteriors.items():
+            value = random.betavariate(alpha, beta)
+            if value > best_value:
+                best_keys, best_value = components_keys, value
+        unobserved_count = self.combinations_count - len(self.posteriors)
+        if unobserved_count > 0:
+            value = random.random() ** (1.0 / unobserved_count)
+            if value > best_value:
+                best_keys = self._random_unobserved(random)
+        return list(best_keys)
+
+    def _random_unobserved(self, random):
+        # rejection sampling is fast unless (almost) all combinations are
+        # observed, then the unobserved ones are enumerated
+        for attempt in range(100):
+            components_keys = tuple(random.choice(components)
+                for components in self.components_lists)
+            if components_keys not in self.posteriors:
+                return components_keys
+        unobserved = [components_keys
+            for components_keys in product(*self.components_lists)
+            if components_keys not in self.posteriors]
+        return random.choice(unobserved)
+
+
+# selection engines for COMPONENTS_SELECTION setting
+SELECTION_ENGINES = {
+    'proportional': FactorizedPerformances,
+    'thompson': ThompsonSampling}
 
 
 # ----------------------------------------------------------
 #  Helper functions
 # ----------------------------------------------------------
 
+# smoothing: performance of one made up session for each combination
+AVERAGE_PERFORMANCE = 0.5
+
+
+def smoothed_performance(performance_sum, count):
+    """
+    Returns mean performance of sessions including one made up session with
+    average performance.
+    """
+    return (performance_sum + AVERAGE_PERFORMANCE) / (count + 1)
+
+
+def _unobserved_index(components, observed_keys, rank):
+    """
+    Returns index of the rank-th component (in the sorted list of components)
+    which is not in observed keys (sorted subset of components).
+    """
+    index = rank
+    for observed_index in (bisect_left(components, key)
+            for key in observed_keys):
+        if observed_index <= index:
+            index += 1
+        else:
+            break
+    return index
+
+
+def create_performances_list(components_lists, aggregates):
+    """
+    Returns list of all combinations of components with their smoothed mean
+    performance ([kb, ec, eg, pr, performance]).
+    """
+    performances_list = []
+    for components_keys in product(*components_lists):
+        performance_sum, count = aggregates.get(tuple(components_keys),
+            (0.0, 0))
+        performance_record = list(components_keys)
+        performance_record.append(smoothed_performance(performance_sum, count))
+        performances_list.append(performance_record)
+    return performances_list
+
+
+def select_from_performances_list(performances):
+    """
+    Selects combination of components from the list of all combinations,
+    step by step proportionally to performances.
+    """
+    components_keys = []
+    for step in range(4):
+        component_key = weighted_choice(performances, step)
+        components_keys.append(component_key)
+        # filter performances
+        performances = [p for p in performances if p[step] == component_key]
+    return components_keys
+
+
 def weighted_choice(performances, step):
     total = sum(p[-1] for p in performances)
     random_point = uniform(0, total)
@@ -0,0 +1,78 @@
+"""
+Background workers for session jobs (knowledge building and exercises
+creation), see smartoo.models.Job and manage.py run_jobs.
+"""
+
+from __future__ import unicode_literals
+from django.db import connections, reset_queries, DatabaseError
+from common.settings import JOBS_POLL_INTERVAL
+from smartoo.models import Job
+
+from multiprocessing import Process
+import logging
+import os
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def work(poll_interval=JOBS_POLL_INTERVAL, exit_when_idle=False):
+    """
+    Runs jobs until it's killed (or until there are no waiting jobs, if
+    :exit_when_idle: is set).
+
+    Returns:
+        number of run jobs
+    """
+    worker = '{host}:{pid}'.format(host=socket.gethostname(), pid=os.getpid())
+    jobs_count = 0
+    while True:
+        # the worker is a long running process (not a request), so it has to
+        # take care of its connections and of the queries log (DEBUG)
+        close_old_connections()
+        try:
+            job = Job.objects.claim_next(worker)
+            if job is not None:
+                logger.info('{worker} runs {job}'.format(worker=worker,
+                    job=job))
+                job.run()
+                jobs_count += 1
+        except DatabaseError:
+            # a broken connection is replaced before the next attempt (and
+            # the unfinished job is reclaimed after the timeout)
+            logger.exception('{worker} lost DB connection'.format(
+                worker=worker))
+            job = None
+        finally:
+            reset_queries()
+        if job is None:
+            if exit_when_idle:
+                return jobs_count
+            time.sleep(poll_interval)
+
+
+def close_old_connections():
+    """
+    Closes DB connections which are broken or too old (the same as
+    django.db.close_old_connections, which is called for each request),
+    except connections in a transaction (e.g. in tests).
+    """
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close_if_unusable_or_obsolete()
+
+
+def start_workers(workers_count, poll_interval=JOBS_POLL_INTERVAL):
+    """
+    Starts worker processes and waits for them.
+    """
+    # each process has to open its own DB connection
+    for connection in connections.all():
+        connection.close()
+    processes = [Process(target=work, args=(poll_interval,))
+        for i in range(workers_count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
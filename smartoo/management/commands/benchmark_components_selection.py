@@ -0,0 +1,64 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from smartoo.components_selector import FactorizedPerformances
+from smartoo.components_selector import create_performances_list, select_from_performances_list
+
+import random
+import time
+
+# numbers of knowledge builders, exercises creators, exercises graders and
+# practicers
+COMPONENTS_COUNTS = [
+    (2, 2, 2, 5),
+    (4, 4, 4, 20),
+    (8, 6, 6, 40),
+    (10, 10, 10, 100)]
+
+# number of observed combinations (with some sessions)
+OBSERVED_COUNT = 500
+
+
+def create_aggregates(components_lists, observed_count, seed=0):
+    """
+    Returns random aggregated performances of observed combinations.
+    """
+    generator = random.Random(seed)
+    aggregates = {}
+    for i in range(observed_count):
+        components_keys = tuple(generator.choice(components)
+            for components in components_lists)
+        count = generator.randint(1, 20)
+        aggregates[components_keys] = (count * generator.random(), count)
+    return aggregates
+
+
+def measure(function, repeat):
+    start = time.time()
+    for i in range(repeat):
+        function()
+    return (time.time() - start) / repeat
+
+
+class Command(BaseCommand):
+    args = '<repeat>'
+    help = 'Compares components selection from the full list of combinations and factorized selection'
+
+    def handle(self, *args, **options):
+        repeat = int(args[0]) if len(args) > 0 else 10
+        self.stdout.write('#components;combinations;full list [ms];'
+            'factorized [ms]')
+        for counts in COMPONENTS_COUNTS:
+            components_lists = [range(1, count + 1) for count in counts]
+            aggregates = create_aggregates(components_lists, OBSERVED_COUNT)
+            full_time = measure(lambda: select_from_performances_list(
+                create_performances_list(components_lists, aggregates)),
+                repeat)
+            factorized_time = measure(lambda: FactorizedPerformances(
+                components_lists, aggregates).sample(), repeat)
+            combinations_count = counts[0] * counts[1] * counts[2] * counts[3]
+            self.stdout.write('{counts};{combinations};{full:.2f};'
+                '{factorized:.3f}'.format(
+                    counts='x'.join(str(count) for count in counts),
+                    combinations=combinations_count,
+                    full=1000 * full_time,
+                    factorized=1000 * factorized_time))
@@ -0,0 +1,12 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from smartoo.models import ComponentsPerformance
+
+
+class Command(BaseCommand):
+    help = 'Recomputes aggregated performances of components from all sessions.'
+
+    def handle(self, *args, **options):
+        ComponentsPerformance.objects.rebuild()
+        self.stdout.write('{count} components combinations aggregated'.format(
+            count=ComponentsPerformance.objects.count()))
@@ -0,0 +1,26 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from common.settings import JOBS_POLL_INTERVAL
+from smartoo.jobs import work, start_workers
+
+from optparse import make_option
+
+
+class Command(BaseCommand):
+    args = '<workers>'
+    help = 'Runs workers for knowledge building and exercises creation jobs.'
+    option_list = BaseCommand.option_list + (
+        make_option('--once', action='store_true', dest='once', default=False,
+            help='Run waiting jobs and exit (in this process).'),
+        make_option('--poll-interval', type='float', dest='poll_interval',
+            default=JOBS_POLL_INTERVAL,
+            help='How often to look for new jobs [s].'),
+    )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            jobs_count = work(exit_when_idle=True)
+            self.stdout.write('{count} jobs run'.format(count=jobs_count))
+            return
+        workers_count = int(args[0]) if len(args) > 0 else 1
+        start_workers(workers_count, options['poll_interval'])
@@ -0,0 +1,32 @@
+from __future__ import unicode_literals
+from django.core.management.base import BaseCommand
+from smartoo.components_selector import SELECTION_ENGINES
+from smartoo.selection_simulation import create_true_performances, simulate_selection
+
+import time
+
+
+class Command(BaseCommand):
+    args = '<sessions> <kb> <ec> <eg> <pr>'
+    help = 'Compares components selection modes on simulated sessions'
+
+    def handle(self, *args, **options):
+        sessions_count = int(args[0]) if len(args) > 0 else 1000
+        counts = [int(arg) for arg in args[1:5]] or [2, 3, 2, 5]
+        components_lists = [range(1, count + 1) for count in counts]
+        true_performances = create_true_performances(components_lists)
+        best_keys = max(true_performances, key=true_performances.get)
+
+        self.stdout.write('#mode;sessions;mean regret;best selected in last'
+            ' 10 % of sessions;time per selection [ms]')
+        for mode in sorted(SELECTION_ENGINES):
+            start = time.time()
+            selected, regret = simulate_selection(mode, components_lists,
+                true_performances, sessions_count)
+            selection_time = (time.time() - start) / sessions_count
+            last_selected = selected[-max(1, sessions_count // 10):]
+            best_ratio = last_selected.count(best_keys) / float(len(last_selected))
+            self.stdout.write('{mode};{sessions};{regret:.4f};{best:.2f};'
+                '{time:.3f}'.format(mode=mode, sessions=sessions_count,
+                    regret=regret / sessions_count, best=best_ratio,
+                    time=1000 * selection_time))
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0002_auto_20150410_2004'),
+        ('smartoo', '0003_auto_20150430_1338'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='knowledge_graph',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.SET_NULL, default=None, blank=True, to='knowledge.KnowledgeGraph', null=True),
+            preserve_default=True,
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartoo', '0004_session_knowledge_graph'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('kind', models.CharField(max_length=20, choices=[(b'build-knowledge', b'build knowledge'), (b'create-exercises', b'create exercises')])),
+                ('active_key', models.CharField(default=None, max_length=255, unique=True, null=True, blank=True)),
+                ('status', models.CharField(default=b'pending', max_length=10, db_index=True, choices=[(b'pending', b'pending'), (b'running', b'running'), (b'done', b'done'), (b'failed', b'failed')])),
+                ('progress', models.FloatField(default=0.0)),
+                ('message', models.TextField(default=b'', blank=True)),
+                ('worker', models.CharField(default=b'', max_length=100, blank=True)),
+                ('created', models.DateTimeField()),
+                ('started', models.DateTimeField(default=None, null=True, blank=True)),
+                ('finished', models.DateTimeField(default=None, null=True, blank=True)),
+                ('session', models.ForeignKey(to='smartoo.Session')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+    ]
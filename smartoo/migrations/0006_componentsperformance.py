@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+FEEDBACK_FIELDS = ['correct_count', 'wrong_count', 'unanswered_count',
+    'invalid_count', 'irrelevant_count', 'final_rating']
+
+# copy of AccumulativeFeedback constants at the time of this migration (the
+# migration must not change with the current model)
+FINAL_RATING_WEIGHT = 5.0
+MIN_COUNTED_QUESTIONS = 3
+
+
+def get_counted_performance(correct_count, wrong_count, unanswered_count,
+        invalid_count, irrelevant_count, final_rating):
+    """
+    Returns performance of a session (see
+    AccumulativeFeedback.get_counted_performance) or None if the session has
+    too few questions to be counted.
+    """
+    all_count = correct_count + wrong_count + unanswered_count
+    if all_count < MIN_COUNTED_QUESTIONS:
+        return None
+    good_count = all_count - irrelevant_count - invalid_count
+    all_plus = all_count + FINAL_RATING_WEIGHT
+    good_plus = good_count + FINAL_RATING_WEIGHT * final_rating
+    return float(good_plus) / all_plus
+
+
+def compute_components_performances(apps, schema_editor):
+    """
+    Aggregates performances of all stored sessions.
+    """
+    Session = apps.get_model('smartoo', 'Session')
+    ComponentsPerformance = apps.get_model('smartoo', 'ComponentsPerformance')
+    performances = {}
+    rows = Session.objects.values_list('knowledge_builder_id',
+        'exercises_creator_id', 'exercises_grader_id', 'practicer_id',
+        *['feedback__' + field for field in FEEDBACK_FIELDS])
+    for row in rows.iterator():
+        performance = get_counted_performance(*row[4:])
+        if performance is None:
+            continue
+        performance_sum, count = performances.get(row[:4], (0.0, 0))
+        performances[row[:4]] = (performance_sum + performance, count + 1)
+    ComponentsPerformance.objects.bulk_create([ComponentsPerformance(
+        knowledge_builder_id=kb, exercises_creator_id=ec,
+        exercises_grader_id=eg, practicer_id=pr,
+        performance_sum=performance_sum, sessions_count=count)
+        for (kb, ec, eg, pr), (performance_sum, count) in performances.items()])
+
+
+def forget_components_performances(apps, schema_editor):
+    # the table is removed by reversing CreateModel
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0002_auto_20150410_2004'),
+        ('knowledge', '0005_knowledgegraph_term_index_data'),
+        ('practice', '0002_practicer'),
+        ('smartoo', '0005_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComponentsPerformance',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('performance_sum', models.FloatField(default=0.0)),
+                ('sessions_count', models.IntegerField(default=0)),
+                ('exercises_creator', models.ForeignKey(to='exercises.ExercisesCreator')),
+                ('exercises_grader', models.ForeignKey(to='exercises.ExercisesGrader')),
+                ('knowledge_builder', models.ForeignKey(to='knowledge.KnowledgeBuilder')),
+                ('practicer', models.ForeignKey(to='practice.Practicer')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='componentsperformance',
+            unique_together=set([('knowledge_builder', 'exercises_creator', 'exercises_grader', 'practicer')]),
+        ),
+        migrations.RunPython(compute_components_performances,
+            forget_components_performances),
+    ]
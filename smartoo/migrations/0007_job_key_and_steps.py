@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def fill_keys(apps, schema_editor):
+    """
+    Sets keys of active jobs (keys of finished jobs are not known).
+    """
+    Job = apps.get_model('smartoo', 'Job')
+    Job.objects.exclude(active_key=None).update(key=models.F('active_key'))
+
+
+def forget_keys(apps, schema_editor):
+    # the columns are removed by reversing AddField
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartoo', '0006_componentsperformance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='key',
+            field=models.CharField(default='', max_length=255, db_index=True),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='steps_done',
+            field=models.IntegerField(default=0),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='steps_total',
+            field=models.IntegerField(default=None, null=True, blank=True),
+            preserve_default=True,
+        ),
+        migrations.RunPython(fill_keys, forget_keys),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 
-from common.settings import SESSION_MAX_LENGTH
+from common.settings import SESSION_MAX_LENGTH, JOBS_TIMEOUT
+from common.utils.locks import LockTimeout
+from common.utils.progress import progress_reporter
 from knowledge.fields import TermField
 from knowledge.models import KnowledgeGraph, KnowledgeBuilder
 from exercises.models import ExercisesCreator
@@ -13,6 +15,7 @@ from smartoo.exceptions import SessionError
 
 import datetime
 import logging
+import os
 
 
 logger = logging.getLogger(__name__)
@@ -40,6 +43,10 @@ class AccumulativeFeedback(models.Model):
     # how much weight to put on the final rating vs. a single question rating
     FINAL_RATING_WEIGHT = 5.0
 
+    # minimal number of questions for the session to be used for components
+    # selection
+    MIN_COUNTED_QUESTIONS = 3
+
     # manager:
     #objects = AccumulativeFeedbackManager()
 
@@ -113,8 +120,34 @@ class AccumulativeFeedback(models.Model):
         performance = float(good_plus) / all_plus
         return performance
 
+    def get_counted_performance(self):
+        """
+        Returns performance of the session which is used for components
+        selection or None if the session has too few questions to be used.
+        """
+        if self.get_all_questions_count() < self.MIN_COUNTED_QUESTIONS:
+            return None
+        return self.get_performance()
+
 
 class SessionManager(models.Manager):
+    def with_components(self):
+        """
+        Returns sessions queryset which loads session feedback and all
+        components together with the session (in one query).
+        """
+        return self.select_related('feedback', 'knowledge_builder',
+            'exercises_creator', 'exercises_grader', 'practicer')
+
+    def load(self, pk):
+        """
+        Returns session with its feedback and components (one query).
+
+        Raises:
+            ObjectDoesNotExist: if there is no such session
+        """
+        return self.with_components().get(pk=pk)
+
     def create_with_components(self, topic):
         """
         Creates new session, selects components and saves it to DB.
@@ -143,6 +176,12 @@ class Session(models.Model):
     exercises_grader = models.ForeignKey(ExercisesGrader)
     practicer = models.ForeignKey(Practicer)
 
+    # knowledge graph used in this session; it's resolved (from the topic and
+    # knowledge builder) only once and remembered, so that the graph doesn't
+    # have to be loaded to find exercises for the session
+    knowledge_graph = models.ForeignKey(KnowledgeGraph, null=True, blank=True,
+        default=None, on_delete=models.SET_NULL)
+
     # feedback
     # NOTE: default=AccumulativeFeedback.objects.create doesn't work because of
     # some migrations serialization issues.
@@ -176,7 +215,8 @@ class Session(models.Model):
         """
         Selects components for this session.
         """
-        selector = ComponentsSelector(session_manager=Session.objects)
+        selector = ComponentsSelector(
+            performances_manager=ComponentsPerformance.objects)
         (self.knowledge_builder, self.exercises_creator, self.exercises_grader,
             self.practicer) = selector.select_components()
 
@@ -194,6 +234,9 @@ class Session(models.Model):
         except ValueError as exc:
             logger.warning('ValueError on knowledge building of ' + unicode(self.topic))
             raise SessionError('Value error: ' + exc.message)
+        except LockTimeout as exc:
+            logger.warning('LockTimeout on knowledge building of ' + unicode(self.topic))
+            raise SessionError('Lock timeout: ' + exc.message)
 
     def get_knowledge_graph(self):
         """
@@ -205,10 +248,34 @@ class Session(models.Model):
             knowledge graph
         """
         knowledge_graph = KnowledgeGraph.objects.get(
-            topic=self.topic,
-            knowledge_builder=self.knowledge_builder)
+            pk=self.get_knowledge_graph_pk())
         return knowledge_graph
 
+    def get_knowledge_graph_pk(self):
+        """
+        Returns primary key of the knowledge graph created for this session.
+        The graph itself is not loaded (and deserialized) and the key is
+        remembered after the first call.
+
+        Raises:
+            ObjectDoesNotExist: if knowledge graph hasn't been already created
+        Returns:
+            primary key of the knowledge graph
+        """
+        if self.knowledge_graph_id is None:
+            knowledge_graph_pk = KnowledgeGraph.objects.filter(
+                topic=self.topic,
+                knowledge_builder_id=self.knowledge_builder_id)\
+                .values_list('pk', flat=True).first()
+            if knowledge_graph_pk is None:
+                raise KnowledgeGraph.DoesNotExist(
+                    'No knowledge graph for the session topic.')
+            self.knowledge_graph_id = knowledge_graph_pk
+            if self.pk is not None:
+                Session.objects.filter(pk=self.pk).update(
+                    knowledge_graph=knowledge_graph_pk)
+        return self.knowledge_graph_id
+
     def create_graded_exercises(self):
         """
         Uses ExercisesCreator and ExercisesGrader to create and store exercises
@@ -225,9 +292,9 @@ class Session(models.Model):
         Returns all graded exercises for this session.
         """
         return GradedExercise.objects.filter(
-            exercise__knowledge_graph=self.get_knowledge_graph(),
-            exercise__exercises_creator=self.exercises_creator,
-            exercises_grader=self.exercises_grader)
+            exercise__knowledge_graph_id=self.get_knowledge_graph_pk(),
+            exercise__exercises_creator_id=self.exercises_creator_id,
+            exercises_grader_id=self.exercises_grader_id)
 
     def get_feedbacked_exercises(self):
         """
@@ -305,13 +372,38 @@ class Session(models.Model):
             irrelevant=feedback_dictionary["irrelevant"])
         feedbacked_exercise.save()
         # accumulate the feedback
+        counted_performance = self.feedback.get_counted_performance()
         self.feedback.add(feedbacked_exercise)
+        self.update_components_performance(counted_performance)
         # check if the session is over
         if self.get_questions_count() >= SESSION_MAX_LENGTH:
             self.set_finnished()
 
     def provide_final_feedback(self, rating):
+        counted_performance = self.feedback.get_counted_performance()
         self.feedback.add_final_rating(rating)
+        self.update_components_performance(counted_performance)
+
+    def update_components_performance(self, previous_performance):
+        """
+        Updates aggregated performance of the session components after
+        a change of the session feedback.
+
+        Args:
+            previous_performance: counted performance of the session before
+                the change (None if it wasn't counted)
+        """
+        ComponentsPerformance.objects.replace_performance(
+            self.get_components_keys(),
+            previous_performance,
+            self.feedback.get_counted_performance())
+
+    def get_components_keys(self):
+        """
+        Returns primary keys of the session components.
+        """
+        return (self.knowledge_builder_id, self.exercises_creator_id,
+            self.exercises_grader_id, self.practicer_id)
 
     def get_questions_count(self):
         return self.feedback.get_all_questions_count()
@@ -362,3 +454,328 @@ class FeedbackedExercise(models.Model):
             correct=self.correct,
             invalid=self.invalid,
             irrelevant=self.irrelevant)
+
+
+class ComponentsPerformanceManager(models.Manager):
+    def replace_performance(self, components_keys, previous_performance,
+            performance):
+        """
+        Replaces a session performance in the aggregate for the components
+        (None = session is not counted).
+        """
+        if previous_performance == performance:
+            return
+        performance_delta = (performance or 0.0) - (previous_performance or 0.0)
+        count_delta = int(performance is not None)\
+            - int(previous_performance is not None)
+        kb, ec, eg, pr = components_keys
+        aggregate = self.filter(knowledge_builder_id=kb,
+            exercises_creator_id=ec, exercises_grader_id=eg, practicer_id=pr)
+        updated = aggregate.update(
+            performance_sum=models.F('performance_sum') + performance_delta,
+            sessions_count=models.F('sessions_count') + count_delta)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    self.create(knowledge_builder_id=kb,
+                        exercises_creator_id=ec, exercises_grader_id=eg,
+                        practicer_id=pr, performance_sum=performance_delta,
+                        sessions_count=count_delta)
+            except IntegrityError:
+                # created concurrently by another process
+                aggregate.update(
+                    performance_sum=models.F('performance_sum') + performance_delta,
+                    sessions_count=models.F('sessions_count') + count_delta)
+
+    def rebuild(self):
+        """
+        Recomputes all aggregates from the sessions history.
+        """
+        performances = {}
+        sessions = Session.objects.select_related('feedback')
+        for session in sessions:
+            performance = session.feedback.get_counted_performance()
+            if performance is None:
+                continue
+            components_keys = session.get_components_keys()
+            performance_sum, count = performances.get(components_keys, (0.0, 0))
+            performances[components_keys] = (performance_sum + performance,
+                count + 1)
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create([ComponentsPerformance(
+                knowledge_builder_id=kb, exercises_creator_id=ec,
+                exercises_grader_id=eg, practicer_id=pr,
+                performance_sum=performance_sum, sessions_count=count)
+                for (kb, ec, eg, pr), (performance_sum, count)
+                in performances.items()])
+
+
+class ComponentsPerformance(models.Model):
+    """
+    Model for aggregated performance of all (counted) sessions with the same
+    components.
+    """
+    knowledge_builder = models.ForeignKey(KnowledgeBuilder)
+    exercises_creator = models.ForeignKey(ExercisesCreator)
+    exercises_grader = models.ForeignKey(ExercisesGrader)
+    practicer = models.ForeignKey(Practicer)
+
+    # sum of performances of the sessions and number of the sessions
+    performance_sum = models.FloatField(default=0.0)
+    sessions_count = models.IntegerField(default=0)
+
+    # manager
+    objects = ComponentsPerformanceManager()
+
+    class Meta:
+        unique_together = ('knowledge_builder', 'exercises_creator',
+            'exercises_grader', 'practicer')
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __unicode__(self):
+        return '<ComponentsPerformance components=({kb},{ec},{eg},{pr}); sum={sum}; count={count}>'.format(
+            kb=self.knowledge_builder_id,
+            ec=self.exercises_creator_id,
+            eg=self.exercises_grader_id,
+            pr=self.practicer_id,
+            sum=self.performance_sum,
+            count=self.sessions_count)
+
+
+class JobManager(models.Manager):
+    def submit(self, kind, session):
+        """
+        Creates new job for the session, unless the same job (e.g. building
+        knowledge for the same topic by the same builder) is already waiting
+        or running, in which case the existing job is returned. If the work
+        has been already done, an unsaved job with DONE status is returned
+        (so the session doesn't wait for a worker).
+
+        Args:
+            kind: Job.BUILD_KNOWLEDGE or Job.CREATE_EXERCISES
+            session: session which needs the job done
+        Returns:
+            job (smartoo.models.Job)
+        """
+        key = Job.create_key(kind, session)
+        existing_job = self.filter(active_key=key).first()
+        if existing_job is not None:
+            return existing_job
+        if Job.is_done(kind, session):
+            return Job(kind=kind, session=session, key=key, status=Job.DONE,
+                progress=1.0)
+        try:
+            # unique active_key guarantees a single active job even for
+            # concurrent submissions from more processes
+            with transaction.atomic():
+                return self.create(kind=kind, session=session, key=key,
+                    active_key=key, created=datetime.datetime.now())
+        except IntegrityError:
+            return self.get(active_key=key)
+
+    def claim(self, job, worker=None):
+        """
+        Marks the job as running by the worker. Returns True if the job was
+        claimed, False if it was claimed by another worker before.
+        """
+        worker = worker or str(os.getpid())
+        now = datetime.datetime.now()
+        # the update succeeds only if no other worker claimed the job
+        claimed = self.filter(pk=job.pk, status=job.status,
+            started=job.started).update(status=Job.RUNNING, worker=worker,
+                started=now, progress=0.0, steps_done=0, steps_total=None)
+        if claimed:
+            job.status, job.worker, job.started = Job.RUNNING, worker, now
+            job.progress, job.steps_done, job.steps_total = 0.0, 0, None
+        return bool(claimed)
+
+    def claim_next(self, worker=None):
+        """
+        Marks the oldest waiting job (or a running job which has timed out)
+        as running by the worker and returns it. Returns None if there is no
+        such job.
+        """
+        timeout = datetime.datetime.now() - datetime.timedelta(
+            seconds=JOBS_TIMEOUT)
+        candidates = self.filter(
+            models.Q(status=Job.PENDING)
+            | models.Q(status=Job.RUNNING, started__lt=timeout))\
+            .order_by('created')
+        for job in candidates[:10]:
+            if self.claim(job, worker):
+                return job
+        return None
+
+
+class Job(models.Model):
+    """
+    Model for a background job (knowledge building or exercises creation) of
+    a session.
+    """
+    BUILD_KNOWLEDGE = 'build-knowledge'
+    CREATE_EXERCISES = 'create-exercises'
+    KIND_CHOICES = (
+        (BUILD_KNOWLEDGE, 'build knowledge'),
+        (CREATE_EXERCISES, 'create exercises'))
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'pending'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed'))
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+
+    # session for which the job was created (jobs are shared by sessions
+    # with the same topic and components)
+    session = models.ForeignKey(Session)
+
+    # identification of the work to do (see create_key)
+    key = models.CharField(max_length=255, db_index=True, default='')
+
+    # the same as key, but set only while the job is waiting or running (so
+    # there is at most one active job for the same work)
+    active_key = models.CharField(max_length=255, unique=True, null=True,
+        blank=True, default=None)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+        default=PENDING, db_index=True)
+
+    # finished part of the job (between 0 and 1), if the number of steps
+    # isn't known, it's 0 until the job is finished
+    progress = models.FloatField(default=0.0)
+
+    # number of finished steps (e.g. retrieved graphs or created exercises)
+    # and number of all steps (null if it isn't known in advance)
+    steps_done = models.IntegerField(default=0)
+    steps_total = models.IntegerField(null=True, blank=True, default=None)
+
+    # error message of a failed job
+    message = models.TextField(blank=True, default='')
+
+    # worker which runs the job
+    worker = models.CharField(max_length=100, blank=True, default='')
+
+    created = models.DateTimeField()
+    started = models.DateTimeField(null=True, blank=True, default=None)
+    finished = models.DateTimeField(null=True, blank=True, default=None)
+
+    # manager
+    objects = JobManager()
+
+    @staticmethod
+    def create_key(kind, session):
+        """
+        Returns key identifying the work of the job for the session.
+        """
+        if kind == Job.BUILD_KNOWLEDGE:
+            components = [session.knowledge_builder_id]
+        else:
+            components = [session.knowledge_builder_id,
+                session.exercises_creator_id, session.exercises_grader_id]
+        return '{kind}:{components}:{topic}'.format(kind=kind,
+            components=','.join(unicode(pk) for pk in components),
+            topic=session.topic)[:255]
+
+    @staticmethod
+    def is_done(kind, session):
+        """
+        Returns True if the work of a job of given kind has been already done
+        for the session (knowledge graph is built or exercises are created and
+        graded).
+        """
+        try:
+            if kind == Job.BUILD_KNOWLEDGE:
+                session.get_knowledge_graph_pk()
+                return True
+            return session.get_graded_exercises().exists()
+        except KnowledgeGraph.DoesNotExist:
+            return False
+
+    @staticmethod
+    def perform(kind, session):
+        """
+        Does the work of a job of given kind for the session (without
+        creating the job).
+        """
+        if kind == Job.BUILD_KNOWLEDGE:
+            session.build_knowledge()
+        else:
+            session.create_graded_exercises()
+
+    def run(self):
+        """
+        Does the job (the job should be already claimed by a worker) and
+        stores its progress and result.
+        """
+        try:
+            with progress_reporter(self.update_progress):
+                Job.perform(self.kind, self.session)
+        except Exception as exc:
+            logger.exception('{job} failed'.format(job=self))
+            self.finish(Job.FAILED, unicode(exc))
+        else:
+            self.finish(Job.DONE)
+
+    def _claimed_job(self):
+        """
+        Returns queryset with this job, if it's still claimed by the same
+        worker (i.e. it wasn't reclaimed by another worker after a timeout).
+        """
+        return Job.objects.filter(pk=self.pk, worker=self.worker,
+            started=self.started)
+
+    def update_progress(self, done, total=None):
+        """
+        Stores progress of the job.
+
+        Args:
+            done: number of finished steps
+            total: number of all steps (None if unknown)
+        """
+        progress = min(1.0, float(done) / total) if total else 0.0
+        if self._claimed_job().update(steps_done=done, steps_total=total,
+                progress=progress):
+            self.steps_done, self.steps_total = done, total
+            self.progress = progress
+
+    def finish(self, status, message=''):
+        """
+        Stores result of the job. Returns False if the result wasn't stored,
+        because the job was reclaimed by another worker.
+        """
+        finished = datetime.datetime.now()
+        if not self._claimed_job().update(status=status, message=message,
+                progress=1.0, active_key=None, finished=finished):
+            logger.warning('{job} was reclaimed by another worker'.format(
+                job=self))
+            return False
+        self.status = status
+        self.message = message
+        self.progress = 1.0
+        self.active_key = None
+        self.finished = finished
+        return True
+
+    def get_queue_position(self):
+        """
+        Returns number of waiting jobs which were submitted before this job.
+        """
+        if self.status != Job.PENDING:
+            return 0
+        return Job.objects.filter(status=Job.PENDING,
+            created__lt=self.created).count()
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __unicode__(self):
+        return '<Job pk={pk}; kind={kind}; status={status}>'.format(
+            pk=self.pk, kind=self.kind, status=self.status)
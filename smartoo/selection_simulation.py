@@ -0,0 +1,60 @@
+"""
+Simulation of components selection with simulated feedback (to compare
+selection engines, see smartoo.components_selector.SELECTION_ENGINES).
+"""
+
+from __future__ import division
+from smartoo.components_selector import SELECTION_ENGINES
+
+from itertools import product
+import random
+
+
+def create_true_performances(components_lists, seed=0):
+    """
+    Returns random (true) mean performance for each combination of components.
+    """
+    generator = random.Random(seed)
+    return {components_keys: generator.uniform(0.2, 0.8)
+        for components_keys in product(*components_lists)}
+
+
+def simulate_selection(mode, components_lists, true_performances,
+        sessions_count, questions_count=10, seed=0):
+    """
+    Simulates sessions: components for each session are selected by the
+    engine, performance of the session is the ratio of good questions (each
+    question is good with the true performance of the combination) and it's
+    aggregated as the performance of a finished session.
+
+    Args:
+        mode: selection engine (key of SELECTION_ENGINES)
+        components_lists: lists of components keys for each step
+        true_performances: dictionary mapping combinations to their true
+            mean performance
+        sessions_count: number of simulated sessions
+        questions_count: number of questions in a session
+        seed: seed of the random numbers generator
+    Returns:
+        (list of selected combinations, total regret), where regret of
+        a session is the difference between the best true performance and
+        the true performance of the selected combination
+    """
+    generator = random.Random(seed)
+    engine_class = SELECTION_ENGINES[mode]
+    best_performance = max(true_performances.values())
+    aggregates = {}
+    selected = []
+    regret = 0.0
+    for i in range(sessions_count):
+        engine = engine_class(components_lists, aggregates)
+        components_keys = tuple(engine.sample(generator))
+        selected.append(components_keys)
+        true_performance = true_performances[components_keys]
+        regret += best_performance - true_performance
+        good_count = sum(generator.random() < true_performance
+            for j in range(questions_count))
+        performance_sum, count = aggregates.get(components_keys, (0.0, 0))
+        aggregates[components_keys] = (
+            performance_sum + good_count / questions_count, count + 1)
+    return selected, regret
@@ -1,4 +1,22 @@
-smartooApp.service('smartooService', ['$http', function ($http) {
+smartooApp.service('smartooService', ['$http', '$timeout', function ($http, $timeout) {
+
+    // how often to ask for status of an unfinished job [ms]
+    var JOB_POLL_INTERVAL = 1000;
+
+    // resolves job response when the job is done (or failed)
+    function waitForJob(data) {
+        if (!data.success || data.status == 'done') {
+            return data;
+        }
+        return $timeout(function() {}, JOB_POLL_INTERVAL).then(function() {
+            return $http.get('/interface/job-status', {params: {job: data.job}})
+                .then(function(response) {
+                    return waitForJob(response.data);
+                }, function(response) {
+                    return createFailResponse(response);
+                });
+        });
+    }
 
     // POST request to send feedback message
     this.sendMessage = function(message) {
@@ -20,21 +38,23 @@ smartooApp.service('smartooService', ['$http', function ($http) {
             });
     };
 
-    // POST request to build knowledge
+    // POST request to build knowledge (response comes when the knowledge is
+    // built)
     this.buildKnowledge = function() {
         return $http.post('/interface/build-knowledge')
             .then(function(response) {
-                return response.data;
+                return waitForJob(response.data);
             }, function(response) {
                 return createFailResponse(response);
             });
     };
 
-    // POST request to create exercises
+    // POST request to create exercises (response comes when the exercises
+    // are created)
     this.createExercises = function() {
         return $http.post('/interface/create-exercises')
             .then(function(response) {
-                return response.data;
+                return waitForJob(response.data);
             }, function(response) {
                 return createFailResponse(response);
             });
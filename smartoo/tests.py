@@ -1,4 +1,5 @@
 from django.test import TestCase
+from common.utils.mock import MockObject
 #from common.settings import SKIP_ONLINE_TESTS
 from knowledge.models import Article, KnowledgeGraph, KnowledgeBuilder
 from knowledge.namespaces import TERM
@@ -6,6 +7,17 @@ from exercises.models import Exercise, ExercisesCreator
 from exercises.models import GradedExercise, ExercisesGrader
 from practice.models import Practicer
 from smartoo.models import Session, AccumulativeFeedback, FeedbackedExercise
+from smartoo.models import ComponentsPerformance
+from smartoo import ComponentsSelector
+from smartoo.components_catalogue import components_catalogue
+from smartoo.components_selector import FactorizedPerformances
+from smartoo.components_selector import create_performances_list
+from smartoo.components_selector import ThompsonSampling
+from smartoo.selection_simulation import create_true_performances, simulate_selection
+
+from collections import Counter
+from itertools import product
+from random import Random
 from smartoo.exceptions import SmartooError
 
 
@@ -230,3 +242,194 @@ class SessionTestCase(TestCase):
 
         # all exercises used, the next one should be None
         self.assertIsNone(session.next_exercise())
+
+
+class ComponentsPerformanceTestCase(TestCase):
+    def setUp(self):
+        self.topic = TERM['Pan_Tau']
+        Article.objects.create(
+            topic=self.topic,
+            content=Article.EMPTY_CONTENT)
+        for model in [KnowledgeBuilder, ExercisesCreator, ExercisesGrader,
+                Practicer]:
+            model.objects.create(behavior_name='fake',
+                parameters={"alpha": 1.0})
+        self.session = Session.objects.create_with_components(self.topic)
+        self.session.build_knowledge()
+        self.session.create_graded_exercises()
+
+    def practice(self, session, exercises_count):
+        for i in range(exercises_count):
+            exercise = session.next_exercise()
+            session.provide_feedback({
+                'pk': exercise.pk,
+                'answered': True,
+                'correct': i % 2 == 0,
+                'invalid': False,
+                'irrelevant': i == 0})
+
+    def test_incremental_update(self):
+        self.practice(self.session, 2)
+        # sessions with too few questions are not counted
+        self.assertEqual(ComponentsPerformance.objects.count(), 0)
+        self.practice(self.session, 1)
+        aggregate = ComponentsPerformance.objects.get()
+        self.assertEqual(aggregate.sessions_count, 1)
+        self.assertAlmostEqual(aggregate.performance_sum,
+            self.session.feedback.get_performance())
+
+        self.session.provide_final_feedback(0.0)
+        other_session = Session.objects.create_with_components(self.topic)
+        self.practice(other_session, 4)
+        aggregate = ComponentsPerformance.objects.get()
+        self.assertEqual(aggregate.sessions_count, 2)
+        expected_sum = self.session.feedback.get_performance()\
+            + other_session.feedback.get_performance()
+        self.assertAlmostEqual(aggregate.performance_sum, expected_sum)
+
+        # rebuild from the sessions history gives the same aggregates
+        ComponentsPerformance.objects.all().delete()
+        ComponentsPerformance.objects.rebuild()
+        aggregate = ComponentsPerformance.objects.get()
+        self.assertEqual(aggregate.sessions_count, 2)
+        self.assertAlmostEqual(aggregate.performance_sum, expected_sum)
+
+    def test_selector_reads_only_aggregates(self):
+        self.practice(self.session, 3)
+        performance = self.session.feedback.get_performance()
+        selector = ComponentsSelector(
+            performances_manager=ComponentsPerformance.objects)
+        components_lists = [[pk] for pk in self.session.get_components_keys()]
+        with self.assertNumQueries(1):
+            performances = selector.create_performances_list(components_lists)
+        # smoothing by one session with average performance
+        self.assertEqual(len(performances), 1)
+        self.assertAlmostEqual(performances[0][-1], (performance + 0.5) / 2)
+
+    def test_thompson_mode(self):
+        selector = ComponentsSelector(
+            performances_manager=ComponentsPerformance.objects, mode='thompson')
+        components = selector.select_components()
+        self.assertEqual(tuple(component.pk for component in components),
+            self.session.get_components_keys())
+
+
+class FactorizedPerformancesTestCase(TestCase):
+    def setUp(self):
+        self.components_lists = [[1, 2], [3, 5, 7], [1], [2, 4, 6, 8]]
+        self.aggregates = {
+            (1, 3, 1, 2): (2.7, 3),
+            (1, 3, 1, 4): (0.1, 2),
+            (2, 7, 1, 8): (0.9, 1)}
+
+    def test_sample_distribution(self):
+        # combinations are sampled with probability proportional to their
+        # performance (the same as from the full list of combinations)
+        performances = create_performances_list(self.components_lists,
+            self.aggregates)
+        total = sum(p[-1] for p in performances)
+        factorized = FactorizedPerformances(self.components_lists,
+            self.aggregates)
+        random = Random(0)
+        samples_count = 20000
+        counts = Counter(tuple(factorized.sample(random))
+            for i in range(samples_count))
+        self.assertEqual(len(counts), len(performances))
+        for performance in performances:
+            frequency = counts[tuple(performance[:4])] / float(samples_count)
+            self.assertAlmostEqual(frequency, performance[-1] / total,
+                delta=0.01)
+
+    def test_sample_boundaries(self):
+        factorized = FactorizedPerformances(self.components_lists,
+            self.aggregates)
+        # the lowest point selects the first observed components
+        self.assertEqual(factorized.sample(MockObject(uniform=lambda a, b: a)),
+            [1, 3, 1, 2])
+        # the highest point selects the last unobserved components
+        self.assertEqual(factorized.sample(MockObject(uniform=lambda a, b: b)),
+            [2, 5, 1, 8])
+
+
+class ThompsonSamplingTestCase(TestCase):
+    def setUp(self):
+        self.components_lists = [[1, 2], [3, 5], [1], [2, 4, 6]]
+
+    def test_sample_best_posterior(self):
+        aggregates = {keys: (5.0, 100)
+            for keys in product(*self.components_lists)}
+        aggregates[(2, 3, 1, 4)] = (95.0, 100)
+        thompson = ThompsonSampling(self.components_lists, aggregates)
+        random = Random(0)
+        for i in range(100):
+            self.assertEqual(thompson.sample(random), [2, 3, 1, 4])
+
+    def test_sample_unobserved(self):
+        # with a single bad observed combination, unobserved (uniform prior)
+        # combinations are selected uniformly
+        thompson = ThompsonSampling(self.components_lists,
+            {(1, 3, 1, 2): (0.0, 50)})
+        random = Random(0)
+        counts = Counter(tuple(thompson.sample(random)) for i in range(2200))
+        self.assertNotIn((1, 3, 1, 2), counts)
+        self.assertEqual(len(counts), 11)
+        for count in counts.values():
+            self.assertAlmostEqual(count / 2200.0, 1 / 11.0, delta=0.03)
+
+    def test_simulated_feedback(self):
+        # Thompson sampling converges to the best combination faster than
+        # selection proportional to mean performances
+        true_performances = create_true_performances(self.components_lists)
+        best_keys = max(true_performances, key=true_performances.get)
+        results = {}
+        for mode in ['proportional', 'thompson']:
+            results[mode] = simulate_selection(mode, self.components_lists,
+                true_performances, sessions_count=500)
+        self.assertLess(results['thompson'][1], results['proportional'][1])
+        last_selected = results['thompson'][0][-50:]
+        self.assertGreater(last_selected.count(best_keys), 25)
+
+
+class ComponentsCatalogueTestCase(TestCase):
+    def setUp(self):
+        for model in [KnowledgeBuilder, ExercisesCreator, ExercisesGrader,
+                Practicer]:
+            model.objects.create(behavior_name='fake',
+                parameters={"alpha": 1.0})
+        self.practicer = Practicer.objects.create(behavior_name='fake',
+            parameters={"alpha": 2.0})
+        self.selector = ComponentsSelector(
+            performances_manager=ComponentsPerformance.objects)
+
+    def test_no_component_queries(self):
+        self.selector.select_components()
+        # only aggregated performances are queried
+        with self.assertNumQueries(1):
+            components = self.selector.select_components()
+        self.assertIsInstance(components[0], KnowledgeBuilder)
+        self.assertIsInstance(components[3], Practicer)
+        # selected components are not shared by sessions
+        other_components = self.selector.select_components()
+        self.assertIsNot(components[0], other_components[0])
+        components[0].parameters['alpha'] = 0.0
+        self.assertEqual(other_components[0].parameters['alpha'], 1.0)
+
+    def test_invalidation_during_selection(self):
+        snapshot = components_catalogue.get_snapshot()
+        self.practicer.enabled = False
+        self.practicer.save()
+        # the component selected from the snapshot lists is still available
+        self.assertIn(self.practicer.pk, snapshot.get_components_lists()[3])
+        self.assertEqual(snapshot.get_component(3, self.practicer.pk).pk,
+            self.practicer.pk)
+        self.assertIsNot(components_catalogue.get_snapshot(), snapshot)
+
+    def test_invalidation_on_save(self):
+        self.selector.select_components()
+        self.practicer.enabled = False
+        self.practicer.save()
+        self.assertNotIn(self.practicer.pk,
+            components_catalogue.get_components_lists()[3])
+        for i in range(10):
+            components = self.selector.select_components()
+            self.assertNotEqual(components[3].pk, self.practicer.pk)
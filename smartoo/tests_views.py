@@ -3,15 +3,21 @@
 from __future__ import unicode_literals
 
 #from django.core.urlresolvers import reverse
-from django.test import TestCase
+from django.db import DatabaseError
+from django.test import TestCase, RequestFactory
 
 from common.utils.mock import MockObject
 from common.settings import SKIP_ONLINE_TESTS, SKIP_LOGGING_TESTS
 from knowledge.namespaces import TERM
 from knowledge.models import KnowledgeGraph
+from knowledge.utils.graph_serialization import get_parse_count, reset_parse_count
 from exercises.models import Exercise, GradedExercise
-from smartoo.models import Session
+from smartoo.jobs import work
+from smartoo.models import Session, Job
+from smartoo import views
 from smartoo.views import start_session, build_knowledge, create_exercises, next_exercise
+from smartoo.views import job_status, session_feedback, feedback_message
+from smartoo.views import retrieve_current_session
 
 from json import loads, dumps
 from unittest import skipIf
@@ -97,6 +103,130 @@ class CreateExercisesViewTestCase(TestCase):
             "The number of stored grades and exercises is different.")
 
 
+class JobsViewsTestCase(TestCase):
+    fixtures = ['fake-components-article.xml']
+
+    def setUp(self):
+        self.jobs_async = views.JOBS_ASYNC
+        views.JOBS_ASYNC = True
+        self.topic = TERM['Abraham_Lincoln']
+
+    def tearDown(self):
+        views.JOBS_ASYNC = self.jobs_async
+
+    def request_job(self, view, session):
+        fake_request = MockObject(session={'session_id': session.id})
+        return loads(view(fake_request).content)
+
+    def get_job_status(self, job_pk, session):
+        fake_request = MockObject(session={'session_id': session.id},
+            GET={'job': job_pk})
+        return job_status(fake_request)
+
+    def test_build_knowledge_by_worker(self):
+        sessions = [Session.objects.create_with_components(self.topic)
+            for i in range(2)]
+        responses = [self.request_job(build_knowledge, session)
+            for session in sessions]
+        # both sessions wait for the same job
+        self.assertEqual(responses[0]['job'], responses[1]['job'])
+        self.assertEqual(responses[0]['status'], Job.PENDING)
+        self.assertEqual(KnowledgeGraph.objects.count(), 0)
+
+        self.assertEqual(work(exit_when_idle=True), 1)
+        response = self.get_job_status(responses[0]['job'], sessions[1])
+        self.assertEqual(loads(response.content)['status'], Job.DONE)
+        self.assertEqual(KnowledgeGraph.objects.count(), 1)
+
+        # the work is already done, so no job is created for it
+        response = self.request_job(build_knowledge, sessions[0])
+        self.assertEqual(response['status'], Job.DONE)
+        self.assertIsNone(response['job'])
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_create_exercises_by_worker(self):
+        session = Session.objects.create_with_components(self.topic)
+        session.build_knowledge()
+        response = self.request_job(create_exercises, session)
+        self.assertEqual(response['queuePosition'], 0)
+        work(exit_when_idle=True)
+        response = self.get_job_status(response['job'], session)
+        self.assertEqual(loads(response.content)['status'], Job.DONE)
+        self.assertGreater(GradedExercise.objects.count(), 0)
+
+    def test_done_exercises_not_queued(self):
+        session = Session.objects.create_with_components(self.topic)
+        session.build_knowledge()
+        session.create_graded_exercises()
+        response = self.request_job(create_exercises, session)
+        self.assertEqual(response['status'], Job.DONE)
+        self.assertEqual(Job.objects.count(), 0)
+
+    def test_failed_job(self):
+        # exercises can't be created before the knowledge is built
+        session = Session.objects.create_with_components(self.topic)
+        response = self.request_job(create_exercises, session)
+        work(exit_when_idle=True)
+        response = self.get_job_status(response['job'], session)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(loads(response.content)['status'], Job.FAILED)
+
+    def test_worker_survives_db_error(self):
+        def claim_next(worker=None):
+            raise DatabaseError('connection lost')
+        Job.objects.claim_next = claim_next
+        try:
+            self.assertEqual(work(exit_when_idle=True), 0)
+        finally:
+            del Job.objects.claim_next
+        session = Session.objects.create_with_components(self.topic)
+        self.request_job(build_knowledge, session)
+        self.assertEqual(work(exit_when_idle=True), 1)
+
+    def test_exercises_job_progress(self):
+        session = Session.objects.create_with_components(self.topic)
+        session.build_knowledge()
+        job = Job.objects.submit(Job.CREATE_EXERCISES, session)
+        Job.objects.claim(job, worker='test')
+        job.run()
+        job = Job.objects.get(pk=job.pk)
+        self.assertEqual(job.steps_done, Exercise.objects.count())
+        self.assertGreater(job.steps_done, 0)
+
+    def test_reclaimed_job_not_finished(self):
+        session = Session.objects.create_with_components(self.topic)
+        job = Job.objects.submit(Job.BUILD_KNOWLEDGE, session)
+        Job.objects.claim(job, worker='first')
+        # another worker takes over the job (e.g. after a timeout)
+        Job.objects.claim(Job.objects.get(pk=job.pk), worker='second')
+        self.assertFalse(job.finish(Job.FAILED, 'too slow'))
+        job = Job.objects.get(pk=job.pk)
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.worker, 'second')
+
+    def test_job_of_other_session(self):
+        session = Session.objects.create_with_components(self.topic)
+        response = self.request_job(build_knowledge, session)
+        other_session = Session.objects.create_with_components(
+            TERM['Albert_Einstein'])
+        response = self.get_job_status(response['job'], other_session)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(loads(response.content)['success'], False)
+
+    def test_sync_job_not_stored(self):
+        views.JOBS_ASYNC = False
+        session = Session.objects.create_with_components(self.topic)
+        response = self.request_job(build_knowledge, session)
+        self.assertEqual(response['status'], Job.DONE)
+        self.assertEqual(KnowledgeGraph.objects.count(), 1)
+        self.assertEqual(Job.objects.count(), 0)
+
+    def test_unknown_job(self):
+        session = Session.objects.create_with_components(self.topic)
+        response = self.get_job_status('123', session)
+        self.assertEqual(response.status_code, 400)
+
+
 class NextExerciseViewTestCase(TestCase):
     fixtures = ['fake-components-article.xml']
 
@@ -112,3 +242,112 @@ class NextExerciseViewTestCase(TestCase):
         self.assertEqual(response_content["success"], True)
         self.assertIn('exercise', response_content)
         self.assertIn('question', response_content['exercise'])
+
+    def test_next_exercise_without_graph_parsing(self):
+        topic = TERM['Abraham_Lincoln']
+        session = Session.objects.create_with_components(topic)
+        session.build_knowledge()
+        session.create_graded_exercises()
+
+        # count all graph deserializations during the requests
+        reset_parse_count()
+        for i in range(2):
+            fake_request = MockObject(session={'session_id': session.id},
+                body=None)
+            response = next_exercise(fake_request)
+            self.assertEqual(loads(response.content)["success"], True)
+
+        self.assertEqual(get_parse_count(), 0)
+        # knowledge graph is remembered by the session
+        session = Session.objects.get(pk=session.pk)
+        self.assertEqual(session.knowledge_graph_id,
+            KnowledgeGraph.objects.get(topic=topic).pk)
+
+
+class SessionLoadingTestCase(TestCase):
+    fixtures = ['fake-components-article.xml']
+
+    def setUp(self):
+        self.session = Session.objects.create_with_components(
+            TERM['Abraham_Lincoln'])
+
+    def fake_request(self, **kwargs):
+        return MockObject(session={'session_id': self.session.id}, **kwargs)
+
+    def test_retrieve_current_session(self):
+        fake_request = self.fake_request()
+        # session, its feedback and components are loaded by one query
+        with self.assertNumQueries(1):
+            session = retrieve_current_session(fake_request)
+            unicode(session)
+            session.feedback.get_all_questions_count()
+        # and the session is remembered for the rest of the request
+        with self.assertNumQueries(0):
+            self.assertIs(retrieve_current_session(fake_request), session)
+
+    def test_build_knowledge_queries(self):
+        self.session.build_knowledge()
+        # knowledge is already built: session, check of the graph and
+        # remembering it for the session (no job is stored, because it's done
+        # within the request)
+        with self.assertNumQueries(3):
+            response = build_knowledge(self.fake_request())
+        self.assertEqual(loads(response.content)["success"], True)
+
+    def test_start_session_queries(self):
+        fake_request = MockObject(session={},
+            body=dumps({'topic': 'Abraham_Lincoln'}))
+        # article, aggregated performances (components are cached), new
+        # accumulative feedback and session
+        with self.assertNumQueries(4):
+            response = start_session(fake_request)
+        self.assertEqual(loads(response.content)["success"], True)
+
+    def test_create_exercises_queries(self):
+        self.session.build_knowledge()
+        self.session.create_graded_exercises()
+        # exercises are already created: session (with remembered knowledge
+        # graph) and check of graded exercises
+        with self.assertNumQueries(2):
+            response = create_exercises(self.fake_request())
+        self.assertEqual(loads(response.content)["status"], Job.DONE)
+
+    def test_job_status_queries(self):
+        job = Job.objects.submit(Job.BUILD_KNOWLEDGE, self.session)
+        # session, job and its queue position
+        with self.assertNumQueries(3):
+            response = job_status(self.fake_request(GET={'job': job.pk}))
+        self.assertEqual(loads(response.content)["status"], Job.PENDING)
+
+    def test_feedback_message_queries(self):
+        request = RequestFactory().post('/interface/feedback-message',
+            dumps({'text': 'Nice application!', 'email': ''}),
+            content_type='application/json')
+        request.session = {'session_id': self.session.id}
+        # only the session (the message is logged)
+        with self.assertNumQueries(1):
+            response = feedback_message(request)
+        self.assertEqual(loads(response.content)["success"], True)
+
+    def test_next_exercise_queries(self):
+        self.session.build_knowledge()
+        self.session.create_graded_exercises()
+        # session, unused graded exercises and their exercises
+        with self.assertNumQueries(3):
+            response = next_exercise(self.fake_request(body=None))
+        exercise_pk = loads(response.content)['exercise']['pk']
+
+        feedback = {'pk': exercise_pk, 'answered': True, 'correct': True,
+            'invalid': False, 'irrelevant': False}
+        # + graded exercise, stored feedback and updated accumulative feedback
+        with self.assertNumQueries(6):
+            response = next_exercise(self.fake_request(
+                body=dumps({'feedback': feedback})))
+        self.assertEqual(loads(response.content)["success"], True)
+
+    def test_session_feedback_queries(self):
+        # session and updated accumulative feedback
+        with self.assertNumQueries(2):
+            response = session_feedback(self.fake_request(
+                body=dumps({'rating': 3})))
+        self.assertEqual(loads(response.content)["success"], True)
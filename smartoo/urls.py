@@ -12,6 +12,7 @@ urlpatterns = patterns('',
     url(r'^interface/start-session$', views.start_session),
     url('^interface/build-knowledge$', views.build_knowledge),
     url('^interface/create-exercises$', views.create_exercises),
+    url(r'^interface/job-status$', views.job_status),
     url(r'^interface/next-exercise$', views.next_exercise),
     url(r'^interface/session-feedback$', views.session_feedback),
     url(r'^interface/feedback-message$', views.feedback_message)
@@ -7,6 +7,7 @@ from django.shortcuts import render
 from django.views.decorators.csrf import ensure_csrf_cookie
 #from django.conf import settings
 
+from common.settings import JOBS_ASYNC
 from common.utils.wiki import term_to_wiki_uri
 from common.utils.http import BAD_REQUEST
 #from knowledge.utils.terms import name_to_term, term_to_name
@@ -16,7 +17,7 @@ from knowledge.models import article_search
 from exercises.models import GradedExercise
 from smartoo.exceptions import SessionError
 from smartoo.feedback import process_message_feedback
-from smartoo.models import Session
+from smartoo.models import Session, Job
 
 import json
 import logging
@@ -94,28 +95,38 @@ def start_session(request):
 
 def build_knowledge(request):
     """
-    Builds knowledge (if not already built) and returns "done" message.
+    Submits job to build knowledge (if not already built) and returns status
+    of the job.
     """
-    try:
-        session = retrieve_current_session(request)
-        session.build_knowledge()
-        return JsonResponse({"success": True})
-    except SessionError as exc:
-        logger.warning('SessionError: ' + exc.message)
-        return JsonResponse({"success": False}, status=BAD_REQUEST)
+    return submit_job(request, Job.BUILD_KNOWLEDGE)
 
 
 def create_exercises(request):
     """
-    Creates exercises (if not already created) and returns "done" message.
+    Submits job to create exercises (if not already created) and returns
+    status of the job.
+    """
+    return submit_job(request, Job.CREATE_EXERCISES)
+
+
+def job_status(request):
+    """
+    Returns status of a job of the current session (to poll until it's done).
     """
     try:
         session = retrieve_current_session(request)
-        session.create_graded_exercises()
-        return JsonResponse({"success": True})
+        job = Job.objects.get(pk=int(request.GET.get('job')))
     except SessionError as exc:
         logger.warning('SessionError: ' + exc.message)
         return JsonResponse({"success": False}, status=BAD_REQUEST)
+    except (TypeError, ValueError, ObjectDoesNotExist):
+        return JsonResponse({"success": False, "message": "No such job."},
+            status=BAD_REQUEST)
+    # jobs are shared by sessions which need the same work done
+    if job.key != Job.create_key(job.kind, session):
+        return JsonResponse({"success": False, "message": "No such job."},
+            status=BAD_REQUEST)
+    return job_response(job)
 
 
 def next_exercise(request):
@@ -206,17 +217,69 @@ def feedback_message(request):
 # ----------------------------------------------------------------------------
 
 
+def submit_job(request, kind):
+    """
+    Submits job of given kind for the current session. Unless jobs are run
+    by background workers, the work is done immediately (without creating
+    the job).
+    """
+    try:
+        session = retrieve_current_session(request)
+    except SessionError as exc:
+        logger.warning('SessionError: ' + exc.message)
+        return JsonResponse({"success": False}, status=BAD_REQUEST)
+
+    if not JOBS_ASYNC:
+        try:
+            if not Job.is_done(kind, session):
+                Job.perform(kind, session)
+        except Exception:
+            logger.exception('{kind} failed for {session}'.format(kind=kind,
+                session=session))
+            return JsonResponse({"success": False, "status": Job.FAILED},
+                status=BAD_REQUEST)
+        return JsonResponse({"success": True, "status": Job.DONE,
+            "progress": 1.0})
+
+    job = Job.objects.submit(kind, session)
+    return job_response(job)
+
+
+def job_response(job):
+    """
+    Returns response describing status of the job.
+    """
+    if job.status == Job.FAILED:
+        logger.warning('{job} failed: {message}'.format(job=job,
+            message=job.message))
+        return JsonResponse({"success": False, "job": job.pk,
+            "status": job.status}, status=BAD_REQUEST)
+    return JsonResponse({
+        "success": True,
+        "job": job.pk,
+        "status": job.status,
+        "progress": job.progress,
+        "stepsDone": job.steps_done,
+        "stepsTotal": job.steps_total,
+        "queuePosition": job.get_queue_position()})
+
+
 def retrieve_current_session(request):
     """
-    Returns session for current request.
+    Returns session for current request. The session is loaded together with
+    its feedback and components (in one query) and it's remembered for the
+    rest of the request.
 
     Raises:
         SessionError: if there is not current session
     """
     try:
         session_id = request.session['session_id']
-        session = Session.objects.get(id=session_id)
-        return session
+        current_session = getattr(request, '_current_session', None)
+        if current_session is None or current_session.pk != session_id:
+            current_session = Session.objects.load(pk=session_id)
+            request._current_session = current_session
+        return current_session
     except KeyError:
         raise SessionError("No session_id stored in the session.")
     except ObjectDoesNotExist: